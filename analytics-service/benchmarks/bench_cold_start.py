@@ -0,0 +1,87 @@
+"""
+Measure Lambda cold-start phases, each run in a fresh interpreter:
+
+- import: importing the handler module (the Lambda init phase)
+- clients: creating the AWS clients a typical invocation uses, on first use
+- eager: what init used to cost, importing boto3 and creating every client at import
+
+    python benchmarks/bench_cold_start.py [--runs 15] [--max-import-ms 100]
+
+With --max-import-ms, exits non-zero when the median import time of any
+module is above it, so it can gate CI.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+LAMBDA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'lambda')
+
+# module -> (client factories used by an invocation, clients the module used to create at import)
+MODULES = {
+    'event_consumer': (
+        ['dynamodb'],
+        "boto3.resource('dynamodb'); boto3.client('cloudwatch')"
+    ),
+    'reward_analytics': (
+        ['dynamodb', 's3', 'cloudwatch'],
+        "boto3.resource('dynamodb'); boto3.client('s3'); boto3.client('cloudwatch')"
+    )
+}
+
+CHILD = """
+import json, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+for factory in {factories!r}:
+    getattr({module}, factory)()
+done = time.perf_counter()
+print(json.dumps({{'import': imported - started, 'clients': done - imported}}))
+"""
+
+EAGER = """
+import json, time
+started = time.perf_counter()
+import boto3
+{clients}
+print(json.dumps({{'eager': time.perf_counter() - started}}))
+"""
+
+def run_child(code: str) -> dict:
+    env = {**os.environ, 'AWS_DEFAULT_REGION': os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')}
+    output = subprocess.run(
+        [sys.executable, '-c', code], cwd=LAMBDA_DIR, env=env, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def median_ms(samples: list) -> float:
+    return statistics.median(samples) * 1000
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=15)
+    parser.add_argument('--max-import-ms', type=float)
+    args = parser.parse_args()
+
+    print(f"median of {args.runs} fresh interpreters, milliseconds")
+    print(f"{'module':>18} {'import':>8} {'clients':>8} {'total':>8} {'eager':>8}")
+    regressions = []
+    for module, (factories, clients) in MODULES.items():
+        lazy = [run_child(CHILD.format(module=module, factories=factories)) for _ in range(args.runs)]
+        eager = [run_child(EAGER.format(clients=clients))['eager'] for _ in range(args.runs)]
+        imported = median_ms([run['import'] for run in lazy])
+        created = median_ms([run['clients'] for run in lazy])
+        total = median_ms([run['import'] + run['clients'] for run in lazy])
+        print(f"{module:>18} {imported:>8.1f} {created:>8.1f} {total:>8.1f} {median_ms(eager):>8.1f}")
+        if args.max_import_ms is not None and imported > args.max_import_ms:
+            regressions.append(module)
+
+    if regressions:
+        print(f"import time above {args.max_import_ms} ms: {', '.join(regressions)}")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+Records/sec for the event consumer (batch writes on a thread pool) versus
+one put_item per record, at several SQS batch sizes, against moto's
+in-process DynamoDB.
+
+moto answers in microseconds, so a simulated round trip (default 5 ms, like
+Lambda to DynamoDB in-region) is added to every DynamoDB request.
+
+Run from the analytics-service directory:
+
+    python benchmarks/bench_event_consumer.py [round_trip_ms]
+"""
+import json
+import os
+import sys
+import time
+
+for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+import boto3  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+import event_consumer  # noqa: E402
+from tables import create_rewards_table  # noqa: E402
+
+BATCH_SIZES = [1, 10, 25, 100, 500]
+RECORDS = 500
+
+def sqs_batch(start: int, size: int) -> dict:
+    return {'Records': [
+        {'messageId': str(i), 'body': json.dumps({'Message': json.dumps({
+            'transaction_id': f'tx-{i}', 'user_id': f'user{i}', 'amount': 42.5, 'merchant': 'Store', 'category': 'dining'
+        })})}
+        for i in range(start, start + size)
+    ]}
+
+def per_record(event: dict) -> None:
+    """The previous consumer: one put_item per record."""
+    table = event_consumer.dynamodb().Table(event_consumer.REWARDS_TABLE)
+    for record in event['Records']:
+        table.put_item(Item=event_consumer.build_reward_item(event_consumer.parse_record(record)))
+
+def batched(event: dict) -> None:
+    event_consumer.lambda_handler(event, None)
+
+def records_per_second(handler, batch_size: int) -> float:
+    started = time.perf_counter()
+    for start in range(0, RECORDS, batch_size):
+        handler(sqs_batch(start, min(batch_size, RECORDS - start)))
+    return RECORDS / (time.perf_counter() - started)
+
+def main() -> None:
+    round_trip = (float(sys.argv[1]) if len(sys.argv) > 1 else 5.0) / 1000
+    # Only measure the DynamoDB path
+    event_consumer.metrics.mode = 'none'
+    event_consumer.logger.disabled = True
+
+    with mock_dynamodb():
+        create_rewards_table(boto3.resource('dynamodb'))
+        event_consumer.dynamodb().meta.client.meta.events.register(
+            'before-send.dynamodb', lambda **kwargs: time.sleep(round_trip)
+        )
+        print(f"{RECORDS} records, {round_trip * 1000:.0f} ms simulated round trip")
+        print(f"{'batch size':>10} {'put_item rec/s':>15} {'batch rec/s':>12} {'speedup':>8}")
+        for batch_size in BATCH_SIZES:
+            single = records_per_second(per_record, batch_size)
+            batch = records_per_second(batched, batch_size)
+            print(f"{batch_size:>10} {single:>15.0f} {batch:>12.0f} {batch / single:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
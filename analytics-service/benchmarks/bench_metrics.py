@@ -0,0 +1,81 @@
+"""
+Time the metrics path of the event consumer per batch: one put_metric_data
+call per record (the previous behaviour) against aggregating the batch and
+writing EMF log lines. CloudWatch runs on moto with a simulated round trip.
+
+    python benchmarks/bench_metrics.py [round trip ms]
+"""
+import io
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+for name, value in {
+    'AWS_DEFAULT_REGION': 'us-east-1',
+    'AWS_ACCESS_KEY_ID': 'testing',
+    'AWS_SECRET_ACCESS_KEY': 'testing'
+}.items():
+    os.environ.setdefault(name, value)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+from moto import mock_cloudwatch
+
+import aws_clients
+import event_consumer
+
+BATCH_SIZES = [1, 10, 100, 500]
+MERCHANTS = 20
+
+def make_items(n: int) -> list:
+    return [
+        {'user_id': f'user{i}', 'points': i % 300, 'merchant': f'merchant{i % MERCHANTS}', 'category': 'groceries'}
+        for i in range(n)
+    ]
+
+def per_record(items: list) -> int:
+    """The previous path: one API call per record, with a UserId dimension."""
+    for item in items:
+        aws_clients.client('cloudwatch').put_metric_data(
+            Namespace=event_consumer.METRICS_NAMESPACE,
+            MetricData=[{
+                'MetricName': 'RewardPointsIssued',
+                'Value': item['points'],
+                'Unit': 'Count',
+                'Dimensions': [
+                    {'Name': 'UserId', 'Value': item['user_id']},
+                    {'Name': 'Merchant', 'Value': item['merchant']}
+                ]
+            }]
+        )
+    return len(items)
+
+def aggregated(items: list, mode: str) -> int:
+    event_consumer.metrics.mode = mode
+    for item in items:
+        event_consumer.record_points_metric(item)
+    return event_consumer.metrics.flush(aws_clients.client('cloudwatch'))
+
+def milliseconds(run, items: list) -> tuple:
+    with redirect_stdout(io.StringIO()):
+        started = time.perf_counter()
+        calls = run(items)
+    return (time.perf_counter() - started) * 1000, calls
+
+def main() -> None:
+    round_trip = (float(sys.argv[1]) if len(sys.argv) > 1 else 5.0) / 1000
+    with mock_cloudwatch():
+        aws_clients.client('cloudwatch').meta.events.register(
+            'before-send.cloudwatch', lambda **kwargs: time.sleep(round_trip)
+        )
+        print(f"{round_trip * 1000:.0f} ms simulated round trip; milliseconds per batch (API calls)")
+        print(f"{'batch size':>10} {'per record':>16} {'statistic sets':>16} {'EMF':>14}")
+        for batch_size in BATCH_SIZES:
+            items = make_items(batch_size)
+            single = milliseconds(per_record, items)
+            sets = milliseconds(lambda batch: aggregated(batch, 'cloudwatch'), items)
+            emf = milliseconds(lambda batch: aggregated(batch, 'emf'), items)
+            print(" ".join([f"{batch_size:>10}"] + [f"{ms:>10.2f} ({calls:>3})" for ms, calls in (single, sets, emf)]))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Daily aggregation time and bytes transferred for reward_analytics, against
+moto's in-process DynamoDB with a simulated round trip per request (default
+5 ms). One day holds about 3 MB of rewards, so each status spans several
+1 MB pages.
+
+- single page: the previous aggregate_rewards; it stops after the first page
+  and undercounts
+- sequential: the same queries, paginated, full items, one after the other
+- aggregate_rewards: paginated, only `points` projected, both statuses at once
+- rollups: aggregate_rewards with AGGREGATION_METHOD=rollup, reading only the
+  pre-aggregated counter shards
+
+Run from the analytics-service directory:
+
+    python benchmarks/bench_reward_analytics.py [round_trip_ms]
+"""
+import os
+import sys
+import time
+
+for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+import boto3  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+import reward_analytics  # noqa: E402
+import rollups  # noqa: E402
+from tables import create_rewards_table, create_rollups_table  # noqa: E402
+
+DATE = '2024-03-01'
+ISSUED = 2400
+REDEEMED = 800
+
+def query(status: str, paginate: bool) -> tuple:
+    table = reward_analytics.dynamodb().Table(reward_analytics.REWARDS_TABLE)
+    kwargs = {
+        'IndexName': 'status-date-index',
+        'KeyConditionExpression': '#status = :status AND #date = :date',
+        'ExpressionAttributeNames': {'#status': 'status', '#date': 'date'},
+        'ExpressionAttributeValues': {':status': status, ':date': DATE}
+    }
+    total, count = 0.0, 0
+    while True:
+        response = table.query(**kwargs)
+        total += sum(float(item['points']) for item in response['Items'])
+        count += len(response['Items'])
+        if not paginate or 'LastEvaluatedKey' not in response:
+            return total, count
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def single_page() -> dict:
+    return reward_analytics.build_summary(DATE, query('ISSUED', False), query('REDEEMED', False))
+
+def sequential() -> dict:
+    return reward_analytics.build_summary(DATE, query('ISSUED', True), query('REDEEMED', True))
+
+def rollup() -> dict:
+    reward_analytics.AGGREGATION_METHOD = 'rollup'
+    try:
+        return reward_analytics.aggregate_rewards(DATE)
+    finally:
+        reward_analytics.AGGREGATION_METHOD = 'query'
+
+def main() -> None:
+    round_trip = (float(sys.argv[1]) if len(sys.argv) > 1 else 5.0) / 1000
+    received = [0]
+
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        create_rewards_table(dynamodb)
+        create_rollups_table(dynamodb)
+        items = [
+            {
+                'user_id': f'user{i % 500}',
+                'timestamp': f'{DATE}T00:00:00.{i:06d}',
+                'date': DATE,
+                'status': 'ISSUED' if i < ISSUED else 'REDEEMED',
+                'points': i % 100,
+                'merchant': 'Store',
+                'notes': 'x' * 900
+            }
+            for i in range(ISSUED + REDEEMED)
+        ]
+        with dynamodb.Table('rewards').batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
+        rollups.record(items)
+
+        events = reward_analytics.dynamodb().meta.client.meta.events
+        events.register('before-send.dynamodb', lambda **kwargs: time.sleep(round_trip))
+        events.register('after-call.dynamodb', lambda http_response, **kwargs: received.__setitem__(0, received[0] + len(http_response.content)))
+
+        print(f"{ISSUED} issued and {REDEEMED} redeemed rewards, {round_trip * 1000:.0f} ms simulated round trip")
+        print(f"{'method':>18} {'ms':>8} {'KB received':>12} {'issued_count':>13} {'redeemed_count':>15}")
+        for name, run in [
+            ('single page', single_page),
+            ('sequential', sequential),
+            ('aggregate_rewards', lambda: reward_analytics.aggregate_rewards(DATE)),
+            ('rollups', rollup)
+        ]:
+            received[0] = 0
+            started = time.perf_counter()
+            summary = run()
+            elapsed = (time.perf_counter() - started) * 1000
+            print(f"{name:>18} {elapsed:>8.0f} {received[0] / 1024:>12.1f} {summary['issued_count']:>13} {summary['redeemed_count']:>15}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Load test for write sharding of the rewards GSI.
+
+DynamoDB caps writes per partition key (1000 WCU/s). Every reward of a day
+used to share the partition key status=ISSUED of status-date-index, so a day's
+ingest was capped by that one key. moto does not throttle. Here each GSI
+partition key gets a token bucket (PER_KEY_RATE writes/s, scaled down so moto
+itself is not the bottleneck). Writes over budget come back as
+UnprocessedItems, which the consumer retries with backoff, like real throttling.
+
+Run from the analytics-service directory:
+
+    python benchmarks/bench_sharded_writes.py [per_key_rate]
+"""
+import json
+import os
+import sys
+import threading
+import time
+
+for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'tests'))
+
+import boto3  # noqa: E402
+from moto import mock_dynamodb  # noqa: E402
+
+import event_consumer  # noqa: E402
+import sharding  # noqa: E402
+from tables import create_rewards_table  # noqa: E402
+
+RECORDS = 3000
+BATCH_SIZE = 100
+SCENARIOS = [('status-date-index', None), ('date-shard-index', 4), ('date-shard-index', 8), ('date-shard-index', 16)]
+
+class PartitionThrottle:
+    """One token bucket per GSI partition key, holding at most 100 ms of writes."""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.buckets = {}
+        self.lock = threading.Lock()
+
+    def take(self, key: str) -> bool:
+        now = time.monotonic()
+        with self.lock:
+            tokens, updated = self.buckets.get(key, (self.rate / 10, now))
+            tokens = min(self.rate / 10, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self.buckets[key] = (tokens, now)
+                return False
+            self.buckets[key] = (tokens - 1, now)
+            return True
+
+def throttled_batch_write(client, throttle: PartitionThrottle, sharded: bool):
+    real_batch_write = client.batch_write_item
+
+    def batch_write_item(RequestItems):
+        requests = RequestItems[event_consumer.REWARDS_TABLE]
+        # The GSI partition key each write lands on
+        key = (lambda item: item['date_shard']) if sharded else (lambda item: item['status'])
+        accepted = [r for r in requests if throttle.take(key(r['PutRequest']['Item']))]
+        rejected = [r for r in requests if r not in accepted]
+        if accepted:
+            real_batch_write(RequestItems={event_consumer.REWARDS_TABLE: accepted})
+        return {'UnprocessedItems': {event_consumer.REWARDS_TABLE: rejected} if rejected else {}}
+
+    return batch_write_item
+
+def sqs_batch(start: int, size: int) -> dict:
+    return {'Records': [
+        {'messageId': str(i), 'body': json.dumps({'Message': json.dumps({
+            'transaction_id': f'tx-{i}', 'user_id': f'user{i}', 'amount': 42.5, 'merchant': 'Store', 'category': 'dining'
+        })})}
+        for i in range(start, start + size)
+    ]}
+
+def run(sharded: bool, rate: float) -> tuple:
+    with mock_dynamodb():
+        create_rewards_table(boto3.resource('dynamodb'))
+        client = event_consumer.dynamodb().meta.client
+        client.batch_write_item = throttled_batch_write(client, PartitionThrottle(rate), sharded)
+        try:
+            failed = 0
+            started = time.perf_counter()
+            for start in range(0, RECORDS, BATCH_SIZE):
+                failed += len(event_consumer.lambda_handler(sqs_batch(start, BATCH_SIZE), None)['batchItemFailures'])
+            elapsed = time.perf_counter() - started
+        finally:
+            del client.batch_write_item
+    return (RECORDS - failed) / elapsed, failed
+
+def main() -> None:
+    rate = float(sys.argv[1]) if len(sys.argv) > 1 else 250
+    event_consumer.ROLLUPS_ENABLED = False
+    event_consumer.metrics.mode = 'none'
+    event_consumer.logger.disabled = True
+
+    print(f"{RECORDS} rewards in batches of {BATCH_SIZE}, {rate:.0f} writes/s per GSI partition key")
+    print(f"{'index':>18} {'shards':>7} {'written/s':>10} {'failed':>7}")
+    for index, shards in SCENARIOS:
+        if shards:
+            sharding.GSI_SHARDS = shards
+        written, failed = run(shards is not None, rate)
+        print(f"{index:>18} {shards or 1:>7} {written:>10.0f} {failed:>7}")
+
+if __name__ == "__main__":
+    main()
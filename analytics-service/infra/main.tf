@@ -43,6 +43,7 @@ resource "aws_iam_policy" "analytics_lambda_policy" {
       {
         Effect = "Allow"
         Action = [
+          "dynamodb:BatchWriteItem",
           "dynamodb:Query",
           "dynamodb:Scan"
         ]
@@ -51,6 +52,28 @@ resource "aws_iam_policy" "analytics_lambda_policy" {
           "arn:aws:dynamodb:${var.aws_region}:${data.aws_caller_identity.current.account_id}:table/rewards/index/*"
         ]
       },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:BatchGetItem",
+          "dynamodb:Query",
+          "dynamodb:UpdateItem"
+        ]
+        Resource = [
+          "arn:aws:dynamodb:${var.aws_region}:${data.aws_caller_identity.current.account_id}:table/reward-rollups"
+        ]
+      },
+      {
+        Effect = "Allow"
+        Action = [
+          "dynamodb:GetItem",
+          "dynamodb:PutItem",
+          "dynamodb:Query"
+        ]
+        Resource = [
+          "arn:aws:dynamodb:${var.aws_region}:${data.aws_caller_identity.current.account_id}:table/reward-sketches"
+        ]
+      },
       {
         Effect = "Allow"
         Action = [
@@ -108,6 +131,24 @@ resource "aws_lambda_function" "analytics" {
   }
 }
 
+# Event consumer Lambda, issuing rewards from transaction events
+resource "aws_lambda_function" "event_consumer" {
+  filename         = "../lambda/event_consumer.zip"
+  function_name    = "reward-event-consumer"
+  role            = aws_iam_role.analytics_lambda_role.arn
+  handler         = "event_consumer.lambda_handler"
+  runtime         = "python3.11"
+  timeout         = 60
+  memory_size     = 256
+
+  environment {
+    variables = {
+      REWARDS_TABLE = "rewards"
+      METRICS_MODE  = "emf"
+    }
+  }
+}
+
 # CloudWatch Event Rule
 resource "aws_cloudwatch_event_rule" "daily_analytics" {
   name                = "daily-reward-analytics"
@@ -131,12 +172,15 @@ resource "aws_lambda_permission" "allow_cloudwatch" {
   source_arn    = aws_cloudwatch_event_rule.daily_analytics.arn
 }
 
-# SQS trigger for batch analytics Lambda
+# SQS trigger for the event consumer; reward_analytics runs on the daily schedule above
 resource "aws_lambda_event_source_mapping" "batch_analytics_sqs_trigger" {
   event_source_arn = aws_sqs_queue.batch_analytics_queue.arn
-  function_name    = aws_lambda_function.analytics.arn
+  function_name    = aws_lambda_function.event_consumer.arn
   batch_size       = 10
   enabled          = true
+
+  # Only messages listed in batchItemFailures are redelivered
+  function_response_types = ["ReportBatchItemFailures"]
 }
 
 # Update Lambda IAM role to include SQS permissions
@@ -0,0 +1,30 @@
+import threading
+from typing import Any, Dict, Tuple
+
+# boto3 and botocore take a few hundred ms to import and every client or
+# resource loads its service model, so nothing is created at import time. Each
+# one is built on first use and then reused for the life of the container.
+_cache: Dict[Tuple[str, str, int], Any] = {}
+# Creating clients from the default session is not thread-safe
+_lock = threading.Lock()
+
+def _get(kind: str, service_name: str, max_pool_connections: int) -> Any:
+    key = (kind, service_name, max_pool_connections)
+    cached = _cache.get(key)
+    if cached is not None:
+        return cached
+    with _lock:
+        if key not in _cache:
+            import boto3
+            from botocore.config import Config
+            factory = boto3.resource if kind == 'resource' else boto3.client
+            _cache[key] = factory(service_name, config=Config(max_pool_connections=max_pool_connections))
+        return _cache[key]
+
+def client(service_name: str, max_pool_connections: int = 10) -> Any:
+    """Cached boto3 client, created on first use."""
+    return _get('client', service_name, max_pool_connections)
+
+def resource(service_name: str, max_pool_connections: int = 10) -> Any:
+    """Cached boto3 resource, created on first use."""
+    return _get('resource', service_name, max_pool_connections)
@@ -1,88 +1,207 @@
-import json
-import boto3
+import os
+import random
+import time
 import logging
-from datetime import datetime
-from typing import Dict, Any, List
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+import aws_clients
+import events
+import rollups
+import sharding
+import sketches
+from metrics import MetricsAggregator
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-cloudwatch = boto3.client('cloudwatch')
-
 # Constants
-REWARDS_TABLE = 'rewards'
+REWARDS_TABLE = os.getenv('REWARDS_TABLE', 'rewards')
+MAX_WORKERS = int(os.getenv('MAX_WORKERS', '8'))  # concurrent batch writes per invocation
 METRICS_NAMESPACE = 'LoyaltyPlatform/Rewards'
+BATCH_WRITE_SIZE = 25  # DynamoDB limit for batch_write_item
+BATCH_WRITE_MAX_RETRIES = int(os.getenv('BATCH_WRITE_MAX_RETRIES', '8'))
+BATCH_WRITE_BASE_DELAY = float(os.getenv('BATCH_WRITE_BASE_DELAY', '0.05'))
+ROLLUPS_ENABLED = os.getenv('ROLLUPS_ENABLED', 'true').lower() == 'true'
 
-def process_transaction(transaction: Dict[str, Any]) -> None:
-    """Process a single transaction and update analytics."""
-    try:
-        # Extract transaction details
-        user_id = transaction['user_id']
-        amount = float(transaction['amount'])
-        timestamp = datetime.utcnow().isoformat()
-        
+# Reused across warm invocations
+executor = ThreadPoolExecutor(max_workers=MAX_WORKERS)
+
+# Per-batch statistic sets by merchant and by category; no per-user series
+metrics = MetricsAggregator(METRICS_NAMESPACE, dimension_sets=[['Merchant'], ['Category']])
+
+def dynamodb() -> Any:
+    # Shared with the rollups module unless MAX_WORKERS needs a bigger pool
+    return aws_clients.resource('dynamodb', max_pool_connections=max(10, MAX_WORKERS))
+
+class RewardNotIssuedError(Exception):
+    """Raised when a transaction's reward record could not be stored."""
+
+def parse_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the transaction from an SQS record carrying an SNS notification, or
+    the bare message when the subscription uses raw message delivery.
+    """
+    if 'schema_version' in record.get('messageAttributes', {}):
+        return events.decode(record['body'], record['messageAttributes'])
+    notification = events.loads(record['body'])
+    return events.decode(notification['Message'], notification.get('MessageAttributes'))
+
+def build_reward_item(transaction: Dict[str, Any], now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Turn a transaction into the reward record stored in DynamoDB, issued at `now`."""
+    now = now or datetime.utcnow()
+    amount = float(transaction['amount'])
+    date = now.strftime('%Y-%m-%d')
+    return {
+        'user_id': transaction['user_id'],
         # Calculate reward points (example: 1 point per $1)
-        points = int(amount)
-        
-        # Store reward record
-        table = dynamodb.Table(REWARDS_TABLE)
-        table.put_item(
-            Item={
-                'user_id': user_id,
-                'points': points,
-                'status': 'ISSUED',
-                'date': datetime.utcnow().strftime('%Y-%m-%d'),
-                'timestamp': timestamp,
-                'transaction_id': transaction.get('transaction_id', ''),
-                'merchant': transaction.get('merchant', ''),
-                'category': transaction.get('category', '')
-            }
-        )
-        
-        # Put metric for real-time tracking
-        cloudwatch.put_metric_data(
-            Namespace=METRICS_NAMESPACE,
-            MetricData=[
-                {
-                    'MetricName': 'RewardPointsIssued',
-                    'Value': points,
-                    'Unit': 'Count',
-                    'Dimensions': [
-                        {'Name': 'UserId', 'Value': user_id},
-                        {'Name': 'Merchant', 'Value': transaction.get('merchant', 'Unknown')}
-                    ]
-                }
-            ]
-        )
-        
-        logger.info(f"Processed transaction for user {user_id}: {points} points issued")
-        
+        'points': int(amount),
+        'status': 'ISSUED',
+        'date': date,
+        # Spreads the day's writes over the shards of date-shard-index
+        'date_shard': sharding.date_shard(date, transaction['user_id']),
+        'timestamp': now.isoformat(),
+        'transaction_id': transaction.get('transaction_id', ''),
+        'merchant': transaction.get('merchant', ''),
+        'category': transaction.get('category', '')
+    }
+
+def write_group(group: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Write up to 25 reward records with batch_write_item, retrying unprocessed
+    items with exponential backoff and jitter. Returns the items not written;
+    never raises, so one group's error cannot fail records of other groups.
+    """
+    requests = [{'PutRequest': {'Item': item}} for item in group]
+    for attempt in range(BATCH_WRITE_MAX_RETRIES + 1):
+        try:
+            # The resource's client serializes plain Python values for us
+            response = dynamodb().meta.client.batch_write_item(RequestItems={REWARDS_TABLE: requests})
+        except Exception as e:
+            # Service errors, connection errors and timeouts alike
+            logger.error(f"Batch write of {len(requests)} reward records failed: {str(e)}")
+            break
+        requests = response.get('UnprocessedItems', {}).get(REWARDS_TABLE, [])
+        if not requests:
+            break
+        if attempt < BATCH_WRITE_MAX_RETRIES:
+            time.sleep(random.uniform(0, BATCH_WRITE_BASE_DELAY * (2 ** attempt)))
+    return [request['PutRequest']['Item'] for request in requests]
+
+def record_points_metric(item: Dict[str, Any]) -> None:
+    """Record issued points for real-time tracking; emitted once per batch."""
+    metrics.add('RewardPointsIssued', item['points'], 'Count', {
+        'Merchant': item['merchant'] or 'Unknown',
+        'Category': item['category'] or 'Unknown'
+    })
+
+def process_batch(entries: List[Tuple[str, Dict[str, Any]]]) -> List[str]:
+    """
+    Issue rewards for (message id, transaction) pairs and return the ids of
+    the messages that failed.
+
+    Records of different users are written concurrently; each user's records
+    are written in order. The batch is processed in rounds, where round k
+    holds the k-th record of every user. A user's next record is only written
+    once the previous one succeeded. After a failure, the rest of that user's
+    records are reported as failed too, so a retry replays them in order.
+    """
+    failed_ids: List[str] = []
+    queues: Dict[str, deque] = {}
+    issued_at: Dict[str, datetime] = {}
+    for message_id, transaction in entries:
+        try:
+            # Rewards are keyed by user_id and timestamp. Items are built faster
+            # than the clock ticks, so keep each user's timestamps strictly
+            # increasing; a repeated key would overwrite the earlier reward.
+            now = datetime.utcnow()
+            previous = issued_at.get(transaction.get('user_id'))
+            if previous is not None and now <= previous:
+                now = previous + timedelta(microseconds=1)
+            item = build_reward_item(transaction, now)
+        except Exception as e:
+            logger.error(f"Invalid transaction in message {message_id}: {str(e)}")
+            failed_ids.append(message_id)
+            continue
+        issued_at[item['user_id']] = now
+        queues.setdefault(item['user_id'], deque()).append((message_id, item))
+
+    written: List[Dict[str, Any]] = []
+    while queues:
+        round_entries = [queue.popleft() for queue in queues.values()]
+        items = [item for _, item in round_entries]
+        # One item per user, so keys in a round never collide
+        groups = [items[i:i + BATCH_WRITE_SIZE] for i in range(0, len(items), BATCH_WRITE_SIZE)]
+        try:
+            failed_users = {item['user_id'] for failed in executor.map(write_group, groups) for item in failed}
+        except Exception as e:
+            # Fail only what is not stored yet; earlier rounds must not be reissued
+            logger.error(f"Error writing reward records: {str(e)}")
+            failed_users = {item['user_id'] for item in items}
+
+        for message_id, item in round_entries:
+            if item['user_id'] not in failed_users:
+                written.append(item)
+                continue
+            failed_ids.append(message_id)
+            failed_ids.extend(later_id for later_id, _ in queues.pop(item['user_id']))
+        queues = {user_id: queue for user_id, queue in queues.items() if queue}
+
+    # The rewards are stored; failing the messages now would issue them twice
+    # Sketches are merged while the rollup counters are updated
+    sketches_update = executor.submit(sketches.record, written) if sketches.SKETCHES_ENABLED and written else None
+    if ROLLUPS_ENABLED and written:
+        try:
+            rollups.record(written, executor)
+        except Exception as e:
+            # Reconciliation in reward_analytics finds and repairs the drift
+            logger.error(f"Error updating reward rollups: {str(e)}")
+    if sketches_update is not None:
+        try:
+            sketches_update.result()
+        except Exception as e:
+            logger.error(f"Error updating reward sketches: {str(e)}")
+    try:
+        for item in written:
+            record_points_metric(item)
+        metrics.flush()
     except Exception as e:
-        logger.error(f"Error processing transaction: {str(e)}")
-        raise
+        logger.error(f"Error publishing reward metrics: {str(e)}")
+    if written:
+        logger.info(f"Issued {sum(item['points'] for item in written)} points for {len(written)} transactions")
+    return failed_ids
+
+def process_transaction(transaction: Dict[str, Any]) -> None:
+    """Process a single transaction and update analytics."""
+    if process_batch([(transaction.get('transaction_id', ''), transaction)]):
+        logger.error(f"Error processing transaction for user {transaction.get('user_id')}")
+        raise RewardNotIssuedError(transaction.get('transaction_id', ''))
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Main Lambda handler function."""
+    """
+    Main Lambda handler function. Reports failed messages through
+    batchItemFailures so SQS only redelivers those, not the whole batch.
+    """
+    # Parse every SQS record before touching DynamoDB
+    entries = []
+    failed_ids = []
+    for record in event['Records']:
+        try:
+            entries.append((record['messageId'], parse_record(record)))
+        except Exception as e:
+            logger.error(f"Malformed SQS message {record.get('messageId')}: {str(e)}")
+            failed_ids.append(record['messageId'])
+
     try:
-        # Process each record from SQS
-        for record in event['Records']:
-            # Parse SNS message
-            sns_message = json.loads(record['body'])
-            transaction = json.loads(sns_message['Message'])
-            
-            # Process the transaction
-            process_transaction(transaction)
-        
-        return {
-            'statusCode': 200,
-            'body': json.dumps({
-                'message': f'Successfully processed {len(event["Records"])} transactions'
-            })
-        }
-        
+        failed_ids.extend(process_batch(entries))
     except Exception as e:
+        # Anything unexpected: let SQS retry every message that was not already failed
         logger.error(f"Error processing SQS messages: {str(e)}")
-        raise 
\ No newline at end of file
+        failed_ids.extend(message_id for message_id, _ in entries if message_id not in failed_ids)
+
+    if failed_ids:
+        logger.warning(f"{len(failed_ids)} of {len(event['Records'])} messages failed")
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
@@ -0,0 +1,117 @@
+import json
+import os
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import aws_clients
+
+# 'emf' writes CloudWatch Embedded Metric Format log lines (no API calls),
+# 'cloudwatch' calls put_metric_data with statistic sets, 'none' drops metrics
+METRICS_MODE = os.getenv('METRICS_MODE', 'emf')
+
+EMF_MAX_VALUES = 100  # values per metric in one EMF document
+PUT_METRIC_DATA_MAX = 1000  # metric data per put_metric_data request
+
+class MetricsAggregator:
+    """
+    Collects metric values during an invocation and emits them once, at the end.
+
+    Each value is recorded under a small, fixed set of dimension combinations
+    (e.g. none, Merchant, Category), never per user, so the number of metric
+    series stays bounded. Values are reduced to statistic sets
+    (sum/count/min/max) per metric and dimension combination.
+    """
+
+    def __init__(self, namespace: str, dimension_sets: Sequence[Sequence[str]] = ((),), mode: Optional[str] = None):
+        self.namespace = namespace
+        self.dimension_sets = [tuple(dimensions) for dimensions in dimension_sets]
+        self.mode = mode or METRICS_MODE
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        # (name, unit, dimension values) -> [sum, count, min, max]
+        self.statistics: Dict[Tuple[str, str, Tuple[Tuple[str, str], ...]], List[float]] = {}
+        # Raw values per full dimension combination, for EMF
+        self.values: Dict[Tuple[Tuple[str, str], ...], Dict[Tuple[str, str], List[float]]] = {}
+
+    def add(self, name: str, value: float, unit: str = 'Count', dimensions: Optional[Dict[str, str]] = None) -> None:
+        dimensions = dimensions or {}
+        with self._lock:
+            for dimension_set in self.dimension_sets:
+                key = (name, unit, tuple((d, dimensions[d]) for d in dimension_set))
+                stats = self.statistics.get(key)
+                if stats is None:
+                    self.statistics[key] = [value, 1, value, value]
+                else:
+                    stats[0] += value
+                    stats[1] += 1
+                    stats[2] = min(stats[2], value)
+                    stats[3] = max(stats[3], value)
+            combination = tuple(sorted(dimensions.items()))
+            self.values.setdefault(combination, {}).setdefault((name, unit), []).append(value)
+
+    def flush(self, client: Any = None, timestamp: Optional[float] = None) -> int:
+        """
+        Emit everything collected since the last flush and reset. In
+        'cloudwatch' mode, `client` defaults to the shared CloudWatch client.
+        Returns the number of API calls made.
+        """
+        with self._lock:
+            statistics, values = self.statistics, self.values
+            self._reset()
+        if not statistics or self.mode == 'none':
+            return 0
+        timestamp = time.time() if timestamp is None else timestamp
+        if self.mode == 'cloudwatch':
+            return self._put_metric_data(client or aws_clients.client('cloudwatch'), statistics, timestamp)
+        self._write_emf(values, timestamp)
+        return 0
+
+    def _put_metric_data(self, client: Any, statistics: dict, timestamp: float) -> int:
+        metric_data = [
+            {
+                'MetricName': name,
+                'Unit': unit,
+                'Timestamp': timestamp,
+                'Dimensions': [{'Name': d, 'Value': v} for d, v in dimensions],
+                'StatisticValues': {'Sum': total, 'SampleCount': count, 'Minimum': low, 'Maximum': high}
+            }
+            for (name, unit, dimensions), (total, count, low, high) in statistics.items()
+        ]
+        for start in range(0, len(metric_data), PUT_METRIC_DATA_MAX):
+            client.put_metric_data(Namespace=self.namespace, MetricData=metric_data[start:start + PUT_METRIC_DATA_MAX])
+        return (len(metric_data) + PUT_METRIC_DATA_MAX - 1) // PUT_METRIC_DATA_MAX
+
+    def _write_emf(self, values: dict, timestamp: float) -> None:
+        """
+        One EMF document per dimension combination. CloudWatch extracts each
+        metric under every configured dimension set and computes the statistics
+        from the value arrays.
+        """
+        lines = []
+        for combination, metrics in values.items():
+            members = dict(combination)
+            dimension_sets = [list(dimension_set) for dimension_set in self.dimension_sets]
+            longest = max(len(metric_values) for metric_values in metrics.values())
+            for start in range(0, longest, EMF_MAX_VALUES):
+                document: Dict[str, Any] = {
+                    '_aws': {
+                        'Timestamp': int(timestamp * 1000),
+                        'CloudWatchMetrics': [{
+                            'Namespace': self.namespace,
+                            'Dimensions': dimension_sets,
+                            'Metrics': [{'Name': name, 'Unit': unit} for (name, unit), v in metrics.items() if len(v) > start]
+                        }]
+                    },
+                    **members
+                }
+                for (name, _), metric_values in metrics.items():
+                    if len(metric_values) > start:
+                        document[name] = metric_values[start:start + EMF_MAX_VALUES]
+                lines.append(json.dumps(document, separators=(',', ':')))
+        # Lambda ships stdout to CloudWatch Logs, where EMF lines become metrics
+        sys.stdout.write('\n'.join(lines) + '\n')
+        sys.stdout.flush()
@@ -0,0 +1,96 @@
+"""
+Add `date_shard` to reward rows written before the sharded index existed.
+
+    cd lambda && python -m migrate_date_shards [--segments 4] [--workers 8] [--dry-run]
+
+Rows that already have it are skipped by the scan filter, so the migration can
+be stopped and rerun at any time. Switch readers over with SHARDED_READS=true
+once it reports nothing left to update.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict
+
+import aws_clients
+import sharding
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constants
+REWARDS_TABLE = 'rewards'
+SCAN_SEGMENTS = 4
+UPDATE_WORKERS = 8  # concurrent updates per segment
+
+def table_client() -> Any:
+    return aws_clients.resource('dynamodb', max_pool_connections=max(10, SCAN_SEGMENTS * UPDATE_WORKERS)).meta.client
+
+def set_date_shard(item: Dict[str, Any]) -> bool:
+    """Returns False when the row was deleted or migrated concurrently."""
+    from botocore.exceptions import ClientError
+
+    try:
+        table_client().update_item(
+            TableName=REWARDS_TABLE,
+            Key={'user_id': item['user_id'], 'timestamp': item['timestamp']},
+            UpdateExpression='SET #date_shard = :date_shard',
+            # Never recreate a deleted row or overwrite a writer's value
+            ConditionExpression='attribute_exists(#user_id) AND attribute_not_exists(#date_shard)',
+            ExpressionAttributeNames={'#date_shard': 'date_shard', '#user_id': 'user_id'},
+            ExpressionAttributeValues={':date_shard': sharding.date_shard(item['date'], item['user_id'])}
+        )
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+
+def migrate_segment(segment: int, total_segments: int, workers: int, dry_run: bool) -> Dict[str, int]:
+    client = table_client()
+    kwargs: Dict[str, Any] = {
+        'TableName': REWARDS_TABLE,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': 'attribute_not_exists(#date_shard)',
+        'ProjectionExpression': '#user_id, #timestamp, #date',
+        'ExpressionAttributeNames': {
+            '#date_shard': 'date_shard',
+            '#user_id': 'user_id',
+            '#timestamp': 'timestamp',
+            '#date': 'date'
+        }
+    }
+    counts = {'found': 0, 'updated': 0}
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            response = client.scan(**kwargs)
+            items = response.get('Items', [])
+            counts['found'] += len(items)
+            if not dry_run:
+                counts['updated'] += sum(executor.map(set_date_shard, items))
+            if 'LastEvaluatedKey' not in response:
+                return counts
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def migrate(segments: int = SCAN_SEGMENTS, workers: int = UPDATE_WORKERS, dry_run: bool = False) -> Dict[str, int]:
+    """Parallel-scan the table and set `date_shard` on every row missing it."""
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        results = list(executor.map(lambda segment: migrate_segment(segment, segments, workers, dry_run), range(segments)))
+    counts = {'found': sum(r['found'] for r in results), 'updated': sum(r['updated'] for r in results)}
+    logger.info(f"{counts['found']} rows without date_shard, {counts['updated']} updated")
+    return counts
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Add date_shard to existing reward rows')
+    parser.add_argument('--segments', type=int, default=SCAN_SEGMENTS)
+    parser.add_argument('--workers', type=int, default=UPDATE_WORKERS)
+    parser.add_argument('--dry-run', action='store_true', help='only count the rows to update')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+    migrate(args.segments, args.workers, args.dry_run)
+
+if __name__ == '__main__':
+    main()
@@ -1,87 +1,347 @@
+import gzip
+import hashlib
+import itertools
 import json
-import boto3
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, Any
+from typing import Callable, Dict, Any, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import aws_clients
+import rollups
+import sharding
+import sketches
 
 # Configure logging
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
-# Initialize AWS clients
-dynamodb = boto3.resource('dynamodb')
-s3 = boto3.client('s3')
-cloudwatch = boto3.client('cloudwatch')
-
 # Constants
 REWARDS_TABLE = 'rewards'
 S3_BUCKET = 'loyalty-platform-analytics'
 S3_PREFIX = 'daily-rewards'
+AGGREGATION_METHOD = os.getenv('AGGREGATION_METHOD', 'query')  # query, scan or rollup
+SCAN_SEGMENTS = int(os.getenv('SCAN_SEGMENTS', '4'))  # parallel scan segments
+BREAKDOWN_PREFIX = os.getenv('BREAKDOWN_PREFIX', 'reward-breakdowns')
+BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '4'))  # dates processed at once
+BREAKDOWN_DIMENSIONS = ('merchant', 'category', 'hour')
+# Reward attributes needed to rebuild every counter of a day
+RAW_ATTRIBUTES = ('points', 'date', 'status', 'timestamp', 'merchant', 'category')
+
+# AWS clients are created on first use
+def dynamodb() -> Any:
+    return aws_clients.resource('dynamodb', max_pool_connections=max(10, SCAN_SEGMENTS, 2 * sharding.GSI_SHARDS))
+
+def s3() -> Any:
+    return aws_clients.client('s3')
+
+def cloudwatch() -> Any:
+    return aws_clients.client('cloudwatch')
 
 def get_yesterday_date() -> str:
     """Get yesterday's date in YYYY-MM-DD format."""
     yesterday = datetime.utcnow() - timedelta(days=1)
     return yesterday.strftime('%Y-%m-%d')
 
-def aggregate_rewards(date: str) -> Dict[str, Any]:
-    """Aggregate rewards data for the given date."""
-    table = dynamodb.Table(REWARDS_TABLE)
-    
-    # Query for issued rewards
-    issued_rewards = table.query(
-        IndexName='status-date-index',
-        KeyConditionExpression='#status = :status AND #date = :date',
-        ExpressionAttributeNames={
-            '#status': 'status',
-            '#date': 'date'
-        },
-        ExpressionAttributeValues={
-            ':status': 'ISSUED',
-            ':date': date
+def sum_pages(pages: Iterable[List[Dict[str, Any]]]) -> Tuple[float, int]:
+    """Reduce pages of items to (total points, count) without keeping them."""
+    total, count = 0.0, 0
+    for items in pages:
+        total += sum(float(item['points']) for item in items)
+        count += len(items)
+    return total, count
+
+def query_pages(
+    status: str,
+    date: str,
+    attributes: Sequence[str] = ('points',),
+    shard_key: Optional[str] = None
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Pages of one status and date from the GSI, following LastEvaluatedKey, with
+    only `attributes` projected. With a `shard_key` ("<date>#<shard>"), only that
+    shard of the sharded index is read.
+    """
+    if shard_key is None:
+        index, condition, key_names = 'status-date-index', '#status = :status AND #date = :key', ('status', 'date')
+    else:
+        index, condition, key_names = sharding.SHARDED_INDEX, '#date_shard = :key AND #status = :status', ('date_shard', 'status')
+    # The resource's client deserializes items and, unlike the resource, is thread-safe
+    client = dynamodb().meta.client
+    kwargs: Dict[str, Any] = {
+        'TableName': REWARDS_TABLE,
+        'IndexName': index,
+        'KeyConditionExpression': condition,
+        'ProjectionExpression': ', '.join(f'#{attribute}' for attribute in attributes),
+        'ExpressionAttributeNames': {f'#{name}': name for name in (*key_names, *attributes)},
+        'ExpressionAttributeValues': {
+            ':status': status,
+            ':key': date if shard_key is None else shard_key
         }
-    )
-    
-    # Query for redeemed rewards
-    redeemed_rewards = table.query(
-        IndexName='status-date-index',
-        KeyConditionExpression='#status = :status AND #date = :date',
-        ExpressionAttributeNames={
+    }
+    while True:
+        response = client.query(**kwargs)
+        yield response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def reduce_status(
+    status: str,
+    date: str,
+    reducer: Callable[[Iterator[List[Dict[str, Any]]]], Any],
+    attributes: Sequence[str] = ('points',)
+) -> List[Any]:
+    """
+    Apply `reducer` to the pages of one status and date. With sharded reads it
+    runs once per shard of the date-shard index, all shards concurrently, and
+    the partial results are returned for the caller to merge.
+    """
+    if not sharding.SHARDED_READS:
+        return [reducer(query_pages(status, date, attributes))]
+    keys = sharding.date_shard_keys(date)
+    with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+        return list(executor.map(lambda key: reducer(query_pages(status, date, attributes, key)), keys))
+
+def status_totals(status: str, date: str) -> Tuple[float, int]:
+    parts = reduce_status(status, date, sum_pages)
+    return sum(total for total, _ in parts), sum(count for _, count in parts)
+
+def status_counters(status: str, date: str, dimensions: Optional[Sequence[str]] = None) -> rollups.Deltas:
+    """Every counter of one status and date, recomputed from the raw rows."""
+    return rollups.merge(reduce_status(
+        status, date, lambda pages: rollups.collect(itertools.chain.from_iterable(pages), dimensions), RAW_ATTRIBUTES
+    ))
+
+def scan_segment(segment: int, total_segments: int, start_date: str, end_date: str) -> Dict[Tuple[str, str], List[float]]:
+    """Totals per (date, status) for one segment of a parallel scan."""
+    client = dynamodb().meta.client
+    kwargs: Dict[str, Any] = {
+        'TableName': REWARDS_TABLE,
+        'Segment': segment,
+        'TotalSegments': total_segments,
+        'FilterExpression': '#date BETWEEN :start AND :end',
+        'ProjectionExpression': '#date, #status, #points',
+        'ExpressionAttributeNames': {
             '#status': 'status',
-            '#date': 'date'
+            '#date': 'date',
+            '#points': 'points'
         },
-        ExpressionAttributeValues={
-            ':status': 'REDEEMED',
-            ':date': date
+        'ExpressionAttributeValues': {
+            ':start': start_date,
+            ':end': end_date
         }
-    )
-    
-    # Calculate totals
-    total_issued = sum(float(item['points']) for item in issued_rewards.get('Items', []))
-    total_redeemed = sum(float(item['points']) for item in redeemed_rewards.get('Items', []))
-    
+    }
+    totals: Dict[Tuple[str, str], List[float]] = {}
+    while True:
+        response = client.scan(**kwargs)
+        for item in response.get('Items', []):
+            key = (item['date'], item['status'])
+            if key not in totals:
+                totals[key] = [0.0, 0]
+            totals[key][0] += float(item['points'])
+            totals[key][1] += 1
+        if 'LastEvaluatedKey' not in response:
+            return totals
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def build_summary(date: str, issued: Tuple[float, int], redeemed: Tuple[float, int]) -> Dict[str, Any]:
     return {
         'date': date,
-        'total_issued': total_issued,
-        'total_redeemed': total_redeemed,
-        'net_rewards': total_issued - total_redeemed,
-        'issued_count': len(issued_rewards.get('Items', [])),
-        'redeemed_count': len(redeemed_rewards.get('Items', []))
+        'total_issued': issued[0],
+        'total_redeemed': redeemed[0],
+        'net_rewards': issued[0] - redeemed[0],
+        'issued_count': issued[1],
+        'redeemed_count': redeemed[1]
+    }
+
+def scan_rewards(start_date: str, end_date: str, segments: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Aggregate every date from start_date to end_date (inclusive) with one
+    parallel scan of the table. For large backfills, where querying the GSI
+    date by date would read the same partitions many times over.
+    """
+    segments = segments or SCAN_SEGMENTS
+    totals: Dict[Tuple[str, str], List[float]] = {}
+    with ThreadPoolExecutor(max_workers=segments) as executor:
+        futures = [executor.submit(scan_segment, segment, segments, start_date, end_date) for segment in range(segments)]
+        for future in futures:
+            for key, (points, count) in future.result().items():
+                total = totals.setdefault(key, [0.0, 0])
+                total[0] += points
+                total[1] += count
+    dates = sorted({date for date, _ in totals})
+    return {
+        date: build_summary(date, tuple(totals.get((date, 'ISSUED'), (0.0, 0))), tuple(totals.get((date, 'REDEEMED'), (0.0, 0))))
+        for date in dates
+    }
+
+def aggregate_rewards(date: str) -> Dict[str, Any]:
+    """
+    Aggregate rewards data for the given date. The ISSUED and REDEEMED
+    queries run concurrently and are reduced page by page, so memory does
+    not grow with the number of rewards. With the rollup method, only the
+    daily counter shards are read, however many rewards there are.
+    """
+    if AGGREGATION_METHOD == 'scan':
+        return scan_rewards(date, date).get(date, build_summary(date, (0.0, 0), (0.0, 0)))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        if AGGREGATION_METHOD == 'rollup':
+            issued = executor.submit(rollups.read_totals, date, 'ISSUED')
+            redeemed = executor.submit(rollups.read_totals, date, 'REDEEMED')
+        else:
+            issued = executor.submit(status_totals, 'ISSUED', date)
+            redeemed = executor.submit(status_totals, 'REDEEMED', date)
+        return build_summary(date, issued.result(), redeemed.result())
+
+def reconcile_rollups(date: str, repair: bool = False) -> List[Dict[str, Any]]:
+    """
+    Recompute a day's rollup counters from the raw reward rows and report every
+    counter that drifted, e.g. after a failed rollup update or a redelivered
+    message. With `repair`, the difference is added back atomically, which is
+    safe while the consumer keeps writing. Meant for days that are complete.
+    """
+    drift = []
+    for status in ('ISSUED', 'REDEEMED'):
+        expected = {counter: value for (_, _, counter), value in status_counters(status, date).items()}
+        actual = rollups.read_counters(date, status)
+        for counter in sorted(expected.keys() | actual.keys()):
+            expected_points, expected_count = expected.get(counter, (0, 0))
+            actual_points, actual_count = actual.get(counter, (0, 0))
+            if (expected_points, expected_count) == (actual_points, actual_count):
+                continue
+            drift.append({
+                'date': date,
+                'status': status,
+                'counter': counter,
+                'expected_points': int(expected_points),
+                'expected_count': expected_count,
+                'actual_points': actual_points,
+                'actual_count': actual_count
+            })
+            if repair:
+                rollups.add(date, status, counter, expected_points - actual_points, expected_count - actual_count, shard=0)
+    for entry in drift:
+        logger.warning(f"Rollup drift for {entry['date']} {entry['status']} {entry['counter']}: "
+                       f"expected {entry['expected_points']} points in {entry['expected_count']} rewards, "
+                       f"found {entry['actual_points']} in {entry['actual_count']}")
+    return drift
+
+def sketch_summary(date: str) -> Dict[str, Any]:
+    """
+    Unique earners and the top merchants and categories by points, from the
+    day's sketches. Approximate, within the bounds documented in `sketches`.
+    """
+    day = sketches.read(date)
+    return {
+        'unique_earners': day['users'].count(),
+        'top_merchants': [{'merchant': key, 'points': points} for key, points in day['merchants'].top()],
+        'top_categories': [{'category': key, 'points': points} for key, points in day['categories'].top()]
     }
 
-def write_to_s3(data: Dict[str, Any], date: str) -> None:
-    """Write analytics data to S3."""
+def put_if_changed(key: str, body: bytes, content_type: str, content_encoding: Optional[str] = None) -> bool:
+    """
+    Write an object unless S3 already holds the same bytes, so reruns are
+    idempotent and cheap. Returns whether it was written.
+    """
+    client = s3()
+    from botocore.exceptions import ClientError  # already loaded by the client
+
+    try:
+        # Single-part uploads have the MD5 of their content as ETag
+        if client.head_object(Bucket=S3_BUCKET, Key=key)['ETag'].strip('"') == hashlib.md5(body).hexdigest():
+            return False
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey'):
+            raise
+    extra = {'ContentEncoding': content_encoding} if content_encoding else {}
+    client.put_object(Bucket=S3_BUCKET, Key=key, Body=body, ContentType=content_type, **extra)
+    return True
+
+def write_to_s3(data: Dict[str, Any], date: str) -> bool:
+    """Write analytics data to S3. Returns whether it changed."""
     key = f"{S3_PREFIX}/{date}.json"
-    s3.put_object(
-        Bucket=S3_BUCKET,
-        Key=key,
-        Body=json.dumps(data, indent=2),
-        ContentType='application/json'
-    )
+    if not put_if_changed(key, json.dumps(data, separators=(',', ':')).encode(), 'application/json'):
+        return False
     logger.info(f"Successfully wrote analytics data to s3://{S3_BUCKET}/{key}")
+    return True
+
+def date_range(start_date: str, end_date: str) -> List[str]:
+    start = datetime.strptime(start_date, '%Y-%m-%d')
+    days = (datetime.strptime(end_date, '%Y-%m-%d') - start).days
+    return [(start + timedelta(days=day)).strftime('%Y-%m-%d') for day in range(days + 1)]
+
+def build_breakdowns(date: str) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    The daily summary and one row per status and counter: the total and every
+    merchant, category and hour. Reduced page by page; memory grows with the
+    number of counters, not of rewards.
+    """
+    rows = []
+    totals = {}
+    for status in ('ISSUED', 'REDEEMED'):
+        collected = status_counters(status, date, BREAKDOWN_DIMENSIONS)
+        for (_, _, counter), (points, count) in sorted(collected.items()):
+            dimension, _, value = counter.partition('#')
+            rows.append({
+                'date': date,
+                'status': status,
+                'dimension': dimension,
+                'value': value or None,
+                'points': int(points),
+                'count': count
+            })
+        total = collected.get((date, status, rollups.TOTAL), (0, 0))
+        totals[status] = (float(total[0]), total[1])
+    return build_summary(date, totals['ISSUED'], totals['REDEEMED']), rows
+
+def write_breakdowns(rows: List[Dict[str, Any]], date: str) -> bool:
+    """
+    Write a day's breakdown rows as gzip NDJSON under a Hive-style date
+    partition (`date=YYYY-MM-DD/`), which Athena, Spark or DuckDB can prune.
+    """
+    body = ''.join(json.dumps(row, separators=(',', ':'), sort_keys=True) + '\n' for row in rows).encode()
+    # A fixed mtime keeps the compressed bytes identical across reruns
+    return put_if_changed(
+        f"{BREAKDOWN_PREFIX}/date={date}/breakdowns.ndjson.gz",
+        gzip.compress(body, mtime=0),
+        'application/x-ndjson',
+        'gzip'
+    )
+
+def backfill_date(date: str) -> bool:
+    """Aggregate one day and write its summary and breakdowns. Returns whether anything changed."""
+    summary, rows = build_breakdowns(date)
+    if sketches.SKETCHES_ENABLED:
+        summary.update(sketch_summary(date))
+    breakdowns_changed = write_breakdowns(rows, date)
+    summary_changed = write_to_s3(summary, date)
+    return breakdowns_changed or summary_changed
+
+def backfill(start_date: str, end_date: str, workers: Optional[int] = None) -> Dict[str, List[str]]:
+    """
+    Aggregate every date from start_date to end_date (inclusive), at most
+    `workers` dates at a time. Dates are independent and every object is
+    rewritten only when its content changed, so a failed or repeated backfill
+    can simply be run again.
+    """
+    result: Dict[str, List[str]] = {'written': [], 'unchanged': [], 'failed': []}
+    with ThreadPoolExecutor(max_workers=workers or BACKFILL_WORKERS) as executor:
+        futures = {date: executor.submit(backfill_date, date) for date in date_range(start_date, end_date)}
+        for date, future in futures.items():
+            try:
+                result['written' if future.result() else 'unchanged'].append(date)
+            except Exception as e:
+                logger.error(f"Error backfilling {date}: {str(e)}")
+                result['failed'].append(date)
+    logger.info(f"Backfilled {start_date} to {end_date}: {len(result['written'])} written, "
+                f"{len(result['unchanged'])} unchanged, {len(result['failed'])} failed")
+    return result
 
 def put_metrics(data: Dict[str, Any]) -> None:
     """Put metrics to CloudWatch."""
-    cloudwatch.put_metric_data(
+    cloudwatch().put_metric_data(
         Namespace='LoyaltyPlatform/Rewards',
         MetricData=[
             {
@@ -113,14 +373,38 @@ def put_metrics(data: Dict[str, Any]) -> None:
     logger.info("Successfully published metrics to CloudWatch")
 
 def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
-    """Main Lambda handler function."""
+    """
+    Main Lambda handler function. `{"mode": "reconcile", "date": ..., "repair": true}`
+    checks the rollups of a day (yesterday by default) instead, and
+    `{"mode": "backfill", "start_date": ..., "end_date": ...}` rebuilds a range of days.
+    """
     try:
+        if event.get('mode') == 'backfill':
+            result = backfill(event['start_date'], event.get('end_date') or get_yesterday_date(), event.get('workers'))
+            if result['failed']:
+                # Reruns skip what is already written, so a retry only redoes the failed dates
+                raise RuntimeError(f"Backfill failed for {', '.join(result['failed'])}")
+            return {
+                'statusCode': 200,
+                'body': json.dumps(result)
+            }
+
+        if event.get('mode') == 'reconcile':
+            date = event.get('date') or get_yesterday_date()
+            drift = reconcile_rollups(date, repair=event.get('repair', False))
+            return {
+                'statusCode': 200,
+                'body': json.dumps({'date': date, 'drift': drift})
+            }
+
         # Get yesterday's date
         date = get_yesterday_date()
         logger.info(f"Processing analytics for date: {date}")
         
         # Aggregate rewards data
         analytics_data = aggregate_rewards(date)
+        if sketches.SKETCHES_ENABLED:
+            analytics_data.update(sketch_summary(date))
         logger.info(f"Aggregated data: {json.dumps(analytics_data)}")
         
         # Write to S3
@@ -139,4 +423,21 @@ def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
         
     except Exception as e:
         logger.error(f"Error processing analytics: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
+
+def main() -> None:
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Backfill daily reward analytics for a range of dates')
+    parser.add_argument('--start-date', required=True)
+    parser.add_argument('--end-date', default=None, help='inclusive; defaults to yesterday')
+    parser.add_argument('--workers', type=int, default=BACKFILL_WORKERS)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+    result = backfill(args.start_date, args.end_date or get_yesterday_date(), args.workers)
+    print(json.dumps(result))
+    if result['failed']:
+        raise SystemExit(1)
+
+if __name__ == '__main__':
+    main()
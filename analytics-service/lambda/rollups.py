@@ -0,0 +1,127 @@
+import os
+import random
+import time
+from concurrent.futures import Executor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import aws_clients
+
+# Constants
+ROLLUPS_TABLE = os.getenv('ROLLUPS_TABLE', 'reward-rollups')
+ROLLUP_SHARDS = int(os.getenv('ROLLUP_SHARDS', '8'))  # counter items per day and status
+# Breakdowns kept next to the daily total; each costs one more update per batch
+ROLLUP_DIMENSIONS = [d for d in os.getenv('ROLLUP_DIMENSIONS', 'merchant,category,hour').split(',') if d]
+TOTAL = 'total'
+READ_MAX_RETRIES = int(os.getenv('ROLLUP_READ_MAX_RETRIES', '8'))
+READ_BASE_DELAY = float(os.getenv('ROLLUP_READ_BASE_DELAY', '0.05'))
+
+# (date, status, counter) -> [points, count]
+Deltas = Dict[Tuple[str, str, str], List[int]]
+
+def table() -> Any:
+    return aws_clients.resource('dynamodb').Table(ROLLUPS_TABLE)
+
+def partition_key(date: str, status: str, shard: int) -> str:
+    return f"{date}#{status}#{shard}"
+
+def counters(item: Dict[str, Any], dimensions: Optional[Sequence[str]] = None) -> List[str]:
+    """Counters a reward record adds to: the daily total and one per breakdown."""
+    names = [TOTAL]
+    for dimension in ROLLUP_DIMENSIONS if dimensions is None else dimensions:
+        if dimension == 'hour':
+            value = item['timestamp'][11:13]
+        else:
+            value = item.get(dimension) or 'Unknown'
+        names.append(f"{dimension}#{value}")
+    return names
+
+def collect(items: Iterable[Dict[str, Any]], dimensions: Optional[Sequence[str]] = None) -> Deltas:
+    """Sum a batch of reward records per counter, so each counter is updated once per batch."""
+    deltas: Deltas = {}
+    for item in items:
+        for counter in counters(item, dimensions):
+            delta = deltas.setdefault((item['date'], item['status'], counter), [0, 0])
+            delta[0] += item['points']
+            delta[1] += 1
+    return deltas
+
+def merge(parts: Iterable[Deltas]) -> Deltas:
+    """Combine deltas collected separately, e.g. per GSI shard."""
+    merged: Deltas = {}
+    for part in parts:
+        for key, (points, count) in part.items():
+            delta = merged.setdefault(key, [0, 0])
+            delta[0] += points
+            delta[1] += count
+    return merged
+
+def add(date: str, status: str, counter: str, points: int, count: int, shard: Optional[int] = None) -> None:
+    """
+    Atomically add to one counter. Writes go to a random shard, so a busy day
+    is spread over ROLLUP_SHARDS partition keys instead of one hot key.
+    """
+    shard = random.randrange(ROLLUP_SHARDS) if shard is None else shard
+    # The resource's client serializes plain Python values and is thread-safe
+    table().meta.client.update_item(
+        TableName=ROLLUPS_TABLE,
+        Key={'pk': partition_key(date, status, shard), 'counter': counter},
+        UpdateExpression='ADD #points :points, #count :count',
+        ExpressionAttributeNames={'#points': 'points', '#count': 'count'},
+        ExpressionAttributeValues={':points': points, ':count': count}
+    )
+
+def record(items: Iterable[Dict[str, Any]], executor: Optional[Executor] = None) -> int:
+    """Add a batch of written reward records to the rollups. Returns the number of updates."""
+    deltas = collect(items)
+    updates = [(date, status, counter, points, count) for (date, status, counter), (points, count) in deltas.items()]
+    if executor is None:
+        for update in updates:
+            add(*update)
+    else:
+        # Every update is submitted before the first failure, if any, is raised
+        list(executor.map(lambda update: add(*update), updates))
+    return len(updates)
+
+def read_totals(date: str, status: str) -> Tuple[float, int]:
+    """
+    (points, count) for a day and status: one BatchGetItem over the shards.
+    Unprocessed keys are retried with exponential backoff and jitter; a total
+    missing shards would be wrong, so running out of retries raises.
+    """
+    keys = [{'pk': partition_key(date, status, shard), 'counter': TOTAL} for shard in range(ROLLUP_SHARDS)]
+    client = table().meta.client
+    total, count = 0.0, 0
+    request = {ROLLUPS_TABLE: {'Keys': keys, 'ProjectionExpression': '#points, #count', 'ExpressionAttributeNames': {'#points': 'points', '#count': 'count'}}}
+    for attempt in range(READ_MAX_RETRIES + 1):
+        response = client.batch_get_item(RequestItems=request)
+        for item in response['Responses'].get(ROLLUPS_TABLE, []):
+            total += float(item['points'])
+            count += int(item['count'])
+        request = response.get('UnprocessedKeys')
+        if not request:
+            return total, count
+        if attempt < READ_MAX_RETRIES:
+            time.sleep(random.uniform(0, READ_BASE_DELAY * (2 ** attempt)))
+    unprocessed = len(request[ROLLUPS_TABLE]['Keys'])
+    raise RuntimeError(f"{unprocessed} rollup shards unprocessed after {READ_MAX_RETRIES} retries")
+
+def read_counters(date: str, status: str) -> Dict[str, List[int]]:
+    """Every counter of a day and status, summed over the shards."""
+    client = table().meta.client
+    found: Dict[str, List[int]] = {}
+    for shard in range(ROLLUP_SHARDS):
+        kwargs: Dict[str, Any] = {
+            'TableName': ROLLUPS_TABLE,
+            'KeyConditionExpression': 'pk = :pk',
+            'ExpressionAttributeValues': {':pk': partition_key(date, status, shard)}
+        }
+        while True:
+            response = client.query(**kwargs)
+            for item in response.get('Items', []):
+                counter = found.setdefault(item['counter'], [0, 0])
+                counter[0] += int(item['points'])
+                counter[1] += int(item['count'])
+            if 'LastEvaluatedKey' not in response:
+                break
+            kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return found
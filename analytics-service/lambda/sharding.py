@@ -0,0 +1,22 @@
+import os
+import zlib
+from typing import List
+
+# Reward rows carry `date_shard` = "<date>#<shard>", the partition key of the
+# `date-shard-index` GSI, so a day's writes are spread over GSI_SHARDS keys
+# instead of all landing on status=ISSUED of status-date-index. Readers query
+# every shard. The count may grow (old shards stay in range) but never shrink.
+GSI_SHARDS = int(os.getenv('GSI_SHARDS', '8'))
+SHARDED_INDEX = 'date-shard-index'
+# Read through the sharded index once existing rows are migrated
+SHARDED_READS = os.getenv('SHARDED_READS', 'false').lower() == 'true'
+
+def shard_for(user_id: str, shards: int = 0) -> int:
+    """Stable across processes, unlike hash(), so every writer agrees."""
+    return zlib.crc32(user_id.encode()) % (shards or GSI_SHARDS)
+
+def date_shard(date: str, user_id: str, shards: int = 0) -> str:
+    return f"{date}#{shard_for(user_id, shards)}"
+
+def date_shard_keys(date: str, shards: int = 0) -> List[str]:
+    return [f"{date}#{shard}" for shard in range(shards or GSI_SHARDS)]
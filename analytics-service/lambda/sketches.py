@@ -0,0 +1,243 @@
+"""
+Mergeable sketches of a day's issued rewards: a HyperLogLog of the users who
+earned points and Count-Min sketches with candidate sets of the merchants and
+categories with the most points. Their size is fixed, whatever the volume.
+
+Error bounds, with the defaults:
+- Unique users: standard error 1.04 / sqrt(2^SKETCH_HLL_PRECISION), i.e. 1.6%.
+- Points per merchant or category: never underestimated, and overestimated by
+  at most e / SKETCH_CMS_WIDTH (1.1%) of the day's points, with probability
+  1 - e^-SKETCH_CMS_DEPTH (98%) for each key.
+
+The consumer merges every batch into one of SKETCH_SHARDS items per day of the
+`reward-sketches` table, with a version check, and readers merge the shards.
+"""
+import hashlib
+import heapq
+import json
+import math
+import os
+import random
+import struct
+import zlib
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import aws_clients
+
+# Constants
+SKETCHES_ENABLED = os.getenv('SKETCHES_ENABLED', 'true').lower() == 'true'
+SKETCHES_TABLE = os.getenv('SKETCHES_TABLE', 'reward-sketches')
+SKETCH_SHARDS = int(os.getenv('SKETCH_SHARDS', '8'))  # items per day, to spread concurrent writers
+SKETCH_MAX_RETRIES = int(os.getenv('SKETCH_MAX_RETRIES', '8'))  # version conflicts before giving up
+SKETCH_HLL_PRECISION = 12  # 4096 one-byte registers
+SKETCH_CMS_WIDTH = 256
+SKETCH_CMS_DEPTH = 4
+SKETCH_TOP_K = int(os.getenv('SKETCH_TOP_K', '10'))
+SKETCH_CANDIDATES = 4 * SKETCH_TOP_K  # keys tracked so the top K survive merges
+FORMAT_VERSION = 1
+
+def hash64(value: str, salt: bytes = b'') -> int:
+    """Stable across processes, unlike hash(), so every writer's sketch merges."""
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8, salt=salt).digest(), 'big')
+
+class HyperLogLog:
+    """Distinct count estimator; merging is the union of the counted sets."""
+
+    def __init__(self, precision: int = SKETCH_HLL_PRECISION, registers: Optional[bytearray] = None):
+        self.precision = precision
+        self.registers = registers if registers is not None else bytearray(1 << precision)
+
+    def add(self, value: str) -> None:
+        h = hash64(value)
+        bits = 64 - self.precision
+        index = h >> bits
+        rank = bits - (h & ((1 << bits) - 1)).bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: 'HyperLogLog') -> None:
+        if other.precision != self.precision:
+            raise ValueError(f"Cannot merge HyperLogLog of precision {other.precision} into {self.precision}")
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -register for register in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            # Linear counting is more accurate for small sets
+            estimate = m * math.log(m / zeros)
+        return round(estimate)
+
+    def to_bytes(self) -> bytes:
+        return zlib.compress(struct.pack('>BB', FORMAT_VERSION, self.precision) + bytes(self.registers))
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'HyperLogLog':
+        data = zlib.decompress(blob)
+        _, precision = struct.unpack_from('>BB', data)
+        return cls(precision, bytearray(data[2:]))
+
+class CountMinSketch:
+    """Point estimates of per-key totals; never below the true total."""
+
+    def __init__(self, width: int = SKETCH_CMS_WIDTH, depth: int = SKETCH_CMS_DEPTH, counters: Optional[array] = None):
+        self.width = width
+        self.depth = depth
+        self.counters = counters if counters is not None else array('Q', bytes(8 * width * depth))
+
+    def cells(self, key: str) -> List[int]:
+        # Double hashing: depth independent-enough rows from one digest
+        h1, h2 = hash64(key), hash64(key, salt=b'cms') | 1
+        return [row * self.width + (h1 + row * h2) % self.width for row in range(self.depth)]
+
+    def add(self, key: str, weight: int = 1) -> None:
+        for cell in self.cells(key):
+            self.counters[cell] += weight
+
+    def estimate(self, key: str) -> int:
+        return min(self.counters[cell] for cell in self.cells(key))
+
+    def merge(self, other: 'CountMinSketch') -> None:
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError(f"Cannot merge a {other.width}x{other.depth} Count-Min sketch into {self.width}x{self.depth}")
+        self.counters = array('Q', map(sum, zip(self.counters, other.counters)))
+
+class HeavyHitters:
+    """A Count-Min sketch and the keys with the largest estimates seen so far."""
+
+    def __init__(self, capacity: int = SKETCH_CANDIDATES, sketch: Optional[CountMinSketch] = None, keys: Iterable[str] = ()):
+        self.capacity = capacity
+        self.sketch = sketch or CountMinSketch()
+        self.candidates = {key: self.sketch.estimate(key) for key in keys}
+
+    def add(self, key: str, weight: int = 1) -> None:
+        self.sketch.add(key, weight)
+        estimate = self.sketch.estimate(key)
+        if key in self.candidates or len(self.candidates) < self.capacity:
+            self.candidates[key] = estimate
+            return
+        smallest = min(self.candidates, key=self.candidates.__getitem__)
+        if estimate > self.candidates[smallest]:
+            del self.candidates[smallest]
+            self.candidates[key] = estimate
+
+    def merge(self, other: 'HeavyHitters') -> None:
+        self.sketch.merge(other.sketch)
+        # Re-estimate both candidate sets against the merged counters
+        estimates = {key: self.sketch.estimate(key) for key in self.candidates.keys() | other.candidates.keys()}
+        self.candidates = dict(heapq.nlargest(self.capacity, estimates.items(), key=lambda entry: (entry[1], entry[0])))
+
+    def top(self, n: int = SKETCH_TOP_K) -> List[Tuple[str, int]]:
+        return heapq.nlargest(n, self.candidates.items(), key=lambda entry: (entry[1], entry[0]))
+
+    def to_bytes(self) -> bytes:
+        sketch = self.sketch
+        header = struct.pack('>BHHH', FORMAT_VERSION, sketch.width, sketch.depth, self.capacity)
+        counters = struct.pack(f'<{len(sketch.counters)}Q', *sketch.counters)
+        keys = json.dumps(sorted(self.candidates), separators=(',', ':')).encode()
+        return zlib.compress(header + counters + keys)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> 'HeavyHitters':
+        data = zlib.decompress(blob)
+        _, width, depth, capacity = struct.unpack_from('>BHHH', data)
+        offset = struct.calcsize('>BHHH')
+        end = offset + 8 * width * depth
+        counters = array('Q', struct.unpack(f'<{width * depth}Q', data[offset:end]))
+        return cls(capacity, CountMinSketch(width, depth, counters), json.loads(data[end:]))
+
+# One day's sketches: unique users, points by merchant and by category
+DaySketches = Dict[str, Any]
+DECODERS = {'users': HyperLogLog.from_bytes, 'merchants': HeavyHitters.from_bytes, 'categories': HeavyHitters.from_bytes}
+
+def empty() -> DaySketches:
+    return {'users': HyperLogLog(), 'merchants': HeavyHitters(), 'categories': HeavyHitters()}
+
+def merge(target: DaySketches, source: DaySketches) -> DaySketches:
+    for name, sketch in source.items():
+        target[name].merge(sketch)
+    return target
+
+def collect(items: Iterable[Dict[str, Any]]) -> Dict[str, DaySketches]:
+    """Sketch a batch of reward records per date. Only issued rewards are counted."""
+    totals: Dict[str, Dict[str, Dict[str, int]]] = {}
+    by_date: Dict[str, DaySketches] = {}
+    for item in items:
+        if item['status'] != 'ISSUED':
+            continue
+        day = by_date.setdefault(item['date'], empty())
+        day['users'].add(item['user_id'])
+        # Summed first, so each key hits the sketch once per batch
+        points = totals.setdefault(item['date'], {'merchants': {}, 'categories': {}})
+        for name, attribute in (('merchants', 'merchant'), ('categories', 'category')):
+            key = item.get(attribute) or 'Unknown'
+            points[name][key] = points[name].get(key, 0) + int(item['points'])
+    for date, points in totals.items():
+        for name, weights in points.items():
+            for key, weight in weights.items():
+                by_date[date][name].add(key, weight)
+    return by_date
+
+def table_client() -> Any:
+    return aws_clients.resource('dynamodb').meta.client
+
+def decode(item: Dict[str, Any]) -> DaySketches:
+    # The resource's client returns Binary attributes as boto3 Binary wrappers
+    return {name: decoder(getattr(item[name], 'value', item[name])) for name, decoder in DECODERS.items()}
+
+def save(date: str, day: DaySketches, shard: Optional[int] = None) -> None:
+    """
+    Merge `day` into one shard of the date: read, merge and write back with a
+    version check, retrying when another writer got there first.
+    """
+    from botocore.exceptions import ClientError  # already loaded by the client
+
+    client = table_client()
+    shard = random.randrange(SKETCH_SHARDS) if shard is None else shard
+    key = {'date': date, 'shard': shard}
+    for _ in range(SKETCH_MAX_RETRIES + 1):
+        stored = client.get_item(TableName=SKETCHES_TABLE, Key=key, ConsistentRead=True).get('Item')
+        # Merged into the stored copy, so `day` is unchanged for a retry
+        merged = merge(decode(stored), day) if stored else day
+        version = int(stored['version']) if stored else 0
+        try:
+            client.put_item(
+                TableName=SKETCHES_TABLE,
+                Item={**key, 'version': version + 1, **{name: sketch.to_bytes() for name, sketch in merged.items()}},
+                ConditionExpression='attribute_not_exists(#version) OR #version = :version',
+                ExpressionAttributeNames={'#version': 'version'},
+                ExpressionAttributeValues={':version': version}
+            )
+            return
+        except ClientError as e:
+            if e.response['Error']['Code'] != 'ConditionalCheckFailedException':
+                raise
+    raise RuntimeError(f"Sketches of {date} shard {shard} kept changing; gave up after {SKETCH_MAX_RETRIES} retries")
+
+def record(items: Iterable[Dict[str, Any]]) -> int:
+    """Merge a batch of written reward records into the day sketches. Returns the number of days."""
+    by_date = collect(items)
+    for date, day in by_date.items():
+        save(date, day)
+    return len(by_date)
+
+def read(date: str) -> DaySketches:
+    """A day's sketches, merged over the shards. Empty when nothing was recorded."""
+    client = table_client()
+    day = empty()
+    kwargs: Dict[str, Any] = {
+        'TableName': SKETCHES_TABLE,
+        'KeyConditionExpression': '#date = :date',
+        'ExpressionAttributeNames': {'#date': 'date'},
+        'ExpressionAttributeValues': {':date': date}
+    }
+    while True:
+        response = client.query(**kwargs)
+        for item in response.get('Items', []):
+            merge(day, decode(item))
+        if 'LastEvaluatedKey' not in response:
+            return day
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
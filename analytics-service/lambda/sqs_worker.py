@@ -0,0 +1,321 @@
+"""
+Long-running SQS worker for the event consumer.
+
+Runs the same reward issuing logic as the Lambda (`event_consumer.process_batch`)
+in a standalone process, for draining the queue faster than Lambda concurrency
+allows:
+
+    cd lambda && python -m sqs_worker --queue-url https://sqs...
+"""
+import argparse
+import logging
+import os
+import queue
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+import boto3
+from botocore.config import Config
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+import event_consumer
+
+# Configure logging
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+# Constants
+QUEUE_URL = os.getenv('QUEUE_URL', '')
+SQS_ENDPOINT_URL = os.getenv('SQS_ENDPOINT_URL')  # e.g. moto server or ElasticMQ
+RECEIVER_THREADS = int(os.getenv('RECEIVER_THREADS', '2'))
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', '4'))
+PREFETCH = int(os.getenv('PREFETCH', '100'))  # received messages buffered ahead of the workers
+WORKER_BATCH_SIZE = int(os.getenv('WORKER_BATCH_SIZE', '25'))  # messages per process_batch call
+VISIBILITY_TIMEOUT = int(os.getenv('VISIBILITY_TIMEOUT', '30'))
+WAIT_TIME_SECONDS = int(os.getenv('WAIT_TIME_SECONDS', '20'))
+METRICS_PORT = int(os.getenv('METRICS_PORT', '9102'))
+SQS_BATCH_SIZE = 10  # SQS limit for receive, delete and change visibility batches
+
+# Initialize Prometheus metrics
+messages_total = Counter(
+    'reward_worker_messages_total',
+    'Messages handled by the SQS worker',
+    ['result']  # processed, failed or malformed
+)
+
+receives_total = Counter(
+    'reward_worker_receives_total',
+    'ReceiveMessage calls',
+    ['result']  # messages, empty or error
+)
+
+message_lag = Histogram(
+    'reward_worker_message_lag_seconds',
+    'Time from the message being sent to SQS until it was processed',
+    buckets=[0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900]
+)
+
+batch_seconds = Histogram(
+    'reward_worker_batch_seconds',
+    'Time taken to process one batch of messages'
+)
+
+prefetched = Gauge(
+    'reward_worker_prefetched_messages',
+    'Received messages waiting for a worker'
+)
+
+in_flight = Gauge(
+    'reward_worker_in_flight_messages',
+    'Received messages not yet deleted or released'
+)
+
+visibility_extensions = Counter(
+    'reward_worker_visibility_extensions_total',
+    'Messages whose visibility timeout was extended'
+)
+
+def chunks(items: List[Any], size: int = SQS_BATCH_SIZE) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+class SQSWorker:
+    """
+    Receiver threads long-poll SQS and fill a bounded prefetch buffer; worker
+    threads take up to WORKER_BATCH_SIZE messages from it, issue the rewards
+    and delete the successful messages in batches of 10. Failed and malformed
+    messages are left alone, so they reappear after the visibility timeout and
+    eventually reach the dead letter queue, as with the Lambda.
+
+    A heartbeat thread extends the visibility timeout of every message held
+    for more than half of it, buffered or being processed, so slow batches are
+    not redelivered to another consumer.
+
+    Delivery is at least once, as with the Lambda: a message whose rewards
+    were stored but which could not be deleted is processed again.
+    """
+
+    def __init__(
+        self,
+        queue_url: str,
+        sqs: Any = None,
+        receivers: int = RECEIVER_THREADS,
+        workers: int = WORKER_THREADS,
+        prefetch: int = PREFETCH,
+        batch_size: int = WORKER_BATCH_SIZE,
+        visibility_timeout: int = VISIBILITY_TIMEOUT,
+        wait_time: int = WAIT_TIME_SECONDS
+    ):
+        self.queue_url = queue_url
+        self.sqs = sqs or boto3.client(
+            'sqs',
+            endpoint_url=SQS_ENDPOINT_URL,
+            config=Config(max_pool_connections=receivers + workers + 1)
+        )
+        self.receivers = receivers
+        self.workers = workers
+        self.batch_size = batch_size
+        self.visibility_timeout = visibility_timeout
+        self.wait_time = wait_time
+        self.buffer: queue.Queue = queue.Queue(maxsize=max(prefetch, SQS_BATCH_SIZE))
+        self.stopping = threading.Event()
+        self.finished = threading.Event()
+        # receipt handle -> time its visibility timeout runs out
+        self.deadlines: Dict[str, float] = {}
+        self.lock = threading.Lock()
+        self.receiver_threads: List[threading.Thread] = []
+        self.worker_threads: List[threading.Thread] = []
+        self.heartbeat_thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.receiver_threads = [threading.Thread(target=self.receive_loop, name=f'receiver-{i}') for i in range(self.receivers)]
+        self.worker_threads = [threading.Thread(target=self.work_loop, name=f'worker-{i}') for i in range(self.workers)]
+        self.heartbeat_thread = threading.Thread(target=self.heartbeat_loop, name='heartbeat')
+        for thread in self.receiver_threads + self.worker_threads + [self.heartbeat_thread]:
+            thread.start()
+        logger.info(f"Worker started on {self.queue_url} with {self.receivers} receivers and {self.workers} workers")
+
+    def stop(self) -> None:
+        """Stop receiving; buffered and in-progress messages are still processed."""
+        self.stopping.set()
+
+    def join(self) -> None:
+        for thread in self.receiver_threads:
+            thread.join()
+        # Receivers are done, so the sentinels queue up behind every buffered message
+        for _ in self.worker_threads:
+            self.buffer.put(None)
+        for thread in self.worker_threads:
+            thread.join()
+        self.finished.set()
+        self.heartbeat_thread.join()
+        logger.info("Worker stopped")
+
+    def run(self) -> None:
+        self.start()
+        while not self.stopping.wait(1):
+            pass
+        self.join()
+
+    def track(self, receipt_handle: str) -> None:
+        with self.lock:
+            self.deadlines[receipt_handle] = time.time() + self.visibility_timeout
+            in_flight.set(len(self.deadlines))
+
+    def untrack(self, receipt_handles: List[str]) -> None:
+        with self.lock:
+            for receipt_handle in receipt_handles:
+                self.deadlines.pop(receipt_handle, None)
+            in_flight.set(len(self.deadlines))
+
+    def receive_loop(self) -> None:
+        while not self.stopping.is_set():
+            try:
+                response = self.sqs.receive_message(
+                    QueueUrl=self.queue_url,
+                    MaxNumberOfMessages=SQS_BATCH_SIZE,
+                    WaitTimeSeconds=self.wait_time,
+                    VisibilityTimeout=self.visibility_timeout,
+                    AttributeNames=['SentTimestamp'],
+                    # Only present with raw message delivery; see events.decode
+                    MessageAttributeNames=['schema_version', 'content_encoding']
+                )
+            except Exception as e:
+                receives_total.labels(result='error').inc()
+                logger.error(f"Error receiving messages: {str(e)}")
+                self.stopping.wait(1)
+                continue
+            messages = response.get('Messages', [])
+            receives_total.labels(result='messages' if messages else 'empty').inc()
+            for message in messages:
+                self.track(message['ReceiptHandle'])
+                # Blocks while the buffer is full, which stops this receiver polling
+                self.buffer.put(message)
+                prefetched.set(self.buffer.qsize())
+
+    def next_batch(self) -> Optional[List[Dict[str, Any]]]:
+        """Wait for one message, then take whatever else is buffered, up to batch_size."""
+        message = self.buffer.get()
+        if message is None:
+            return None
+        batch = [message]
+        while len(batch) < self.batch_size:
+            try:
+                message = self.buffer.get_nowait()
+            except queue.Empty:
+                break
+            if message is None:
+                # Leave the sentinel for this worker's next call
+                self.buffer.put(None)
+                break
+            batch.append(message)
+        prefetched.set(self.buffer.qsize())
+        return batch
+
+    def work_loop(self) -> None:
+        while True:
+            batch = self.next_batch()
+            if batch is None:
+                return
+            try:
+                self.process(batch)
+            except Exception as e:
+                # Unprocessed messages become visible again after the timeout
+                logger.error(f"Error processing {len(batch)} messages: {str(e)}")
+                self.untrack([message['ReceiptHandle'] for message in batch])
+
+    def process(self, batch: List[Dict[str, Any]]) -> None:
+        started = time.time()
+        entries = []
+        failed_ids = set()
+        for message in batch:
+            try:
+                entries.append((message['MessageId'], event_consumer.parse_record({'body': message['Body'], 'messageAttributes': message.get('MessageAttributes', {})})))
+            except Exception as e:
+                logger.error(f"Malformed SQS message {message['MessageId']}: {str(e)}")
+                messages_total.labels(result='malformed').inc()
+                failed_ids.add(message['MessageId'])
+
+        failed = set(event_consumer.process_batch(entries))
+        failed_ids |= failed
+        messages_total.labels(result='failed').inc(len(failed))
+        done = [message for message in batch if message['MessageId'] not in failed_ids]
+        messages_total.labels(result='processed').inc(len(done))
+        for message in done:
+            message_lag.observe(max(0.0, started - int(message['Attributes']['SentTimestamp']) / 1000))
+
+        self.delete(done)
+        self.untrack([message['ReceiptHandle'] for message in batch])
+        batch_seconds.observe(time.time() - started)
+
+    def delete(self, messages: List[Dict[str, Any]]) -> None:
+        for group in chunks(messages):
+            response = self.sqs.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[{'Id': str(i), 'ReceiptHandle': message['ReceiptHandle']} for i, message in enumerate(group)]
+            )
+            for failure in response.get('Failed', []):
+                # The message will be redelivered and its reward issued again: reward rows
+                # are keyed by user_id and issue time, so delivery is at least once
+                logger.warning(f"Could not delete message {group[int(failure['Id'])]['MessageId']}: {failure.get('Message')}")
+
+    def heartbeat_loop(self) -> None:
+        # Runs until the workers are done, so it also covers the drain on shutdown
+        while not self.finished.wait(max(self.visibility_timeout / 3, 0.1)):
+            self.extend_visibility()
+
+    def extend_visibility(self) -> None:
+        """Extend messages that have less than half of their visibility timeout left."""
+        now = time.time()
+        with self.lock:
+            due = [handle for handle, deadline in self.deadlines.items() if deadline - now < self.visibility_timeout / 2]
+        for group in chunks(due):
+            try:
+                response = self.sqs.change_message_visibility_batch(
+                    QueueUrl=self.queue_url,
+                    Entries=[
+                        {'Id': str(i), 'ReceiptHandle': handle, 'VisibilityTimeout': self.visibility_timeout}
+                        for i, handle in enumerate(group)
+                    ]
+                )
+            except Exception as e:
+                logger.error(f"Error extending visibility of {len(group)} messages: {str(e)}")
+                continue
+            failed = {int(failure['Id']) for failure in response.get('Failed', [])}
+            extended = [handle for i, handle in enumerate(group) if i not in failed]
+            with self.lock:
+                for handle in extended:
+                    # Skip messages deleted in the meantime
+                    if handle in self.deadlines:
+                        self.deadlines[handle] = now + self.visibility_timeout
+            visibility_extensions.inc(len(extended))
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Issue rewards from SQS in a long-running process')
+    parser.add_argument('--queue-url', default=QUEUE_URL, required=not QUEUE_URL)
+    parser.add_argument('--receivers', type=int, default=RECEIVER_THREADS)
+    parser.add_argument('--workers', type=int, default=WORKER_THREADS)
+    parser.add_argument('--prefetch', type=int, default=PREFETCH)
+    parser.add_argument('--batch-size', type=int, default=WORKER_BATCH_SIZE)
+    parser.add_argument('--visibility-timeout', type=int, default=VISIBILITY_TIMEOUT)
+    parser.add_argument('--metrics-port', type=int, default=METRICS_PORT)
+    args = parser.parse_args()
+
+    logging.basicConfig(format='%(asctime)s %(threadName)s %(levelname)s %(message)s')
+    start_http_server(args.metrics_port)
+    worker = SQSWorker(
+        args.queue_url,
+        receivers=args.receivers,
+        workers=args.workers,
+        prefetch=args.prefetch,
+        batch_size=args.batch_size,
+        visibility_timeout=args.visibility_timeout
+    )
+    # Stop receiving on SIGTERM/SIGINT and finish what was already received
+    signal.signal(signal.SIGTERM, lambda signum, frame: worker.stop())
+    signal.signal(signal.SIGINT, lambda signum, frame: worker.stop())
+    worker.run()
+
+if __name__ == '__main__':
+    main()
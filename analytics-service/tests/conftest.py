@@ -0,0 +1,39 @@
+import os
+import sys
+
+import boto3
+import pytest
+from moto import mock_cloudwatch, mock_dynamodb, mock_s3
+
+from tables import create_rewards_table, create_rollups_table, create_sketches_table
+
+# The Lambda sources live in lambda/, which is not an importable package name
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'lambda'))
+
+# Mocked AWS credentials for moto; set before the Lambda modules create clients
+os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+os.environ['AWS_SESSION_TOKEN'] = 'testing'
+os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+@pytest.fixture
+def dynamodb():
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        create_rewards_table(dynamodb)
+        create_rollups_table(dynamodb)
+        create_sketches_table(dynamodb)
+        yield dynamodb
+
+@pytest.fixture
+def cloudwatch():
+    with mock_cloudwatch():
+        yield boto3.client('cloudwatch')
+
+@pytest.fixture
+def s3():
+    with mock_s3():
+        s3 = boto3.client('s3')
+        s3.create_bucket(Bucket='loyalty-platform-analytics')
+        yield s3
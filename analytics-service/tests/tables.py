@@ -0,0 +1,68 @@
+"""
+Definitions of the analytics DynamoDB tables, for moto and local DynamoDB.
+Used by the tests and the benchmarks; kept out of lambda/ so it is never
+packaged with the functions.
+"""
+
+def create_rewards_table(dynamodb):
+    return dynamodb.create_table(
+        TableName='rewards',
+        KeySchema=[
+            {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+            {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'S'},
+            {'AttributeName': 'status', 'AttributeType': 'S'},
+            {'AttributeName': 'date', 'AttributeType': 'S'},
+            {'AttributeName': 'date_shard', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[
+            {
+                'IndexName': 'status-date-index',
+                'KeySchema': [
+                    {'AttributeName': 'status', 'KeyType': 'HASH'},
+                    {'AttributeName': 'date', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            },
+            {
+                'IndexName': 'date-shard-index',
+                'KeySchema': [
+                    {'AttributeName': 'date_shard', 'KeyType': 'HASH'},
+                    {'AttributeName': 'status', 'KeyType': 'RANGE'}
+                ],
+                'Projection': {'ProjectionType': 'ALL'}
+            }
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+def create_rollups_table(dynamodb):
+    return dynamodb.create_table(
+        TableName='reward-rollups',
+        KeySchema=[
+            {'AttributeName': 'pk', 'KeyType': 'HASH'},
+            {'AttributeName': 'counter', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'pk', 'AttributeType': 'S'},
+            {'AttributeName': 'counter', 'AttributeType': 'S'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+def create_sketches_table(dynamodb):
+    return dynamodb.create_table(
+        TableName='reward-sketches',
+        KeySchema=[
+            {'AttributeName': 'date', 'KeyType': 'HASH'},
+            {'AttributeName': 'shard', 'KeyType': 'RANGE'}
+        ],
+        AttributeDefinitions=[
+            {'AttributeName': 'date', 'AttributeType': 'S'},
+            {'AttributeName': 'shard', 'AttributeType': 'N'}
+        ],
+        BillingMode='PAY_PER_REQUEST'
+    )
@@ -0,0 +1,27 @@
+import os
+import subprocess
+import sys
+import threading
+
+import aws_clients
+
+LAMBDA_DIR = os.path.join(os.path.dirname(__file__), '..', 'lambda')
+
+def test_clients_are_cached():
+    assert aws_clients.client('sqs') is aws_clients.client('sqs')
+    assert aws_clients.resource('dynamodb') is aws_clients.resource('dynamodb')
+    assert aws_clients.client('sqs', max_pool_connections=20) is not aws_clients.client('sqs')
+
+def test_concurrent_first_use_creates_one_client():
+    created = []
+    threads = [threading.Thread(target=lambda: created.append(aws_clients.client('sns'))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len({id(client) for client in created}) == 1
+
+def test_handlers_do_not_import_boto3_at_import_time():
+    code = "import sys, event_consumer, reward_analytics; print('boto3' in sys.modules, 'botocore' in sys.modules)"
+    output = subprocess.run([sys.executable, '-c', code], cwd=LAMBDA_DIR, check=True, capture_output=True, text=True).stdout
+    assert output.split() == ['False', 'False']
@@ -0,0 +1,91 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+import reward_analytics
+from test_reward_analytics import put_rewards
+
+BUCKET = 'loyalty-platform-analytics'
+DATES = ['2024-03-01', '2024-03-02', '2024-03-03']
+
+@pytest.fixture
+def rewards(dynamodb):
+    put_rewards(dynamodb, [(date, 'ISSUED', 10 * (day + 1)) for day, date in enumerate(DATES) for _ in range(5)])
+    put_rewards(dynamodb, [('2024-03-02', 'REDEEMED', 15)])
+    return dynamodb
+
+def read_rows(s3, date):
+    body = s3.get_object(Bucket=BUCKET, Key=f'reward-breakdowns/date={date}/breakdowns.ndjson.gz')['Body'].read()
+    return [json.loads(line) for line in gzip.decompress(body).decode().splitlines()]
+
+def test_backfill_writes_partitioned_breakdowns(rewards, s3):
+    result = reward_analytics.backfill(DATES[0], DATES[-1], workers=2)
+    assert result == {'written': DATES, 'unchanged': [], 'failed': []}
+
+    keys = sorted(obj['Key'] for obj in s3.list_objects_v2(Bucket=BUCKET)['Contents'])
+    assert keys == [f'daily-rewards/{date}.json' for date in DATES] + \
+        [f'reward-breakdowns/date={date}/breakdowns.ndjson.gz' for date in DATES]
+
+    rows = read_rows(s3, '2024-03-02')
+    by_counter = {(row['status'], row['dimension'], row['value']): (row['points'], row['count']) for row in rows}
+    assert by_counter[('ISSUED', 'total', None)] == (100, 5)
+    assert by_counter[('REDEEMED', 'total', None)] == (15, 1)
+    assert by_counter[('ISSUED', 'hour', '00')] == (100, 5)
+    # put_rewards leaves merchant and category unset
+    assert by_counter[('ISSUED', 'merchant', 'Unknown')] == (100, 5)
+
+    summary = json.loads(s3.get_object(Bucket=BUCKET, Key='daily-rewards/2024-03-02.json')['Body'].read())
+    assert summary['net_rewards'] == 85
+
+def test_rerun_is_idempotent(rewards, s3, monkeypatch):
+    reward_analytics.backfill(DATES[0], DATES[-1])
+    before = {date: s3.get_object(Bucket=BUCKET, Key=f'reward-breakdowns/date={date}/breakdowns.ndjson.gz')['Body'].read() for date in DATES}
+
+    puts = []
+    put_object = s3.put_object
+    client = reward_analytics.s3()
+    monkeypatch.setattr(client, 'put_object', lambda **kwargs: puts.append(kwargs['Key']) or put_object(**kwargs))
+
+    assert reward_analytics.backfill(DATES[0], DATES[-1]) == {'written': [], 'unchanged': DATES, 'failed': []}
+    assert puts == []
+
+    # New data for one day rewrites only that day
+    put_rewards(rewards, [('2024-03-03', 'REDEEMED', 5)])
+    assert reward_analytics.backfill(DATES[0], DATES[-1])['written'] == ['2024-03-03']
+    assert sorted(puts) == ['daily-rewards/2024-03-03.json', 'reward-breakdowns/date=2024-03-03/breakdowns.ndjson.gz']
+    assert read_rows(s3, '2024-03-01') == [json.loads(line) for line in gzip.decompress(before['2024-03-01']).decode().splitlines()]
+
+def test_parallelism_is_bounded_and_failures_are_isolated(rewards, s3, monkeypatch):
+    active = []
+    peak = []
+    lock = threading.Lock()
+    build_breakdowns = reward_analytics.build_breakdowns
+
+    def tracked(date):
+        with lock:
+            active.append(date)
+            peak.append(len(active))
+        try:
+            time.sleep(0.05)
+            if date == '2024-03-04':
+                raise RuntimeError('throttled')
+            return build_breakdowns(date)
+        finally:
+            with lock:
+                active.remove(date)
+
+    monkeypatch.setattr(reward_analytics, 'build_breakdowns', tracked)
+    result = reward_analytics.backfill('2024-03-01', '2024-03-06', workers=2)
+
+    assert max(peak) == 2
+    assert result['failed'] == ['2024-03-04']
+    assert len(result['written']) == 5
+
+def test_backfill_handler(rewards, s3):
+    event = {'mode': 'backfill', 'start_date': DATES[0], 'end_date': DATES[1]}
+    response = reward_analytics.lambda_handler(event, None)
+    assert json.loads(response['body'])['written'] == DATES[:2]
+    assert json.loads(reward_analytics.lambda_handler(event, None)['body'])['unchanged'] == DATES[:2]
@@ -0,0 +1,202 @@
+import json
+import threading
+import time
+
+import pytest
+
+import event_consumer
+import events
+
+def sqs_event(transactions):
+    return {'Records': [
+        {'messageId': f'msg-{i}', 'body': json.dumps({'Message': json.dumps(transaction)})}
+        for i, transaction in enumerate(transactions)
+    ]}
+
+def make_transactions(n, users=None):
+    return [
+        {
+            'transaction_id': f'tx-{i}',
+            'user_id': f'user{i % (users or n)}',
+            'amount': 10 + i,
+            'merchant': 'Test Store',
+            'category': 'groceries'
+        }
+        for i in range(n)
+    ]
+
+def failed_ids(response):
+    return [failure['itemIdentifier'] for failure in response['batchItemFailures']]
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(event_consumer, 'BATCH_WRITE_BASE_DELAY', 0)
+
+def test_handler_writes_whole_batch(dynamodb, cloudwatch):
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(60)), None)
+    assert response == {'batchItemFailures': []}
+
+    items = dynamodb.Table('rewards').scan()['Items']
+    assert len(items) == 60
+    assert sorted(int(item['points']) for item in items) == list(range(10, 70))
+    assert {item['status'] for item in items} == {'ISSUED'}
+
+def test_unprocessed_items_are_retried(dynamodb, cloudwatch, monkeypatch):
+    client = event_consumer.dynamodb().meta.client
+    real_batch_write = client.batch_write_item
+    calls = []
+
+    def flaky_batch_write(RequestItems):
+        calls.append(len(RequestItems['rewards']))
+        requests = RequestItems['rewards']
+        if len(calls) == 1:
+            # Accept the first part, hand the rest back as unprocessed
+            real_batch_write(RequestItems={'rewards': requests[:10]})
+            return {'UnprocessedItems': {'rewards': requests[10:]}}
+        return real_batch_write(RequestItems=RequestItems)
+
+    monkeypatch.setattr(client, 'batch_write_item', flaky_batch_write)
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(25)), None)
+
+    assert failed_ids(response) == []
+    assert calls == [25, 15]
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 25
+
+def test_only_failed_messages_are_reported(dynamodb, cloudwatch, monkeypatch):
+    client = event_consumer.dynamodb().meta.client
+    real_batch_write = client.batch_write_item
+
+    def throttle_user3(RequestItems):
+        requests = RequestItems['rewards']
+        stuck = [r for r in requests if r['PutRequest']['Item']['user_id'] == 'user3']
+        rest = [r for r in requests if r not in stuck]
+        if rest:
+            real_batch_write(RequestItems={'rewards': rest})
+        return {'UnprocessedItems': {'rewards': stuck} if stuck else {}}
+
+    monkeypatch.setattr(client, 'batch_write_item', throttle_user3)
+    event = sqs_event(make_transactions(10))
+    event['Records'][5]['body'] = 'not json'
+
+    response = event_consumer.lambda_handler(event, None)
+
+    assert sorted(failed_ids(response)) == ['msg-3', 'msg-5']
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 8
+
+def test_user_records_stay_in_order_after_failure(dynamodb, cloudwatch, monkeypatch):
+    client = event_consumer.dynamodb().meta.client
+    real_batch_write = client.batch_write_item
+    written = []
+
+    def fail_first_user0(RequestItems):
+        requests = RequestItems['rewards']
+        ok = [r for r in requests if r['PutRequest']['Item']['transaction_id'] != 'tx-0']
+        written.extend(r['PutRequest']['Item']['transaction_id'] for r in ok)
+        if ok:
+            real_batch_write(RequestItems={'rewards': ok})
+        return {'UnprocessedItems': {'rewards': [r for r in requests if r not in ok]}}
+
+    monkeypatch.setattr(client, 'batch_write_item', fail_first_user0)
+    # Three users, three records each: user0's later records must not overtake tx-0
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(9, users=3)), None)
+
+    assert sorted(failed_ids(response)) == ['msg-0', 'msg-3', 'msg-6']
+    assert written == ['tx-1', 'tx-2', 'tx-4', 'tx-5', 'tx-7', 'tx-8']
+
+def test_connection_error_fails_only_unwritten_rounds(dynamodb, cloudwatch, monkeypatch):
+    from botocore.exceptions import EndpointConnectionError
+
+    client = event_consumer.dynamodb().meta.client
+    real_batch_write = client.batch_write_item
+    calls = []
+
+    def drop_connection_in_round2(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) == 2:
+            raise EndpointConnectionError(endpoint_url='https://dynamodb.us-east-1.amazonaws.com')
+        return real_batch_write(RequestItems=RequestItems)
+
+    monkeypatch.setattr(client, 'batch_write_item', drop_connection_in_round2)
+    # One user, three records: round 1 writes tx-0, round 2 fails
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(3, users=1)), None)
+
+    assert failed_ids(response) == ['msg-1', 'msg-2']
+    items = dynamodb.Table('rewards').scan()['Items']
+    assert [item['transaction_id'] for item in items] == ['tx-0']
+
+def test_same_user_rewards_in_one_batch_get_distinct_keys(dynamodb, cloudwatch, monkeypatch):
+    frozen = event_consumer.datetime(2024, 3, 1, 12, 0, 0)
+
+    class FrozenClock(event_consumer.datetime):
+        @classmethod
+        def utcnow(cls):
+            return frozen
+
+    # Every item is built within the same clock tick
+    monkeypatch.setattr(event_consumer, 'datetime', FrozenClock)
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(5, users=1)), None)
+
+    assert failed_ids(response) == []
+    items = dynamodb.Table('rewards').scan()['Items']
+    assert sorted(item['transaction_id'] for item in items) == [f'tx-{i}' for i in range(5)]
+    by_transaction = {item['transaction_id']: item['timestamp'] for item in items}
+    timestamps = [by_transaction[f'tx-{i}'] for i in range(5)]
+    assert timestamps == sorted(set(timestamps))
+
+def test_groups_are_written_concurrently(dynamodb, cloudwatch, monkeypatch):
+    client = event_consumer.dynamodb().meta.client
+    real_batch_write = client.batch_write_item
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    def slow_batch_write(RequestItems):
+        with lock:
+            active.append(1)
+            peak.append(len(active))
+        time.sleep(0.05)
+        with lock:
+            active.pop()
+        return real_batch_write(RequestItems=RequestItems)
+
+    monkeypatch.setattr(client, 'batch_write_item', slow_batch_write)
+    event_consumer.lambda_handler(sqs_event(make_transactions(100)), None)
+    assert max(peak) > 1
+
+def test_process_transaction_raises_when_not_stored(dynamodb, cloudwatch, monkeypatch):
+    client = event_consumer.dynamodb().meta.client
+    monkeypatch.setattr(client, 'batch_write_item', lambda RequestItems: {'UnprocessedItems': RequestItems})
+    with pytest.raises(event_consumer.RewardNotIssuedError):
+        event_consumer.process_transaction(make_transactions(1)[0])
+
+def test_invalid_transaction_is_reported(dynamodb, cloudwatch):
+    transactions = make_transactions(3)
+    del transactions[1]['amount']
+    response = event_consumer.lambda_handler(sqs_event(transactions), None)
+    assert failed_ids(response) == ['msg-1']
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 2
+
+def test_every_supported_event_version_is_consumed(dynamodb, cloudwatch):
+    transactions = make_transactions(3)
+    records = []
+    for i, (transaction, version) in enumerate(zip(transactions, (1, 2, 2))):
+        message = events.encode(transaction, version=version, encoding='json')
+        attributes = {name: {'Type': a['DataType'], 'Value': a['StringValue']}
+                      for name, a in events.message_attributes(message).items()}
+        records.append({'messageId': f'msg-{i}', 'body': json.dumps({'Message': message, 'MessageAttributes': attributes})})
+    # Raw message delivery: the message is the body and its attributes are SQS attributes
+    message = events.encode(make_transactions(4)[3], version=2)
+    records.append({'messageId': 'msg-3', 'body': message, 'messageAttributes': {
+        name: {'dataType': a['DataType'], 'stringValue': a['StringValue']} for name, a in events.message_attributes(message).items()
+    }})
+
+    response = event_consumer.lambda_handler({'Records': records}, None)
+    assert response == {'batchItemFailures': []}
+    assert sorted(int(item['points']) for item in dynamodb.Table('rewards').scan()['Items']) == [10, 11, 12, 13]
+
+def test_newer_event_version_is_retried(dynamodb, cloudwatch):
+    event = sqs_event(make_transactions(2))
+    body = json.loads(event['Records'][1]['body'])
+    body['MessageAttributes'] = {'schema_version': {'Type': 'Number', 'Value': '3'}}
+    event['Records'][1]['body'] = json.dumps(body)
+    assert failed_ids(event_consumer.lambda_handler(event, None)) == ['msg-1']
@@ -0,0 +1,89 @@
+import json
+from datetime import datetime, timedelta
+
+import aws_clients
+import event_consumer
+from metrics import EMF_MAX_VALUES, MetricsAggregator
+from test_event_consumer import make_transactions, sqs_event
+
+def emf_documents(capsys):
+    return [json.loads(line) for line in capsys.readouterr().out.splitlines() if line.startswith('{"_aws"')]
+
+def test_statistic_sets_per_dimension_set():
+    metrics = MetricsAggregator('Test', dimension_sets=[[], ['Merchant']])
+    for value, merchant in [(5, 'a'), (1, 'b'), (9, 'a')]:
+        metrics.add('Points', value, 'Count', {'Merchant': merchant, 'Category': 'food'})
+
+    assert metrics.statistics == {
+        ('Points', 'Count', ()): [15, 3, 1, 9],
+        ('Points', 'Count', (('Merchant', 'a'),)): [14, 2, 5, 9],
+        ('Points', 'Count', (('Merchant', 'b'),)): [1, 1, 1, 1]
+    }
+
+def test_emf_needs_no_api_calls(capsys):
+    metrics = MetricsAggregator('Test', dimension_sets=[['Merchant'], ['Category']], mode='emf')
+    metrics.add('Points', 5, 'Count', {'Merchant': 'a', 'Category': 'food'})
+    metrics.add('Points', 7, 'Count', {'Merchant': 'a', 'Category': 'food'})
+    metrics.add('Points', 3, 'Count', {'Merchant': 'b', 'Category': 'food'})
+
+    assert metrics.flush(client=None, timestamp=1700000000) == 0
+    documents = emf_documents(capsys)
+    assert len(documents) == 2
+    first = documents[0]
+    assert first['_aws'] == {
+        'Timestamp': 1700000000000,
+        'CloudWatchMetrics': [{
+            'Namespace': 'Test',
+            'Dimensions': [['Merchant'], ['Category']],
+            'Metrics': [{'Name': 'Points', 'Unit': 'Count'}]
+        }]
+    }
+    assert (first['Merchant'], first['Category'], first['Points']) == ('a', 'food', [5, 7])
+    assert documents[1]['Points'] == [3]
+
+    # Flushing resets the aggregator
+    assert metrics.flush() == 0
+    assert emf_documents(capsys) == []
+
+def test_emf_splits_long_value_arrays(capsys):
+    metrics = MetricsAggregator('Test', mode='emf')
+    for value in range(EMF_MAX_VALUES + 1):
+        metrics.add('Points', value)
+    metrics.flush()
+
+    documents = emf_documents(capsys)
+    assert [len(document['Points']) for document in documents] == [EMF_MAX_VALUES, 1]
+
+def test_cloudwatch_mode_puts_statistic_sets(cloudwatch):
+    metrics = MetricsAggregator('Test', dimension_sets=[['Merchant']], mode='cloudwatch')
+    for value in (4, 6, 11):
+        metrics.add('Points', value, 'Count', {'Merchant': 'a'})
+    now = datetime.utcnow()
+    assert metrics.flush(cloudwatch, timestamp=now.timestamp()) == 1
+
+    datapoints = cloudwatch.get_metric_statistics(
+        Namespace='Test',
+        MetricName='Points',
+        Dimensions=[{'Name': 'Merchant', 'Value': 'a'}],
+        StartTime=now - timedelta(minutes=5),
+        EndTime=now + timedelta(minutes=5),
+        Period=60,
+        Statistics=['Sum', 'SampleCount', 'Minimum', 'Maximum']
+    )['Datapoints']
+    assert len(datapoints) == 1
+    assert (datapoints[0]['Sum'], datapoints[0]['SampleCount'], datapoints[0]['Minimum'], datapoints[0]['Maximum']) == (21, 3, 4, 11)
+
+def test_consumer_emits_one_emf_line_per_merchant_and_category(dynamodb, monkeypatch, capsys):
+    monkeypatch.setattr(event_consumer.metrics, 'mode', 'emf')
+    def no_api_calls(**kwargs):
+        raise AssertionError('put_metric_data called')
+    monkeypatch.setattr(aws_clients.client('cloudwatch'), 'put_metric_data', no_api_calls)
+
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(50)), None)
+    assert response == {'batchItemFailures': []}
+
+    documents = emf_documents(capsys)
+    assert len(documents) == 1
+    assert documents[0]['_aws']['CloudWatchMetrics'][0]['Dimensions'] == [['Merchant'], ['Category']]
+    assert 'UserId' not in documents[0]
+    assert sum(documents[0]['RewardPointsIssued']) == sum(range(10, 60))
@@ -0,0 +1,85 @@
+import zlib
+
+import pytest
+
+import reward_analytics
+
+DATE = '2024-03-01'
+PADDING = 'x' * 900  # about 1 KB per item
+
+def put_rewards(dynamodb, rewards):
+    with dynamodb.Table('rewards').batch_writer() as batch:
+        for i, (date, status, points) in enumerate(rewards):
+            batch.put_item(Item={
+                'user_id': f'user{i % 50}',
+                'timestamp': f'{date}T00:00:00.{i:06d}',
+                'date': date,
+                'status': status,
+                'points': points,
+                'notes': PADDING
+            })
+
+@pytest.fixture
+def large_day(dynamodb):
+    # About 1.5 MB of ISSUED and 0.6 MB of REDEEMED items: more than one page each
+    rewards = [(DATE, 'ISSUED', i % 100) for i in range(1500)]
+    rewards += [(DATE, 'REDEEMED', i % 40) for i in range(600)]
+    rewards += [('2024-03-02', 'ISSUED', 7) for _ in range(20)]
+    put_rewards(dynamodb, rewards)
+    return dynamodb
+
+@pytest.fixture
+def segmented_scan(monkeypatch):
+    """moto ignores Segment/TotalSegments; split scans by a hash of user_id like DynamoDB splits by partition."""
+    client = reward_analytics.dynamodb().meta.client
+    real_scan = client.scan
+    segments = []
+
+    def scan(**kwargs):
+        segment, total_segments = kwargs.pop('Segment'), kwargs.pop('TotalSegments')
+        segments.append(segment)
+        kwargs['ProjectionExpression'] += ', user_id'
+        response = real_scan(**kwargs)
+        response['Items'] = [
+            {name: value for name, value in item.items() if name != 'user_id'}
+            for item in response['Items']
+            if zlib.crc32(item['user_id'].encode()) % total_segments == segment
+        ]
+        return response
+
+    monkeypatch.setattr(client, 'scan', scan)
+    return segments
+
+def test_query_follows_last_evaluated_key(large_day):
+    pages = list(reward_analytics.query_pages('ISSUED', DATE))
+    assert len(pages) > 1
+    # Only points is fetched
+    assert all(set(item) == {'points'} for page in pages for item in page)
+
+def test_aggregate_counts_every_page(large_day):
+    summary = reward_analytics.aggregate_rewards(DATE)
+    issued = sum(i % 100 for i in range(1500))
+    redeemed = sum(i % 40 for i in range(600))
+    assert summary == {
+        'date': DATE,
+        'total_issued': issued,
+        'total_redeemed': redeemed,
+        'net_rewards': issued - redeemed,
+        'issued_count': 1500,
+        'redeemed_count': 600
+    }
+
+def test_scan_matches_query(large_day, segmented_scan):
+    expected = reward_analytics.aggregate_rewards(DATE)
+    by_date = reward_analytics.scan_rewards(DATE, '2024-03-02', segments=2)
+    assert by_date[DATE] == expected
+    assert by_date['2024-03-02']['total_issued'] == 140
+    assert by_date['2024-03-02']['redeemed_count'] == 0
+    assert set(segmented_scan) == {0, 1}
+
+def test_day_without_rewards(dynamodb, segmented_scan, monkeypatch):
+    assert reward_analytics.aggregate_rewards(DATE)['issued_count'] == 0
+    monkeypatch.setattr(reward_analytics, 'AGGREGATION_METHOD', 'scan')
+    put_rewards(dynamodb, [('2024-03-02', 'ISSUED', 7)])
+    assert reward_analytics.aggregate_rewards(DATE) == reward_analytics.build_summary(DATE, (0.0, 0), (0.0, 0))
+    assert len(segmented_scan) == reward_analytics.SCAN_SEGMENTS
@@ -0,0 +1,123 @@
+from datetime import datetime
+
+import pytest
+
+import event_consumer
+import reward_analytics
+import rollups
+from test_event_consumer import make_transactions, sqs_event
+
+TODAY = datetime.utcnow().strftime('%Y-%m-%d')
+
+def issue(transactions):
+    response = event_consumer.lambda_handler(sqs_event(transactions), None)
+    assert response == {'batchItemFailures': []}
+
+def test_consumer_maintains_sharded_rollups(dynamodb):
+    transactions = make_transactions(40)
+    for transaction in transactions[:10]:
+        transaction['merchant'] = 'Corner Shop'
+    issue(transactions[:20])
+    issue(transactions[20:])
+
+    assert rollups.read_totals(TODAY, 'ISSUED') == (sum(range(10, 50)), 40)
+    counters = rollups.read_counters(TODAY, 'ISSUED')
+    assert counters['merchant#Corner Shop'] == [sum(range(10, 20)), 10]
+    assert counters['merchant#Test Store'] == [sum(range(20, 50)), 30]
+    assert counters['category#groceries'] == [sum(range(10, 50)), 40]
+    assert sum(count for name, (_, count) in counters.items() if name.startswith('hour#')) == 40
+
+    items = dynamodb.Table('reward-rollups').scan()['Items']
+    assert {item['pk'].rsplit('#', 1)[0] for item in items} == {f'{TODAY}#ISSUED'}
+
+def test_counters_are_updated_once_per_batch(dynamodb, monkeypatch):
+    updates = []
+    monkeypatch.setattr(rollups, 'add', lambda *args, **kwargs: updates.append(args))
+    issue(make_transactions(25))
+    # total, merchant, category and (usually) a single hour
+    assert len(updates) in (4, 5)
+    assert sum(update[4] for update in updates if update[2] == rollups.TOTAL) == 25
+
+def test_rollup_failure_does_not_fail_messages(dynamodb, monkeypatch):
+    def throttled(*args, **kwargs):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(rollups, 'add', throttled)
+    issue(make_transactions(5))
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 5
+
+def test_read_totals_retries_unprocessed_shards(dynamodb, monkeypatch):
+    issue(make_transactions(20))
+    client = rollups.table().meta.client
+    real_batch_get = client.batch_get_item
+    calls, sleeps = [], []
+
+    def flaky_batch_get(RequestItems):
+        request = RequestItems[rollups.ROLLUPS_TABLE]
+        calls.append(len(request['Keys']))
+        if len(calls) == 1:
+            # Read the first shards, hand the rest back as unprocessed
+            response = real_batch_get(RequestItems={rollups.ROLLUPS_TABLE: dict(request, Keys=request['Keys'][:3])})
+            response['UnprocessedKeys'] = {rollups.ROLLUPS_TABLE: dict(request, Keys=request['Keys'][3:])}
+            return response
+        return real_batch_get(RequestItems=RequestItems)
+
+    monkeypatch.setattr(client, 'batch_get_item', flaky_batch_get)
+    monkeypatch.setattr(rollups.time, 'sleep', sleeps.append)
+
+    assert rollups.read_totals(TODAY, 'ISSUED') == (sum(range(10, 30)), 20)
+    assert calls == [rollups.ROLLUP_SHARDS, rollups.ROLLUP_SHARDS - 3]
+    assert len(sleeps) == 1
+
+def test_read_totals_gives_up_after_max_retries(dynamodb, monkeypatch):
+    client = rollups.table().meta.client
+    sleeps = []
+    monkeypatch.setattr(client, 'batch_get_item', lambda RequestItems: {'Responses': {}, 'UnprocessedKeys': RequestItems})
+    monkeypatch.setattr(rollups.time, 'sleep', sleeps.append)
+    monkeypatch.setattr(rollups, 'READ_MAX_RETRIES', 3)
+
+    with pytest.raises(RuntimeError, match='unprocessed after 3 retries'):
+        rollups.read_totals(TODAY, 'ISSUED')
+    assert len(sleeps) == 3
+    assert all(0 <= delay <= rollups.READ_BASE_DELAY * 2 ** attempt for attempt, delay in enumerate(sleeps))
+
+def test_aggregate_rewards_reads_rollups(dynamodb, monkeypatch):
+    issue(make_transactions(30))
+    expected = reward_analytics.aggregate_rewards(TODAY)
+    monkeypatch.setattr(reward_analytics, 'AGGREGATION_METHOD', 'rollup')
+    queries = []
+    monkeypatch.setattr(reward_analytics, 'query_pages', lambda *args, **kwargs: queries.append(args))
+
+    assert reward_analytics.aggregate_rewards(TODAY) == expected
+    assert expected['issued_count'] == 30
+    assert queries == []
+
+def test_reconcile_reports_and_repairs_drift(dynamodb):
+    issue(make_transactions(12))
+    assert reward_analytics.reconcile_rollups(TODAY) == []
+
+    # A redelivered update counted twice, and a reward row written without its rollup
+    rollups.add(TODAY, 'ISSUED', 'merchant#Test Store', 10, 1)
+    dynamodb.Table('rewards').put_item(Item={
+        'user_id': 'user99', 'timestamp': f'{TODAY}T23:00:00', 'date': TODAY, 'status': 'REDEEMED',
+        'points': 50, 'merchant': 'Test Store', 'category': 'groceries'
+    })
+
+    drift = reward_analytics.reconcile_rollups(TODAY, repair=True)
+    assert {(entry['status'], entry['counter']) for entry in drift} == {
+        ('ISSUED', 'merchant#Test Store'),
+        ('REDEEMED', 'total'),
+        ('REDEEMED', 'merchant#Test Store'),
+        ('REDEEMED', 'category#groceries'),
+        ('REDEEMED', 'hour#23')
+    }
+    merchant = next(entry for entry in drift if entry['counter'] == 'merchant#Test Store' and entry['status'] == 'ISSUED')
+    assert merchant['expected_count'] == 12 and merchant['actual_count'] == 13
+
+    assert reward_analytics.reconcile_rollups(TODAY) == []
+    assert rollups.read_totals(TODAY, 'REDEEMED') == (50, 1)
+
+def test_reconcile_handler(dynamodb):
+    issue(make_transactions(3))
+    response = reward_analytics.lambda_handler({'mode': 'reconcile', 'date': TODAY}, None)
+    assert response['statusCode'] == 200
+    assert '"drift": []' in response['body']
@@ -0,0 +1,79 @@
+import threading
+from collections import Counter
+from datetime import datetime
+
+import pytest
+
+import event_consumer
+import migrate_date_shards
+import reward_analytics
+import sharding
+from test_event_consumer import make_transactions, sqs_event
+from test_reward_analytics import put_rewards
+
+DATE = '2024-03-01'
+
+@pytest.fixture
+def sharded_reads(monkeypatch):
+    monkeypatch.setattr(sharding, 'SHARDED_READS', True)
+
+def test_shards_are_stable_and_spread():
+    assert sharding.shard_for('user42') == sharding.shard_for('user42')
+    shards = Counter(sharding.shard_for(f'user{i}') for i in range(8000))
+    assert set(shards) == set(range(sharding.GSI_SHARDS))
+    assert max(shards.values()) < 1.2 * 8000 / sharding.GSI_SHARDS
+    # Growing the shard count keeps old keys in range
+    assert sharding.date_shard_keys(DATE, 4) == sharding.date_shard_keys(DATE, 8)[:4]
+
+def test_consumer_writes_date_shard(dynamodb):
+    event_consumer.lambda_handler(sqs_event(make_transactions(20)), None)
+    items = dynamodb.Table('rewards').scan()['Items']
+    assert all(item['date_shard'] == sharding.date_shard(item['date'], item['user_id']) for item in items)
+    assert len({item['date_shard'] for item in items}) > 1
+
+def test_sharded_reads_match_unsharded(dynamodb, monkeypatch):
+    event_consumer.lambda_handler(sqs_event(make_transactions(60, users=30)), None)
+    today = datetime.utcnow().strftime('%Y-%m-%d')
+    expected = reward_analytics.aggregate_rewards(today)
+    counters = reward_analytics.status_counters('ISSUED', today)
+
+    queried = []
+    lock = threading.Lock()
+    query_pages = reward_analytics.query_pages
+    def tracked(status, date, attributes=('points',), shard_key=None):
+        with lock:
+            queried.append(shard_key)
+        return query_pages(status, date, attributes, shard_key)
+    monkeypatch.setattr(reward_analytics, 'query_pages', tracked)
+    monkeypatch.setattr(sharding, 'SHARDED_READS', True)
+
+    assert reward_analytics.aggregate_rewards(today) == expected
+    assert reward_analytics.status_counters('ISSUED', today) == counters
+    assert expected['issued_count'] == 60
+    assert set(queried) == set(sharding.date_shard_keys(today))
+
+def test_migration_backfills_date_shard(dynamodb, sharded_reads):
+    put_rewards(dynamodb, [(DATE, 'ISSUED', i) for i in range(30)] + [(DATE, 'REDEEMED', 5)])
+    # Old rows are invisible to the sharded index until migrated
+    assert reward_analytics.aggregate_rewards(DATE)['issued_count'] == 0
+
+    assert migrate_date_shards.migrate(segments=1, dry_run=True) == {'found': 31, 'updated': 0}
+    assert migrate_date_shards.migrate(segments=1) == {'found': 31, 'updated': 31}
+    assert migrate_date_shards.migrate(segments=1) == {'found': 0, 'updated': 0}
+
+    summary = reward_analytics.aggregate_rewards(DATE)
+    assert (summary['issued_count'], summary['total_issued'], summary['redeemed_count']) == (30, sum(range(30)), 1)
+
+def test_migration_keeps_existing_and_deleted_rows(dynamodb):
+    put_rewards(dynamodb, [(DATE, 'ISSUED', 1)])
+    item = dynamodb.Table('rewards').scan()['Items'][0]
+    # Written by a new consumer in the meantime
+    dynamodb.Table('rewards').update_item(
+        Key={'user_id': item['user_id'], 'timestamp': item['timestamp']},
+        UpdateExpression='SET date_shard = :value',
+        ExpressionAttributeValues={':value': 'kept'}
+    )
+    assert migrate_date_shards.set_date_shard(item) is False
+    dynamodb.Table('rewards').delete_item(Key={'user_id': item['user_id'], 'timestamp': item['timestamp']})
+    assert migrate_date_shards.set_date_shard(item) is False
+    assert dynamodb.Table('rewards').scan()['Items'] == []
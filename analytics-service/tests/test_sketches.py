@@ -0,0 +1,126 @@
+import math
+import random
+from datetime import datetime
+
+import pytest
+
+import event_consumer
+import reward_analytics
+import sketches
+from test_event_consumer import make_transactions, sqs_event
+
+TODAY = datetime.utcnow().strftime('%Y-%m-%d')
+# Three standard errors of the default HyperLogLog
+HLL_BOUND = 3 * 1.04 / math.sqrt(1 << sketches.SKETCH_HLL_PRECISION)
+CMS_EPSILON = math.e / sketches.SKETCH_CMS_WIDTH
+
+def zipf_stream(keys, n, seed=7):
+    """(key, weight) pairs where a few keys carry most of the weight."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return [(f'merchant-{key}', rng.randint(1, 100)) for key in rng.choices(range(keys), weights, k=n)]
+
+def exact_totals(stream):
+    totals = {}
+    for key, weight in stream:
+        totals[key] = totals.get(key, 0) + weight
+    return totals
+
+@pytest.mark.parametrize('n', [10, 1000, 30000])
+def test_hyperloglog_error_bound(n):
+    hll = sketches.HyperLogLog()
+    for i in range(n):
+        hll.add(f'user{i}')
+        hll.add(f'user{i}')  # repeats are not counted
+    assert abs(hll.count() - n) <= max(1, HLL_BOUND * n)
+
+def test_hyperloglog_merge_is_union_and_round_trips():
+    a, b, union = sketches.HyperLogLog(), sketches.HyperLogLog(), sketches.HyperLogLog()
+    for i in range(20000):
+        a.add(f'user{i}')
+        union.add(f'user{i}')
+    for i in range(10000, 30000):
+        b.add(f'user{i}')
+        union.add(f'user{i}')
+    a.merge(sketches.HyperLogLog.from_bytes(b.to_bytes()))
+
+    assert a.registers == union.registers
+    assert abs(a.count() - 30000) <= HLL_BOUND * 30000
+    # Fixed size: 4096 registers before compression
+    assert len(a.to_bytes()) <= 4096 + 16
+
+def test_count_min_error_bound():
+    stream = zipf_stream(500, 20000)
+    exact = exact_totals(stream)
+    total = sum(exact.values())
+    cms = sketches.CountMinSketch()
+    for key, weight in stream:
+        cms.add(key, weight)
+
+    errors = [cms.estimate(key) - points for key, points in exact.items()]
+    assert min(errors) >= 0
+    within = sum(error <= CMS_EPSILON * total for error in errors)
+    assert within >= (1 - math.exp(-sketches.SKETCH_CMS_DEPTH)) * len(errors)
+
+def test_heavy_hitters_merged_over_shards_find_the_top_keys():
+    stream = zipf_stream(2000, 20000)
+    exact = exact_totals(stream)
+    shards = [sketches.HeavyHitters() for _ in range(4)]
+    for i, (key, weight) in enumerate(stream):
+        shards[i % 4].add(key, weight)
+    merged = sketches.HeavyHitters.from_bytes(shards[0].to_bytes())
+    for shard in shards[1:]:
+        merged.merge(sketches.HeavyHitters.from_bytes(shard.to_bytes()))
+
+    top = merged.top(5)
+    assert [key for key, _ in top] == sorted(exact, key=exact.get, reverse=True)[:5]
+    for key, points in top:
+        assert exact[key] <= points <= exact[key] + CMS_EPSILON * sum(exact.values())
+    assert len(merged.to_bytes()) <= 4096
+
+def test_consumer_records_day_sketches(dynamodb):
+    transactions = make_transactions(120, users=45)
+    for transaction in transactions[:30]:
+        transaction['merchant'] = 'Corner Shop'
+        transaction['category'] = 'dining'
+    for start in range(0, 120, 40):
+        response = event_consumer.lambda_handler(sqs_event(transactions[start:start + 40]), None)
+        assert response == {'batchItemFailures': []}
+
+    summary = reward_analytics.sketch_summary(TODAY)
+    assert abs(summary['unique_earners'] - 45) <= max(1, HLL_BOUND * 45)
+    assert summary['top_merchants'] == [
+        {'merchant': 'Test Store', 'points': sum(range(40, 130))},
+        {'merchant': 'Corner Shop', 'points': sum(range(10, 40))}
+    ]
+    assert summary['top_categories'][0] == {'category': 'groceries', 'points': sum(range(40, 130))}
+    assert len(dynamodb.Table('reward-sketches').scan()['Items']) <= sketches.SKETCH_SHARDS
+
+def test_concurrent_writers_of_a_shard_both_land(dynamodb, monkeypatch):
+    first = sketches.collect(event_consumer.build_reward_item(t) for t in make_transactions(10))[TODAY]
+    second = sketches.collect(event_consumer.build_reward_item(t) for t in make_transactions(20)[10:])[TODAY]
+    get_item = sketches.table_client().get_item
+
+    def racing_get_item(**kwargs):
+        # Another writer saves between this writer's read and its write
+        response = get_item(**kwargs)
+        if not racing_get_item.raced:
+            racing_get_item.raced = True
+            sketches.save(TODAY, second, shard=0)
+        return response
+    racing_get_item.raced = False
+    monkeypatch.setattr(sketches.table_client(), 'get_item', racing_get_item)
+
+    sketches.save(TODAY, first, shard=0)
+    day = sketches.read(TODAY)
+    assert day['users'].count() == 20
+    assert day['merchants'].top() == [('Test Store', sum(range(10, 30)))]
+    assert int(dynamodb.Table('reward-sketches').get_item(Key={'date': TODAY, 'shard': 0})['Item']['version']) == 2
+
+def test_sketch_failure_does_not_fail_messages(dynamodb, monkeypatch):
+    def throttled(*args, **kwargs):
+        raise RuntimeError('throttled')
+    monkeypatch.setattr(sketches, 'save', throttled)
+    response = event_consumer.lambda_handler(sqs_event(make_transactions(5)), None)
+    assert response == {'batchItemFailures': []}
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 5
@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_sqs
+
+import event_consumer
+import sqs_worker
+from test_event_consumer import make_transactions
+
+@pytest.fixture
+def sqs():
+    with mock_sqs():
+        client = boto3.client('sqs')
+        queue_url = client.create_queue(QueueName='reward-events')['QueueUrl']
+        yield client, queue_url
+
+def send(client, queue_url, transactions):
+    for start in range(0, len(transactions), 10):
+        client.send_message_batch(QueueUrl=queue_url, Entries=[
+            {'Id': str(i), 'MessageBody': json.dumps({'Message': json.dumps(transaction)})}
+            for i, transaction in enumerate(transactions[start:start + 10])
+        ])
+
+def queue_counts(client, queue_url):
+    attributes = client.get_queue_attributes(QueueUrl=queue_url, AttributeNames=['All'])['Attributes']
+    return int(attributes['ApproximateNumberOfMessages']), int(attributes['ApproximateNumberOfMessagesNotVisible'])
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while not condition():
+        assert time.time() < deadline, 'timed out'
+        time.sleep(0.05)
+
+def run_worker(client, queue_url, until, **kwargs):
+    worker = sqs_worker.SQSWorker(queue_url, sqs=client, wait_time=1, **{'receivers': 2, 'workers': 2, **kwargs})
+    worker.start()
+    try:
+        wait_for(until)
+    finally:
+        worker.stop()
+        worker.join()
+    return worker
+
+def test_worker_drains_queue_and_deletes_in_batches(dynamodb, sqs, monkeypatch):
+    client, queue_url = sqs
+    send(client, queue_url, make_transactions(45))
+    deletes = []
+    delete_message_batch = client.delete_message_batch
+    def record_delete(**kwargs):
+        deletes.append(len(kwargs['Entries']))
+        return delete_message_batch(**kwargs)
+    monkeypatch.setattr(client, 'delete_message_batch', record_delete)
+
+    table = dynamodb.Table('rewards')
+    run_worker(client, queue_url, lambda: queue_counts(client, queue_url) == (0, 0))
+
+    # SQS delivers at least once (moto too, under concurrent receives), so allow duplicates
+    assert {item['transaction_id'] for item in table.scan()['Items']} == {f'tx-{i}' for i in range(45)}
+    assert sum(deletes) >= 45
+    assert max(deletes) <= 10
+    assert len(deletes) < 45
+
+def test_failed_and_malformed_messages_are_not_deleted(dynamodb, sqs, monkeypatch):
+    client, queue_url = sqs
+    transactions = make_transactions(5)
+    transactions[2]['amount'] = 'not a number'
+    send(client, queue_url, transactions)
+    client.send_message(QueueUrl=queue_url, MessageBody='not json')
+
+    processed = []
+    process = sqs_worker.SQSWorker.process
+    def record_process(self, batch):
+        process(self, batch)
+        processed.extend(batch)
+    monkeypatch.setattr(sqs_worker.SQSWorker, 'process', record_process)
+
+    run_worker(client, queue_url, lambda: len(processed) == 6, receivers=1, visibility_timeout=30)
+
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 4
+    # The two bad messages stay in flight until their visibility timeout runs out
+    assert queue_counts(client, queue_url) == (0, 2)
+
+def test_visibility_is_extended_for_slow_messages(dynamodb, sqs, monkeypatch):
+    client, queue_url = sqs
+    send(client, queue_url, make_transactions(1))
+    process_batch = event_consumer.process_batch
+    def slow_process_batch(entries):
+        time.sleep(2.5)
+        return process_batch(entries)
+    monkeypatch.setattr(sqs_worker.event_consumer, 'process_batch', slow_process_batch)
+
+    extensions = sqs_worker.visibility_extensions._value.get()
+    received = sqs_worker.receives_total.labels(result='messages')._value.get()
+    worker = run_worker(client, queue_url, lambda: queue_counts(client, queue_url) == (0, 0), receivers=1, visibility_timeout=1)
+
+    assert sqs_worker.visibility_extensions._value.get() > extensions
+    # Never redelivered while it was being processed
+    assert sqs_worker.receives_total.labels(result='messages')._value.get() == received + 1
+    assert len(dynamodb.Table('rewards').scan()['Items']) == 1
+    assert worker.deadlines == {}
+
+def test_shutdown_finishes_received_messages(dynamodb, sqs, monkeypatch):
+    client, queue_url = sqs
+    send(client, queue_url, make_transactions(20))
+    started = threading.Event()
+    process_batch = event_consumer.process_batch
+    def slow_process_batch(entries):
+        started.set()
+        time.sleep(0.5)
+        return process_batch(entries)
+    monkeypatch.setattr(sqs_worker.event_consumer, 'process_batch', slow_process_batch)
+
+    worker = sqs_worker.SQSWorker(queue_url, sqs=client, receivers=1, workers=1, batch_size=5, wait_time=1)
+    worker.start()
+    started.wait(5)
+    worker.stop()
+    worker.join()
+
+    # Everything received before the stop was processed and deleted
+    stored = len(dynamodb.Table('rewards').scan()['Items'])
+    assert stored >= 5
+    assert queue_counts(client, queue_url) == (20 - stored, 0)
@@ -0,0 +1 @@
+"""Load tests and microbenchmarks for the Python services; see __main__.py."""
@@ -0,0 +1,168 @@
+"""
+Load tests and microbenchmarks for the Python services. Run from the
+repository root:
+
+    python -m benchmarks run [--transactions replay.jsonl] [--concurrency 16] [--output run.json]
+    python -m benchmarks compare base.json new.json [--threshold 0.10]
+    python -m benchmarks generate --count 5000 > replay.jsonl
+
+See "Benchmarks" in the README.
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+from datetime import datetime, UTC
+from typing import Any, Dict, Optional
+
+from benchmarks import compare, load, micro, workload
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=load.ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def aws_endpoint(stack: contextlib.ExitStack, mode: str) -> Optional[str]:
+    """A moto server URL, or None for moto's in-process mocks inside each service."""
+    if mode == 'inprocess':
+        return None
+    try:
+        return stack.enter_context(load.moto_server())
+    except ImportError:
+        if mode == 'moto-server':
+            raise SystemExit("--aws moto-server needs `pip install 'moto[server]'`")
+        print("moto server not installed; using moto's in-process mocks", file=sys.stderr)
+        return None
+
+def run_load(args: argparse.Namespace, transactions: list, path: str, results: Dict[str, Any]) -> Optional[str]:
+    env = dict(pair.split('=', 1) for pair in args.service_env)
+    by_service: Dict[str, list] = {}
+    for endpoint in load.endpoints(transactions, args.batch_size):
+        if endpoint.service in args.services:
+            by_service.setdefault(endpoint.service, []).append(endpoint)
+    with contextlib.ExitStack() as stack:
+        endpoint_url = aws_endpoint(stack, args.aws)
+        for service, service_endpoints in by_service.items():
+            with load.running(service, path, endpoint_url, env) as url:
+                for endpoint in service_endpoints:
+                    name = f"{service} {endpoint.name}"
+                    print(f"load  {name}", file=sys.stderr)
+                    results[name] = load.run_endpoint(url, endpoint, args.requests, args.warmup, args.concurrency)
+    return 'moto-server' if endpoint_url else 'inprocess'
+
+def run_micro(args: argparse.Namespace, path: str, results: Dict[str, Any]) -> None:
+    for benchmark, service in micro.SERVICES.items():
+        print(f"micro {benchmark}", file=sys.stderr)
+        completed = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.micro', benchmark, '--transactions', path, '--iterations', str(args.iterations)],
+            cwd=os.path.join(load.ROOT, service), env={**os.environ, 'PYTHONPATH': load.ROOT},
+            capture_output=True, text=True
+        )
+        if completed.returncode:
+            raise RuntimeError(f"{benchmark} failed:\n{completed.stderr}")
+        # Services may log to stdout; the summary is the last line
+        results[f"micro {benchmark}"] = json.loads(completed.stdout.strip().splitlines()[-1])
+
+def run(args: argparse.Namespace) -> None:
+    if args.transactions:
+        transactions = workload.load(args.transactions)
+    else:
+        transactions = workload.synthetic(args.count, args.users, args.seed)
+    results: Dict[str, Any] = {}
+    report: Dict[str, Any] = {
+        'started_at': datetime.now(UTC).isoformat(),
+        'git_commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'config': {
+            'transactions': args.transactions or f'synthetic count={args.count} users={args.users} seed={args.seed}',
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'warmup': args.warmup,
+            'batch_size': args.batch_size,
+            'iterations': args.iterations,
+            'service_env': args.service_env
+        },
+        'results': results
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'transactions.jsonl')
+        with open(path, 'w') as f:
+            workload.write(transactions, f)
+        if 'load' in args.suites:
+            report['config']['aws'] = run_load(args, transactions, path, results)
+        if 'micro' in args.suites:
+            run_micro(args, path, results)
+
+    output = args.output or os.path.join(load.ROOT, 'benchmarks', 'results', f"{datetime.now(UTC):%Y%m%dT%H%M%SZ}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"{'benchmark':<52} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, result in results.items():
+        latency = result['latency_ms']
+        print(f"{name:<52} {result['throughput']:>9.1f} {latency['p50']:>8.2f} {latency['p95']:>8.2f} "
+              f"{latency['p99']:>8.2f} {result['errors']:>7}")
+    print(f"results written to {output}")
+
+def run_compare(args: argparse.Namespace) -> None:
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    rows, regressed = compare.compare(base, new, args.threshold)
+    print(compare.format_rows(rows))
+    if regressed:
+        print(f"\n{len(regressed)} regressed beyond {args.threshold:.0%}: {', '.join(regressed)}")
+        raise SystemExit(1)
+    print(f"\nno regressions beyond {args.threshold:.0%}")
+
+def generate(args: argparse.Namespace) -> None:
+    workload.write(workload.synthetic(args.count, args.users, args.seed), sys.stdout)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks', description='Benchmark the Python services')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = commands.add_parser('run', help='run load tests and microbenchmarks, write JSON results')
+    generate_parser = commands.add_parser('generate', help='write synthetic transactions as JSONL')
+    run_parser.add_argument('--transactions', help='JSONL of transactions to replay; synthetic when omitted')
+    for subparser in (run_parser, generate_parser):
+        subparser.add_argument('--count', type=int, default=2000, help='synthetic transactions')
+        subparser.add_argument('--users', type=int, default=500, help='distinct synthetic users')
+        subparser.add_argument('--seed', type=int, default=42)
+    run_parser.add_argument('--services', type=lambda value: value.split(','), default=list(load.READY_PATHS),
+                            help='comma-separated; default: both')
+    run_parser.add_argument('--suites', type=lambda value: value.split(','), default=['load', 'micro'],
+                            help='load, micro or both (default)')
+    run_parser.add_argument('--concurrency', type=int, default=16, help='requests in flight')
+    run_parser.add_argument('--requests', type=int, default=500, help='measured requests per endpoint')
+    run_parser.add_argument('--warmup', type=int, default=50, help='unmeasured requests per endpoint')
+    run_parser.add_argument('--batch-size', type=int, default=25, help='items per batch request')
+    run_parser.add_argument('--iterations', type=int, default=2000, help='calls per microbenchmark')
+    run_parser.add_argument('--aws', choices=['auto', 'moto-server', 'inprocess'], default='auto',
+                            help='moto server if installed (auto), or moto mocks inside each service')
+    run_parser.add_argument('--service-env', action='append', default=[], metavar='KEY=VALUE',
+                            help='environment for the services, e.g. EVENT_DELIVERY_MODE=outbox')
+    run_parser.add_argument('--output', help='default: benchmarks/results/<UTC time>.json')
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser('compare', help='flag regressions between two result files')
+    compare_parser.add_argument('base')
+    compare_parser.add_argument('new')
+    compare_parser.add_argument('--threshold', type=float, default=0.10, help='relative change flagged (default 10%%)')
+    compare_parser.set_defaults(func=run_compare)
+
+    generate_parser.set_defaults(func=generate)
+
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
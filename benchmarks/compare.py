@@ -0,0 +1,43 @@
+from typing import Any, Dict, List, Tuple
+
+# Regressions are flagged when a metric is worse by more than the threshold
+LATENCY_KEYS = ('p50', 'p95', 'p99')
+ERROR_RATE_TOLERANCE = 0.01  # absolute increase
+
+def relative_change(base: float, new: float) -> float:
+    return (new - base) / base if base else 0.0
+
+def compare(base: Dict[str, Any], new: Dict[str, Any], threshold: float) -> Tuple[List[Dict[str, Any]], List[str]]:
+    """
+    Compare every benchmark present in both runs. Returns one row per benchmark
+    and metric, and the names of the regressed benchmarks.
+    """
+    rows = []
+    regressed = []
+    for name in sorted(base['results'].keys() & new['results'].keys()):
+        before, after = base['results'][name], new['results'][name]
+        metrics = [('throughput', before['throughput'], after['throughput'], -1)]
+        metrics += [(key, before['latency_ms'][key], after['latency_ms'][key], 1) for key in LATENCY_KEYS]
+        worse = False
+        for metric, old, value, direction in metrics:
+            change = relative_change(old, value)
+            # direction -1: lower is worse (throughput); 1: higher is worse (latency)
+            flagged = change * direction > threshold
+            worse = worse or flagged
+            rows.append({'benchmark': name, 'metric': metric, 'base': old, 'new': value, 'change': change, 'regression': flagged})
+        error_increase = after['error_rate'] - before['error_rate']
+        if error_increase > ERROR_RATE_TOLERANCE:
+            worse = True
+            rows.append({'benchmark': name, 'metric': 'error_rate', 'base': before['error_rate'], 'new': after['error_rate'],
+                         'change': error_increase, 'regression': True})
+        if worse:
+            regressed.append(name)
+    return rows, regressed
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'benchmark':<52} {'metric':<11} {'base':>10} {'new':>10} {'change':>8}"]
+    for row in rows:
+        flag = '  REGRESSION' if row['regression'] else ''
+        lines.append(f"{row['benchmark']:<52} {row['metric']:<11} {row['base']:>10.2f} {row['new']:>10.2f} "
+                     f"{row['change']:>+7.1%}{flag}")
+    return '\n'.join(lines)
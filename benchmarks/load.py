@@ -0,0 +1,132 @@
+import asyncio
+import contextlib
+import os
+import socket
+import subprocess
+import sys
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import httpx
+
+from benchmarks.stats import summarize
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+READY_PATHS = {'transaction-service': '/health', 'recommendation-service': '/ready'}
+STARTUP_TIMEOUT = 120.0
+
+Request = Tuple[str, str, Optional[Dict[str, Any]]]  # method, path, JSON body
+
+@dataclass
+class Endpoint:
+    service: str
+    name: str
+    requests: List[Request]
+
+def chunks(items: List[Any], size: int) -> List[List[Any]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def endpoints(transactions: List[Dict[str, Any]], batch_size: int) -> List[Endpoint]:
+    """The replayed requests of every endpoint, in the order they are run."""
+    bodies = [{key: transaction.get(key) for key in ('user_id', 'amount', 'merchant', 'category', 'description')}
+              for transaction in transactions]
+    users = list(dict.fromkeys(transaction['user_id'] for transaction in transactions))
+    return [
+        # Writes first, so the history reads find rows
+        Endpoint('transaction-service', 'POST /transactions', [('POST', '/transactions', body) for body in bodies]),
+        Endpoint('transaction-service', 'POST /transactions/batch',
+                 [('POST', '/transactions/batch', {'transactions': chunk}) for chunk in chunks(bodies, batch_size)]),
+        Endpoint('transaction-service', 'GET /users/{user_id}/transactions',
+                 [('GET', f'/users/{user}/transactions?limit=50', None) for user in users]),
+        Endpoint('recommendation-service', 'GET /recommendations/{user_id}',
+                 [('GET', f'/recommendations/{user}', None) for user in users]),
+        Endpoint('recommendation-service', 'POST /recommendations/batch',
+                 [('POST', '/recommendations/batch', {'user_ids': chunk}) for chunk in chunks(users, batch_size)])
+    ]
+
+def cycle(requests: List[Request], count: int) -> Iterator[Request]:
+    for i in range(count):
+        yield requests[i % len(requests)]
+
+async def drive(base_url: str, requests: Iterator[Request], concurrency: int) -> Tuple[List[float], int, float]:
+    """Send `requests` with `concurrency` in flight. Returns latencies (s), errors and wall time."""
+    latencies: List[float] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=60, limits=limits) as client:
+        async def worker() -> None:
+            nonlocal errors
+            # Workers share one iterator, so each request is sent once
+            for method, path, body in requests:
+                started = time.perf_counter()
+                try:
+                    response = await client.request(method, path, json=body)
+                    ok = response.status_code < 400
+                except httpx.HTTPError:
+                    ok = False
+                if ok:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, errors, time.perf_counter() - started
+
+def run_endpoint(base_url: str, endpoint: Endpoint, count: int, warmup: int, concurrency: int) -> Dict[str, Any]:
+    if warmup:
+        asyncio.run(drive(base_url, cycle(endpoint.requests, warmup), concurrency))
+    latencies, errors, elapsed = asyncio.run(drive(base_url, cycle(endpoint.requests, count), concurrency))
+    return summarize(latencies, errors, elapsed)
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+@contextlib.contextmanager
+def moto_server() -> Iterator[str]:
+    """A moto server shared by the services of a run; needs `pip install 'moto[server]'`."""
+    from moto.server import ThreadedMotoServer
+
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    try:
+        yield f'http://127.0.0.1:{port}'
+    finally:
+        server.stop()
+
+@contextlib.contextmanager
+def running(service: str, transactions_path: str, aws_endpoint: Optional[str], env: Dict[str, str]) -> Iterator[str]:
+    """Start a service with benchmarks.serve and yield its URL once it is ready."""
+    port = free_port()
+    command = [sys.executable, '-m', 'benchmarks.serve', service, '--port', str(port), '--transactions', transactions_path]
+    if aws_endpoint:
+        command += ['--aws-endpoint', aws_endpoint]
+    # The service directory comes first on sys.path, for its `app` package.
+    # Its request logs go to stdout, which would bury the results.
+    process = subprocess.Popen(command, cwd=os.path.join(ROOT, service), env={**os.environ, 'PYTHONPATH': ROOT, **env},
+                               stdout=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + STARTUP_TIMEOUT
+        while True:
+            if process.poll() is not None:
+                raise RuntimeError(f"{service} exited with code {process.returncode} during startup")
+            try:
+                if httpx.get(url + READY_PATHS[service], timeout=5).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"{service} was not ready after {STARTUP_TIMEOUT:.0f}s")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
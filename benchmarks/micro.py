@@ -0,0 +1,89 @@
+"""
+In-process microbenchmarks. `python -m benchmarks run` starts each one in
+its service's directory, which is where its imports resolve:
+
+    python -m benchmarks.micro generate_recommendations --transactions run.jsonl --iterations 2000
+
+The summary is printed as one JSON object.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List
+
+from benchmarks import workload
+from benchmarks.stats import summarize
+
+# benchmark name -> service directory it runs in
+SERVICES = {
+    'generate_recommendations': 'recommendation-service',
+    'event_consumer.process_transaction': 'analytics-service'
+}
+
+def time_calls(func: Callable[[Any], Any], inputs: List[Any], iterations: int, warmup: int) -> Dict[str, Any]:
+    for i in range(warmup):
+        func(inputs[i % len(inputs)])
+    latencies = []
+    for i in range(iterations):
+        started = time.perf_counter()
+        func(inputs[i % len(inputs)])
+        latencies.append(time.perf_counter() - started)
+    return summarize(latencies, 0, sum(latencies))
+
+def generate_recommendations(transactions: List[Dict[str, Any]], iterations: int, warmup: int) -> Dict[str, Any]:
+    """One call per replayed user, with the features their transactions built."""
+    from moto import mock_dynamodb
+
+    from benchmarks.serve import setup_recommendation_service
+
+    with mock_dynamodb():
+        setup_recommendation_service(None, transactions)
+        from app.feature_store import get_feature_store
+        from app.main import TransactionHistory, generate_recommendations, model_store
+
+        users = list(dict.fromkeys(transaction['user_id'] for transaction in transactions))
+        histories = [TransactionHistory(**features) for features in get_feature_store().get_many(users)]
+        model_store.load()
+        loaded = model_store.current
+        return time_calls(lambda history: generate_recommendations(history, loaded), histories, iterations, warmup)
+
+def process_transaction(transactions: List[Dict[str, Any]], iterations: int, warmup: int) -> Dict[str, Any]:
+    """One reward per call, written to moto's in-process DynamoDB with rollups and sketches."""
+    sys.path[:0] = [os.path.join(os.getcwd(), 'lambda'), os.path.join(os.getcwd(), 'tests')]
+    import boto3
+    from moto import mock_dynamodb
+
+    from tables import create_rewards_table, create_rollups_table, create_sketches_table
+    import event_consumer
+
+    # Only measure the consumer, not its metric output
+    event_consumer.metrics.mode = 'none'
+    event_consumer.logger.disabled = True
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        for create in (create_rewards_table, create_rollups_table, create_sketches_table):
+            create(dynamodb)
+        return time_calls(event_consumer.process_transaction, transactions, iterations, warmup)
+
+BENCHMARKS = {
+    'generate_recommendations': generate_recommendations,
+    'event_consumer.process_transaction': process_transaction
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run one in-process microbenchmark')
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--transactions', required=True)
+    parser.add_argument('--iterations', type=int, default=2000)
+    parser.add_argument('--warmup', type=int, default=100)
+    args = parser.parse_args()
+    for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', 'us-east-1')]:
+        os.environ.setdefault(name, value)
+    sys.path.insert(0, os.getcwd())
+    result = BENCHMARKS[args.benchmark](workload.load(args.transactions), args.iterations, args.warmup)
+    print(json.dumps(result))
+
+if __name__ == '__main__':
+    main()
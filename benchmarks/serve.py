@@ -0,0 +1,95 @@
+"""
+Run one service against local AWS stand-ins, for the load benchmarks.
+benchmarks.load starts it with the service directory as working directory:
+
+    python -m benchmarks.serve transaction-service --port 8101 --transactions run.jsonl [--aws-endpoint URL]
+
+With --aws-endpoint (a moto server), the service's DynamoDB and SNS calls go
+there. Without it, moto's in-process mocks are started in this process before
+the app is imported.
+"""
+import argparse
+import contextlib
+import os
+import sys
+from typing import Any, Dict, List, Optional
+
+import boto3
+
+from benchmarks import workload
+
+REGION = 'us-east-1'
+TRANSACTIONS_TABLE = 'transactions'
+FEATURES_TABLE = 'user-features'
+MODEL_PATH = os.getenv('MODEL_PATH', 'models/reward_model.joblib')
+
+def create_transactions_table(dynamodb: Any) -> None:
+    dynamodb.create_table(
+        TableName=TRANSACTIONS_TABLE,
+        KeySchema=[{'AttributeName': 'transaction_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[
+            {'AttributeName': 'transaction_id', 'AttributeType': 'S'},
+            {'AttributeName': 'user_id', 'AttributeType': 'S'},
+            {'AttributeName': 'timestamp', 'AttributeType': 'S'}
+        ],
+        GlobalSecondaryIndexes=[{
+            'IndexName': 'user_id-timestamp-index',
+            'KeySchema': [
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+            ],
+            'Projection': {'ProjectionType': 'ALL'}
+        }],
+        BillingMode='PAY_PER_REQUEST'
+    )
+
+def setup_transaction_service(endpoint: Optional[str], transactions: List[Dict[str, Any]]) -> Dict[str, str]:
+    create_transactions_table(boto3.resource('dynamodb', endpoint_url=endpoint, region_name=REGION))
+    topic = boto3.client('sns', endpoint_url=endpoint, region_name=REGION).create_topic(Name='reward-events')
+    return {'DYNAMODB_TABLE': TRANSACTIONS_TABLE, 'SNS_TOPIC_ARN': topic['TopicArn']}
+
+def setup_recommendation_service(endpoint: Optional[str], transactions: List[Dict[str, Any]]) -> Dict[str, str]:
+    if not os.path.exists(MODEL_PATH):
+        sys.exit(f"{MODEL_PATH} not found; train it first with `python app/train_model.py` in recommendation-service")
+    boto3.resource('dynamodb', endpoint_url=endpoint, region_name=REGION).create_table(
+        TableName=FEATURES_TABLE,
+        KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    os.environ['FEATURE_STORE_TABLE'] = FEATURES_TABLE
+    # Every replayed user gets the features their transactions would have built
+    from app.feature_store import get_feature_store
+    get_feature_store().rebuild(transactions)
+    return {'FEATURE_STORE_TABLE': FEATURES_TABLE}
+
+SETUP = {
+    'transaction-service': setup_transaction_service,
+    'recommendation-service': setup_recommendation_service
+}
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run a service on local AWS stand-ins')
+    parser.add_argument('service', choices=sorted(SETUP))
+    parser.add_argument('--port', type=int, required=True)
+    parser.add_argument('--transactions', required=True, help='JSONL the load will replay')
+    parser.add_argument('--aws-endpoint', default=None, help='moto server URL; in-process mocks when omitted')
+    args = parser.parse_args()
+
+    for name, value in [('AWS_ACCESS_KEY_ID', 'testing'), ('AWS_SECRET_ACCESS_KEY', 'testing'), ('AWS_DEFAULT_REGION', REGION)]:
+        os.environ.setdefault(name, value)
+    if args.aws_endpoint:
+        os.environ['DYNAMODB_ENDPOINT'] = os.environ['SNS_ENDPOINT'] = args.aws_endpoint
+
+    with contextlib.ExitStack() as stack:
+        if not args.aws_endpoint:
+            from moto import mock_dynamodb, mock_sns
+            stack.enter_context(mock_dynamodb())
+            stack.enter_context(mock_sns())
+        os.environ.update(SETUP[args.service](args.aws_endpoint, workload.load(args.transactions)))
+
+        import uvicorn
+        uvicorn.run('app.main:app', host='127.0.0.1', port=args.port, log_level='warning')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import math
+from typing import Any, Dict, List, Sequence
+
+PERCENTILES = (50, 95, 99)
+
+def percentile(ordered: Sequence[float], q: float) -> float:
+    """Nearest-rank percentile of an ascending sequence."""
+    if not ordered:
+        return 0.0
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> Dict[str, Any]:
+    """Throughput and latency percentiles (in ms) of one endpoint or microbenchmark."""
+    ordered = sorted(latencies)
+    requests = len(ordered) + errors
+    return {
+        'requests': requests,
+        'errors': errors,
+        'error_rate': errors / requests if requests else 0.0,
+        'throughput': len(ordered) / elapsed if elapsed else 0.0,
+        'latency_ms': {
+            **{f'p{q}': percentile(ordered, q) * 1000 for q in PERCENTILES},
+            'mean': sum(ordered) / len(ordered) * 1000 if ordered else 0.0,
+            'max': ordered[-1] * 1000 if ordered else 0.0
+        }
+    }
@@ -0,0 +1,73 @@
+from benchmarks.compare import compare, format_rows
+
+def result(throughput=100.0, p50=10.0, p95=20.0, p99=30.0, error_rate=0.0):
+    return {
+        'throughput': throughput,
+        'error_rate': error_rate,
+        'latency_ms': {'p50': p50, 'p95': p95, 'p99': p99, 'mean': p50, 'max': p99}
+    }
+
+def run(**results):
+    return {'results': results}
+
+def flagged(rows, name):
+    return {row['metric'] for row in rows if row['benchmark'] == name and row['regression']}
+
+def test_unchanged_run_has_no_regressions():
+    rows, regressed = compare(run(a=result()), run(a=result()), threshold=0.10)
+    assert regressed == []
+    assert [row['metric'] for row in rows] == ['throughput', 'p50', 'p95', 'p99']
+    assert all(row['change'] == 0.0 for row in rows)
+
+def test_lower_throughput_is_a_regression():
+    rows, regressed = compare(run(a=result()), run(a=result(throughput=85.0)), threshold=0.10)
+    assert regressed == ['a']
+    assert flagged(rows, 'a') == {'throughput'}
+
+def test_higher_throughput_is_not_a_regression():
+    _, regressed = compare(run(a=result()), run(a=result(throughput=200.0)), threshold=0.10)
+    assert regressed == []
+
+def test_higher_latency_is_a_regression():
+    rows, regressed = compare(run(a=result()), run(a=result(p95=25.0)), threshold=0.10)
+    assert regressed == ['a']
+    assert flagged(rows, 'a') == {'p95'}
+
+def test_lower_latency_is_not_a_regression():
+    _, regressed = compare(run(a=result()), run(a=result(p50=1.0, p95=2.0, p99=3.0)), threshold=0.10)
+    assert regressed == []
+
+def test_changes_within_the_threshold_pass():
+    # 10% exactly is not beyond a 10% threshold
+    _, regressed = compare(run(a=result()), run(a=result(throughput=90.0, p99=33.0)), threshold=0.10)
+    assert regressed == []
+    _, regressed = compare(run(a=result()), run(a=result(throughput=90.0, p99=33.0)), threshold=0.05)
+    assert regressed == ['a']
+
+def test_error_rate_increase_beyond_one_point_is_a_regression():
+    rows, regressed = compare(run(a=result()), run(a=result(error_rate=0.02)), threshold=0.10)
+    assert regressed == ['a']
+    error_row = rows[-1]
+    assert error_row['metric'] == 'error_rate'
+    assert error_row['change'] == 0.02
+
+    _, regressed = compare(run(a=result()), run(a=result(error_rate=0.01)), threshold=0.10)
+    assert regressed == []
+
+def test_only_benchmarks_in_both_runs_are_compared():
+    base = run(a=result(), b=result())
+    new = run(b=result(throughput=10.0), c=result())
+    rows, regressed = compare(base, new, threshold=0.10)
+    assert {row['benchmark'] for row in rows} == {'b'}
+    assert regressed == ['b']
+
+def test_zero_baseline_is_not_flagged():
+    _, regressed = compare(run(a=result(throughput=0.0, p50=0.0)), run(a=result()), threshold=0.10)
+    assert regressed == []
+
+def test_format_rows_marks_regressions():
+    rows, _ = compare(run(a=result()), run(a=result(p99=60.0)), threshold=0.10)
+    lines = format_rows(rows).splitlines()
+    assert lines[0].split() == ['benchmark', 'metric', 'base', 'new', 'change']
+    assert lines[-1].endswith('+100.0%  REGRESSION')
+    assert 'REGRESSION' not in lines[1]
@@ -0,0 +1,36 @@
+import pytest
+
+from benchmarks.stats import percentile, summarize
+
+def test_percentile_is_nearest_rank():
+    ordered = [float(i) for i in range(1, 101)]
+    assert percentile(ordered, 50) == 50.0
+    assert percentile(ordered, 95) == 95.0
+    assert percentile(ordered, 99) == 99.0
+    assert percentile(ordered, 100) == 100.0
+
+def test_percentile_of_small_samples():
+    assert percentile([], 50) == 0.0
+    assert percentile([7.0], 99) == 7.0
+    # ceil(0.5 * 4) = 2nd value; ceil(0.95 * 4) = 4th
+    assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 95) == 4.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 1) == 1.0
+
+def test_summarize_reports_milliseconds_and_errors():
+    # Latencies in seconds, in any order
+    summary = summarize([0.003, 0.001, 0.002, 0.004], errors=1, elapsed=2.0)
+
+    assert summary['requests'] == 5
+    assert summary['errors'] == 1
+    assert summary['error_rate'] == pytest.approx(0.2)
+    # Only successful requests count towards throughput
+    assert summary['throughput'] == pytest.approx(2.0)
+    assert summary['latency_ms'] == pytest.approx({'p50': 2.0, 'p95': 4.0, 'p99': 4.0, 'mean': 2.5, 'max': 4.0})
+
+def test_summarize_without_requests():
+    summary = summarize([], errors=0, elapsed=0.0)
+    assert summary['requests'] == 0
+    assert summary['error_rate'] == 0.0
+    assert summary['throughput'] == 0.0
+    assert summary['latency_ms'] == {'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'mean': 0.0, 'max': 0.0}
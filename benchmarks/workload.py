@@ -0,0 +1,51 @@
+import json
+import random
+from typing import Any, Dict, Iterable, List, Optional, TextIO
+
+CATEGORIES = ['groceries', 'dining', 'shopping', 'entertainment']
+MERCHANTS = ['Corner Shop', 'FreshMart', 'Bistro 21', 'Mall Outlet', 'Cineplex', 'Noodle Bar', 'Book Nook', 'Gas & Go']
+
+def synthetic(count: int, users: int = 1000, seed: int = 42) -> List[Dict[str, Any]]:
+    """
+    Reproducible transactions: a few users and merchants account for most of
+    the traffic, and amounts are log-normal, like card spend.
+    """
+    rng = random.Random(seed)
+    user_weights = [1 / (rank + 1) for rank in range(users)]
+    merchant_weights = [1 / (rank + 1) for rank in range(len(MERCHANTS))]
+    user_ids = rng.choices(range(users), user_weights, k=count)
+    merchants = rng.choices(range(len(MERCHANTS)), merchant_weights, k=count)
+    return [
+        {
+            'transaction_id': f'bench-{seed}-{i}',
+            'user_id': f'user{user_ids[i]}',
+            'amount': round(min(5000.0, rng.lognormvariate(3.5, 0.9)) + 0.01, 2),
+            'merchant': MERCHANTS[merchants[i]],
+            'category': CATEGORIES[merchants[i] % len(CATEGORIES)],
+            'description': 'benchmark purchase'
+        }
+        for i in range(count)
+    ]
+
+def load(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Transactions from a JSONL file, one object per line; blank lines are skipped."""
+    transactions = []
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            transaction = json.loads(line)
+            missing = {'user_id', 'amount', 'merchant'} - transaction.keys()
+            if missing:
+                raise ValueError(f"{path}:{number}: missing {', '.join(sorted(missing))}")
+            transaction.setdefault('transaction_id', f'replay-{number}')
+            transactions.append(transaction)
+            if limit is not None and len(transactions) == limit:
+                break
+    if not transactions:
+        raise ValueError(f"{path} holds no transactions")
+    return transactions
+
+def write(transactions: Iterable[Dict[str, Any]], out: TextIO) -> None:
+    for transaction in transactions:
+        out.write(json.dumps(transaction, separators=(',', ':')) + '\n')
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Rewards checked per category before widening the scan; doubles each round
+MIN_SCAN = 64
+
+NO_START = np.iinfo(np.int64).min
+NO_END = np.iinfo(np.int64).max
+
+def to_epoch(value: Optional[str], default: int) -> int:
+    """Parse an ISO 8601 date or timestamp into epoch seconds (UTC if no offset)."""
+    if not value:
+        return default
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+class RewardCatalog:
+    """
+    Reward catalog held as columnar NumPy arrays.
+
+    Each reward belongs to one of the model's categories and is scored as the
+    probability of that category times the reward's `weight`. Rewards of a
+    category are pre-sorted by weight, so the best candidates of each category
+    are the first eligible entries of its index. Ranking only scores those
+    candidates (at most top_k per category) and picks the top_k with a
+    partial partition instead of a full sort, so latency does not grow with the size of the catalog.
+    """
+
+    def __init__(self, rewards: Sequence[Dict[str, Any]], categories: Sequence[str]):
+        self.categories = list(categories)
+        codes = {category: code for code, category in enumerate(self.categories)}
+        # Rewards outside the model's categories score zero (an extra, always-zero column)
+        unknown = len(self.categories)
+
+        self.ids = [reward['id'] for reward in rewards]
+        self.names = [reward['name'] for reward in rewards]
+        self.descriptions = [reward.get('description', '') for reward in rewards]
+        self.points = np.array([reward['points'] for reward in rewards], dtype=np.int64)
+        self.weight = np.array([reward.get('weight', 1.0) for reward in rewards], dtype=np.float64)
+        self.category_codes = np.array([codes.get(reward.get('category'), unknown) for reward in rewards], dtype=np.intp)
+        self.active_from = np.array([to_epoch(reward.get('active_from'), NO_START) for reward in rewards], dtype=np.int64)
+        self.active_until = np.array([to_epoch(reward.get('active_until'), NO_END) for reward in rewards], dtype=np.int64)
+
+        # Per-category positions, highest weight first and catalog order within a weight
+        order = np.lexsort((np.arange(len(rewards)), -self.weight, self.category_codes))
+        bounds = np.searchsorted(self.category_codes[order], np.arange(unknown + 2))
+        self.category_index = [order[bounds[code]:bounds[code + 1]] for code in range(unknown + 1)]
+
+        # (valid from, valid until, active per-category indexes, cheapest reward per category)
+        self._active = (0, 0, [], [])
+
+        canonical = json.dumps([dict(reward) for reward in rewards], sort_keys=True, default=str)
+        self.version = hashlib.sha1(canonical.encode()).hexdigest()[:12]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @classmethod
+    def from_file(cls, path: str, categories: Sequence[str]) -> "RewardCatalog":
+        """Load a JSON array or JSONL file of rewards."""
+        with open(path) as f:
+            text = f.read()
+        if text.lstrip().startswith('['):
+            rewards = json.loads(text)
+        else:
+            rewards = [json.loads(line) for line in text.splitlines() if line.strip()]
+        return cls(rewards, categories)
+
+    def reward(self, position: int) -> Dict[str, Any]:
+        return {
+            "reward_id": self.ids[position],
+            "reward_name": self.names[position],
+            "points_required": int(self.points[position]),
+            "description": self.descriptions[position]
+        }
+
+    def active_indexes(self, now: int) -> Tuple[list, list]:
+        """
+        Per-category indexes restricted to rewards active at `now`, and the
+        cheapest reward in each. They only change when some availability
+        window opens or closes, so they are rebuilt at most once per boundary.
+        """
+        start, end, indexes, min_points = self._active
+        if not start <= now < end:
+            active = (self.active_from <= now) & (now <= self.active_until)
+            indexes = [index[active[index]] for index in self.category_index]
+            min_points = [int(self.points[index].min()) if len(index) else None for index in indexes]
+            closing = (self.active_until >= now) & (self.active_until < NO_END)
+            upcoming = np.concatenate([self.active_from[self.active_from > now], self.active_until[closing] + 1])
+            end = int(upcoming.min()) if len(upcoming) else NO_END
+            self._active = (now, end, indexes, min_points)
+        return indexes, min_points
+
+    def candidates(self, top_k: int, points_balance: Optional[int] = None, now: Optional[int] = None) -> np.ndarray:
+        """
+        Catalog positions that can reach the top_k: the first top_k active and
+        affordable rewards of every category, in catalog order. With a balance,
+        each category index is filtered in doubling slices, so only as much of
+        it is read as needed.
+        """
+        now = int(time.time()) if now is None else now
+        indexes, min_points = self.active_indexes(now)
+        found = []
+        for index, cheapest in zip(indexes, min_points):
+            if points_balance is None:
+                found.append(index[:top_k])
+                continue
+            if cheapest is None or cheapest > points_balance:
+                continue
+            start, size, count = 0, max(MIN_SCAN, 4 * top_k), 0
+            while count < top_k and start < len(index):
+                chunk = index[start:start + size]
+                chunk = chunk[self.points[chunk] <= points_balance]
+                found.append(chunk[:top_k - count])
+                count += len(found[-1])
+                start += size
+                size *= 2
+        return np.sort(np.concatenate(found)) if found else np.empty(0, dtype=np.intp)
+
+    def rank(
+        self,
+        probabilities: np.ndarray,
+        top_k: int,
+        points_balance: Optional[int] = None,
+        now: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rank rewards for every row of an N x n_categories probability matrix.
+        Returns N x k matrices of catalog positions and scores, best first;
+        ties keep catalog order. k is top_k or the number of eligible rewards.
+        """
+        probabilities = np.atleast_2d(probabilities)
+        positions = self.candidates(top_k, points_balance, now)
+        padded = np.hstack([probabilities, np.zeros((len(probabilities), 1))])
+        scores = padded[:, self.category_codes[positions]] * self.weight[positions]
+
+        k = min(top_k, len(positions))
+        if k < len(positions):
+            # Partial selection of the k-th best score per row; everything above
+            # it is in, and ties at it are taken in catalog order
+            kth = -np.partition(-scores, k - 1, axis=1)[:, k - 1:k]
+            above = scores > kth
+            at = scores == kth
+            at &= np.cumsum(at, axis=1) <= k - above.sum(axis=1, keepdims=True)
+            selected = np.nonzero(above | at)[1].reshape(len(scores), k)
+        else:
+            selected = np.broadcast_to(np.arange(len(positions)), scores.shape)
+        selected_scores = np.take_along_axis(scores, selected, axis=1)
+        order = np.argsort(-selected_scores, axis=1, kind='stable')
+        return positions[np.take_along_axis(selected, order, axis=1)], np.take_along_axis(selected_scores, order, axis=1)
@@ -0,0 +1,281 @@
+import argparse
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional
+
+import boto3
+import structlog
+from botocore.exceptions import ClientError
+
+from app import events
+
+logger = structlog.get_logger()
+
+CATEGORY_PREFIX = 'cat_'
+BATCH_GET_SIZE = 100  # DynamoDB limit for batch_get_item
+BATCH_GET_MAX_RETRIES = int(os.getenv('BATCH_GET_MAX_RETRIES', '8'))  # for UnprocessedKeys
+
+# Applied transactions leave a marker item keyed `applied#<transaction_id>`
+# so a redelivered event is not counted twice; markers expire (DynamoDB TTL
+# on `expires_at`) after SQS could no longer redeliver the message
+APPLIED_PREFIX = 'applied#'
+APPLIED_MARKER_TTL = int(os.getenv('APPLIED_MARKER_TTL', str(14 * 24 * 3600)))
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after `ttl_seconds`."""
+
+    def __init__(self, max_entries: int = 100000, ttl_seconds: float = 60.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+def normalize_category(category: Optional[str]) -> str:
+    return (category or 'uncategorized').strip().lower()
+
+def to_features(item: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Turn a stored feature record into the model's input features."""
+    if not item:
+        return {
+            'total_spent': 0.0,
+            'transaction_count': 0,
+            'avg_transaction': 0.0,
+            'category_distribution': {}
+        }
+    total_spent = float(item.get('total_spent', 0))
+    transaction_count = int(item.get('transaction_count', 0))
+    category_totals = {
+        key[len(CATEGORY_PREFIX):]: float(value)
+        for key, value in item.items() if key.startswith(CATEGORY_PREFIX)
+    }
+    return {
+        'total_spent': total_spent,
+        'transaction_count': transaction_count,
+        'avg_transaction': total_spent / transaction_count if transaction_count else 0.0,
+        'category_distribution': {
+            category: total / total_spent if total_spent else 0.0
+            for category, total in category_totals.items()
+        }
+    }
+
+class FeatureStore:
+    """
+    Per-user spending features kept in one DynamoDB item per user.
+
+    Each transaction event atomically ADDs to the user's total, count and
+    per-category total, so reads are a single get_item regardless of how long
+    the user's history is. The store can be rebuilt from a replay of raw
+    transactions at any time.
+    """
+
+    def __init__(self, table: Any, cache_ttl: float = 60.0, cache_size: int = 100000):
+        self.table = table
+        self.cache = TTLCache(max_entries=cache_size, ttl_seconds=cache_ttl)
+
+    def apply_transaction(self, transaction: Dict[str, Any]) -> bool:
+        """
+        Fold one transaction into the user's counters. A transaction with a
+        transaction_id is applied at most once: the counters are updated in the
+        same DynamoDB transaction that writes its marker item. Returns False
+        when it had already been applied.
+        """
+        user_id = transaction['user_id']
+        update = {
+            'Key': {'user_id': user_id},
+            'UpdateExpression': 'ADD total_spent :amount, transaction_count :one, #category :amount',
+            'ExpressionAttributeNames': {'#category': CATEGORY_PREFIX + normalize_category(transaction.get('category'))},
+            'ExpressionAttributeValues': {':amount': Decimal(str(transaction['amount'])), ':one': 1}
+        }
+        transaction_id = transaction.get('transaction_id')
+        if not transaction_id:
+            self.table.update_item(**update)
+        else:
+            try:
+                # The resource's client (de)serializes attribute values for us
+                self.table.meta.client.transact_write_items(TransactItems=[
+                    {'Put': {
+                        'TableName': self.table.name,
+                        'Item': {
+                            'user_id': APPLIED_PREFIX + transaction_id,
+                            'expires_at': int(time.time()) + APPLIED_MARKER_TTL
+                        },
+                        'ConditionExpression': 'attribute_not_exists(user_id)'
+                    }},
+                    {'Update': {'TableName': self.table.name, **update}}
+                ])
+            except ClientError as e:
+                reasons = e.response.get('CancellationReasons') or []
+                if reasons and reasons[0].get('Code') == 'ConditionalCheckFailed':
+                    logger.info("transaction_already_applied", transaction_id=transaction_id)
+                    return False
+                raise
+        self.cache.invalidate(user_id)
+        return True
+
+    def get(self, user_id: str) -> Dict[str, Any]:
+        """Return the user's features, served from the local cache when fresh."""
+        features = self.cache.get(user_id)
+        if features is None:
+            item = self.table.get_item(Key={'user_id': user_id}).get('Item')
+            features = to_features(item)
+            self.cache.put(user_id, features)
+        return features
+
+    def get_many(self, user_ids: List[str]) -> List[Dict[str, Any]]:
+        """Return features for many users, fetching cache misses with batch_get_item."""
+        found = {}
+        missing = []
+        for user_id in dict.fromkeys(user_ids):
+            features = self.cache.get(user_id)
+            if features is None:
+                missing.append(user_id)
+            else:
+                found[user_id] = features
+
+        # The resource's client (de)serializes attribute values for us
+        client = self.table.meta.client
+        for start in range(0, len(missing), BATCH_GET_SIZE):
+            request = {self.table.name: {
+                'Keys': [{'user_id': user_id} for user_id in missing[start:start + BATCH_GET_SIZE]]
+            }}
+            attempt = 0
+            while request:
+                response = client.batch_get_item(RequestItems=request)
+                for item in response.get('Responses', {}).get(self.table.name, []):
+                    found[item['user_id']] = to_features(item)
+                request = response.get('UnprocessedKeys') or {}
+                if request:
+                    attempt += 1
+                    if attempt > BATCH_GET_MAX_RETRIES:
+                        raise RuntimeError(
+                            f"{len(request[self.table.name]['Keys'])} feature keys unprocessed "
+                            f"after {BATCH_GET_MAX_RETRIES} retries"
+                        )
+                    time.sleep(min(1.0, 0.05 * (2 ** attempt)))
+
+        for user_id in missing:
+            features = found.setdefault(user_id, to_features(None))
+            self.cache.put(user_id, features)
+        return [found[user_id] for user_id in user_ids]
+
+    def rebuild(self, transactions: Iterable[Dict[str, Any]]) -> int:
+        """
+        Recompute every user's record from a replay of historical transactions
+        and overwrite the stored items. Returns the number of users written.
+        """
+        records: Dict[str, Dict[str, Any]] = {}
+        for transaction in transactions:
+            user_id = transaction['user_id']
+            amount = Decimal(str(transaction['amount']))
+            record = records.setdefault(user_id, {
+                'user_id': user_id,
+                'total_spent': Decimal(0),
+                'transaction_count': 0
+            })
+            category = CATEGORY_PREFIX + normalize_category(transaction.get('category'))
+            record['total_spent'] += amount
+            record['transaction_count'] += 1
+            record[category] = record.get(category, Decimal(0)) + amount
+
+        with self.table.batch_writer(overwrite_by_pkeys=['user_id']) as writer:
+            for record in records.values():
+                writer.put_item(Item=record)
+        for user_id in records:
+            self.cache.invalidate(user_id)
+
+        logger.info("feature_store_rebuilt", users=len(records))
+        return len(records)
+
+_feature_store: Optional[FeatureStore] = None
+
+def get_feature_store() -> Optional[FeatureStore]:
+    """Return the configured feature store, or None when FEATURE_STORE_TABLE is unset."""
+    global _feature_store
+    table_name = os.getenv('FEATURE_STORE_TABLE')
+    if not table_name:
+        return None
+    if _feature_store is None or _feature_store.table.name != table_name:
+        dynamodb = boto3.resource('dynamodb',
+            endpoint_url=os.getenv('DYNAMODB_ENDPOINT', None),  # None will use default AWS endpoint
+            region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1')
+        )
+        _feature_store = FeatureStore(
+            dynamodb.Table(table_name),
+            cache_ttl=float(os.getenv('FEATURE_CACHE_TTL', '60')),
+            cache_size=int(os.getenv('FEATURE_CACHE_SIZE', '100000'))
+        )
+    return _feature_store
+
+def parse_record(record: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Extract the transaction from an SQS record carrying an SNS notification, or
+    the bare message when the subscription uses raw message delivery.
+    """
+    if 'schema_version' in record.get('messageAttributes', {}):
+        return events.decode(record['body'], record['messageAttributes'])
+    notification = events.loads(record['body'])
+    return events.decode(notification['Message'], notification.get('MessageAttributes'))
+
+def lambda_handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    """
+    Apply transaction events delivered from the reward-events topic through
+    SQS. Failed messages are reported through batchItemFailures so SQS only
+    redelivers those; redelivered events that were already applied are skipped.
+    """
+    store = get_feature_store()
+    if store is None:
+        # Fail the invocation once rather than every record
+        raise RuntimeError("FEATURE_STORE_TABLE is not set")
+    failed_ids = []
+    for record in event['Records']:
+        try:
+            store.apply_transaction(parse_record(record))
+        except Exception as e:
+            logger.error("feature_update_failed", message_id=record.get('messageId'), error=str(e))
+            failed_ids.append(record['messageId'])
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed_ids]}
+
+def read_jsonl(path: str) -> Iterable[Dict[str, Any]]:
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the feature store from a transaction export")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('path', help="JSONL file of transactions (user_id, amount, category)")
+    args = parser.parse_args()
+
+    store = get_feature_store()
+    if store is None:
+        parser.error("FEATURE_STORE_TABLE is not set")
+    users = store.rebuild(read_jsonl(args.path))
+    print(f"Rebuilt features for {users} users")
@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+
+# Arrays written by save() and memory-mapped by load()
+ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots', 'classes_')
+
+# Rows traversed at once; bounds the temporary arrays to a few MB
+CHUNK_ROWS = 2048
+
+class CompiledForest:
+    """
+    A fitted RandomForestClassifier flattened into contiguous NumPy arrays.
+
+    All trees' nodes live in one set of arrays (split feature, threshold,
+    children and normalized leaf class probabilities). Leaves point to
+    themselves, so every row can be walked through every tree in lock-step, one
+    vectorized step per tree level, without any per-node Python or sklearn calls.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, max_depth, classes):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.is_leaf = left == np.arange(len(left))
+
+    @classmethod
+    def from_sklearn(cls, model) -> "CompiledForest":
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for estimator in model.estimators_:
+            tree = estimator.tree_
+            n_nodes = tree.node_count
+            node_ids = np.arange(n_nodes)
+            is_leaf = tree.children_left == -1
+
+            features.append(np.where(is_leaf, 0, tree.feature))
+            thresholds.append(tree.threshold)
+            # Leaves loop back to themselves so extra traversal steps are no-ops
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left) + offset)
+            rights.append(np.where(is_leaf, node_ids, tree.children_right) + offset)
+
+            value = tree.value[:, 0, :]
+            totals = value.sum(axis=1, keepdims=True)
+            values.append(np.divide(value, totals, out=np.zeros_like(value), where=totals > 0))
+
+            roots.append(offset)
+            offset += n_nodes
+            max_depth = max(max_depth, tree.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=max_depth,
+            classes=np.asarray(model.classes_)
+        )
+
+    def save(self, directory: str) -> None:
+        """Write every array as its own .npy file so load() can memory-map them."""
+        os.makedirs(directory, exist_ok=True)
+        for name in ARRAY_NAMES:
+            np.save(os.path.join(directory, name + '.npy'), getattr(self, name))
+        np.save(os.path.join(directory, 'max_depth.npy'), np.asarray(self.max_depth))
+
+    @classmethod
+    def load(cls, directory: str, mmap_mode: str = 'r') -> "CompiledForest":
+        """
+        Load a saved forest. With mmap_mode='r' the arrays are read-only views
+        of the files, so processes loading the same directory share one copy
+        of the pages through the OS page cache.
+        """
+        arrays = {name: np.load(os.path.join(directory, name + '.npy'), mmap_mode=mmap_mode) for name in ARRAY_NAMES}
+        return cls(
+            feature=arrays['feature'],
+            threshold=arrays['threshold'],
+            left=arrays['left'],
+            right=arrays['right'],
+            value=arrays['value'],
+            roots=arrays['roots'],
+            max_depth=np.load(os.path.join(directory, 'max_depth.npy')),
+            classes=arrays['classes_']
+        )
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.feature, self.threshold, self.left, self.right, self.value, self.roots))
+
+    def apply(self, X: np.ndarray) -> np.ndarray:
+        """Return the leaf reached in every tree for every row, shape (n_rows, n_trees)."""
+        # sklearn compares float32 features against the stored thresholds
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        n_rows, n_features = X.shape
+        flat_X = X.ravel()
+
+        # One (row, tree) cursor per pair, advanced level by level; pairs that
+        # reach a leaf drop out so shallow paths stop costing work early
+        nodes = np.tile(self.roots, n_rows)
+        row_offsets = np.repeat(np.arange(n_rows) * n_features, self.n_trees)
+        active = np.flatnonzero(~self.is_leaf[nodes])
+        while active.size:
+            current = nodes[active]
+            go_left = flat_X[row_offsets[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            nodes[active] = current
+            active = active[~self.is_leaf[current]]
+        return nodes.reshape(n_rows, self.n_trees)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Class probabilities averaged over trees, matching RandomForestClassifier.predict_proba."""
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X.reshape(1, -1)
+        # Work in chunks so the (rows, trees, classes) gather stays small
+        proba = np.empty((len(X), self.value.shape[1]))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self.apply(X[start:start + CHUNK_ROWS])
+            proba[start:start + CHUNK_ROWS] = self.value[leaves].sum(axis=1)
+        return proba / self.n_trees
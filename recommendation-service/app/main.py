@@ -1,11 +1,18 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-import joblib
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field, model_validator
+import json
 import numpy as np
 import os
 import logging
-from typing import List, Dict
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Iterator, List, Optional
 import structlog
+from app.catalog import RewardCatalog
+from app.feature_store import get_feature_store
+from app.model_store import LoadedModel, ModelStore
+from app.result_cache import RecommendationCache, feature_key, user_key
 
 # Configure structured logging
 structlog.configure(
@@ -16,16 +23,82 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
-app = FastAPI(title="Reward Recommendation Service")
-
-# Load the pre-trained model
+# Pre-trained model, loaded in the background at startup and reloaded when the file changes
 MODEL_PATH = os.getenv('MODEL_PATH', 'models/reward_model.joblib')
-try:
-    model = joblib.load(MODEL_PATH)
-    logger.info("model_loaded", model_path=MODEL_PATH)
-except Exception as e:
-    logger.error("model_load_failed", error=str(e))
-    model = None
+MODEL_MMAP = os.getenv('MODEL_MMAP', 'true').lower() == 'true'
+MODEL_RELOAD_INTERVAL = float(os.getenv('MODEL_RELOAD_INTERVAL', '30'))  # seconds; 0 disables
+
+# 'sklearn' calls the model directly; 'compiled' evaluates a flattened copy of
+# the forest for requests of up to COMPILED_MAX_ROWS rows, where sklearn's
+# per-call overhead dominates. Larger batches are faster in sklearn's Cython.
+INFERENCE_ENGINE = os.getenv('INFERENCE_ENGINE', 'sklearn')
+COMPILED_MAX_ROWS = int(os.getenv('COMPILED_MAX_ROWS', '64'))
+# Where the compiled forest's arrays are written; defaults to a directory under the system temp dir
+COMPILED_MODEL_DIR = os.getenv('COMPILED_MODEL_DIR')
+
+model_store = ModelStore(
+    MODEL_PATH,
+    compiled=INFERENCE_ENGINE == 'compiled',
+    mmap=MODEL_MMAP,
+    reload_interval=MODEL_RELOAD_INTERVAL,
+    compiled_dir=COMPILED_MODEL_DIR
+)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Don't block startup on the model; /ready reports when it can serve
+    model_store.start()
+    yield
+    await model_store.stop()
+
+app = FastAPI(title="Reward Recommendation Service", lifespan=lifespan)
+
+def current_model() -> LoadedModel:
+    """The model generation to use for one request."""
+    loaded = model_store.current
+    if loaded is None:
+        raise HTTPException(status_code=503, detail="Model not loaded")
+    return loaded
+
+# Model input layout and the reward predicted by each model class
+FEATURE_CATEGORIES = ["groceries", "dining", "shopping", "entertainment"]
+N_FEATURES = 3 + len(FEATURE_CATEGORIES)
+
+# Example reward catalog, used when REWARD_CATALOG_PATH is not set. Model
+# class i predicts category FEATURE_CATEGORIES[i].
+REWARD_CATALOG = [
+    {"id": "R1", "name": "Grocery Store Gift Card", "points": 1000, "description": "$50 gift card for grocery shopping", "category": "groceries"},
+    {"id": "R2", "name": "Restaurant Voucher", "points": 1500, "description": "$75 dining voucher", "category": "dining"},
+    {"id": "R3", "name": "Shopping Mall Gift Card", "points": 2000, "description": "$100 shopping mall gift card", "category": "shopping"},
+    {"id": "R4", "name": "Movie Tickets", "points": 500, "description": "2 movie tickets with popcorn", "category": "entertainment"},
+]
+
+# JSON array or JSONL of rewards: id, name, points, category, description,
+# optional weight and active_from/active_until (ISO 8601)
+REWARD_CATALOG_PATH = os.getenv('REWARD_CATALOG_PATH')
+reward_catalog = (
+    RewardCatalog.from_file(REWARD_CATALOG_PATH, FEATURE_CATEGORIES) if REWARD_CATALOG_PATH
+    else RewardCatalog(REWARD_CATALOG, FEATURE_CATEGORIES)
+)
+logger.info("reward_catalog_loaded", rewards=len(reward_catalog), version=reward_catalog.version)
+
+DEFAULT_TOP_K = int(os.getenv('DEFAULT_TOP_K', '10'))
+MAX_TOP_K = int(os.getenv('MAX_TOP_K', '100'))
+
+# Recommendation response cache, keyed by user and by quantized feature vector
+RECOMMENDATION_CACHE_ENABLED = os.getenv('RECOMMENDATION_CACHE_ENABLED', 'true').lower() == 'true'
+RECOMMENDATION_CACHE_MAX_BYTES = int(os.getenv('RECOMMENDATION_CACHE_MAX_BYTES', str(64 * 1024 * 1024)))
+RECOMMENDATION_CACHE_TTL = float(os.getenv('RECOMMENDATION_CACHE_TTL', '300'))
+CACHE_FEATURE_PRECISION = int(os.getenv('CACHE_FEATURE_PRECISION', '3'))  # significant digits
+
+recommendation_cache = (
+    RecommendationCache(RECOMMENDATION_CACHE_MAX_BYTES, RECOMMENDATION_CACHE_TTL)
+    if RECOMMENDATION_CACHE_ENABLED else None
+)
+
+# Rows scored per predict_proba call by the batch endpoint
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', '4096'))
+MAX_BATCH_USERS = int(os.getenv('MAX_BATCH_USERS', '100000'))
 
 class TransactionHistory(BaseModel):
     total_spent: float
@@ -42,9 +115,13 @@ class RewardRecommendation(BaseModel):
 
 def get_user_transaction_history(user_id: str) -> TransactionHistory:
     """
-    Mock function to get user transaction history.
-    In a real implementation, this would fetch data from the transaction service.
+    Get the user's transaction history features from the feature store.
+    Falls back to example data when FEATURE_STORE_TABLE is not configured.
     """
+    store = get_feature_store()
+    if store is not None:
+        return TransactionHistory(**store.get(user_id))
+
     # Example data
     return TransactionHistory(
         total_spent=1500.0,
@@ -58,60 +135,179 @@ def get_user_transaction_history(user_id: str) -> TransactionHistory:
         }
     )
 
-def generate_recommendations(transaction_history: TransactionHistory) -> List[RewardRecommendation]:
-    """
-    Generate reward recommendations based on transaction history.
-    """
-    if model is None:
-        raise HTTPException(status_code=500, detail="Model not loaded")
+def get_user_transaction_histories(user_ids: List[str]) -> List[TransactionHistory]:
+    """Get transaction history features for many users, batching feature store reads."""
+    store = get_feature_store()
+    if store is not None:
+        return [TransactionHistory(**features) for features in store.get_many(user_ids)]
+    return [get_user_transaction_history(user_id) for user_id in user_ids]
 
-    # Prepare features for the model
-    features = np.array([
+def history_to_features(transaction_history: TransactionHistory) -> List[float]:
+    """Lay out a user's history in the order the model was trained on."""
+    return [
         transaction_history.total_spent,
         transaction_history.transaction_count,
         transaction_history.avg_transaction,
-        transaction_history.category_distribution.get("groceries", 0),
-        transaction_history.category_distribution.get("dining", 0),
-        transaction_history.category_distribution.get("shopping", 0),
-        transaction_history.category_distribution.get("entertainment", 0)
-    ]).reshape(1, -1)
+    ] + [transaction_history.category_distribution.get(category, 0) for category in FEATURE_CATEGORIES]
+
+def predict_proba(loaded: LoadedModel, features: np.ndarray) -> np.ndarray:
+    """Class probabilities for an N x 7 feature matrix from the configured inference engine."""
+    if loaded.compiled is not None and len(features) <= COMPILED_MAX_ROWS:
+        probabilities = loaded.compiled.predict_proba(features)
+    else:
+        probabilities = loaded.model.predict_proba(features)
+    if probabilities.shape[1] != len(FEATURE_CATEGORIES):
+        # Trained without examples of some category: those rewards get zero probability
+        full = np.zeros((len(probabilities), len(FEATURE_CATEGORIES)))
+        full[:, loaded.model.classes_.astype(int)] = probabilities
+        return full
+    return probabilities
+
+def generate_recommendations(
+    transaction_history: TransactionHistory,
+    loaded: Optional[LoadedModel] = None,
+    top_k: int = DEFAULT_TOP_K,
+    points_balance: Optional[int] = None
+) -> List[RewardRecommendation]:
+    """
+    Generate the top_k currently active reward recommendations based on
+    transaction history, limited to rewards the user can afford if a point
+    balance is given.
+    """
+    loaded = loaded or current_model()
+
+    # Prepare features for the model
+    features = np.array(history_to_features(transaction_history)).reshape(1, -1)
 
     # Get predictions from the model
-    predictions = model.predict_proba(features)[0]
-
-    # Example reward catalog
-    rewards = [
-        {"id": "R1", "name": "Grocery Store Gift Card", "points": 1000, "description": "$50 gift card for grocery shopping"},
-        {"id": "R2", "name": "Restaurant Voucher", "points": 1500, "description": "$75 dining voucher"},
-        {"id": "R3", "name": "Shopping Mall Gift Card", "points": 2000, "description": "$100 shopping mall gift card"},
-        {"id": "R4", "name": "Movie Tickets", "points": 500, "description": "2 movie tickets with popcorn"},
+    predictions = predict_proba(loaded, features)
+
+    positions, scores = reward_catalog.rank(predictions, top_k, points_balance)
+    return [
+        RewardRecommendation(**reward_catalog.reward(position), confidence_score=score)
+        for position, score in zip(positions[0].tolist(), scores[0].tolist())
     ]
 
-    # Generate recommendations based on predictions
-    recommendations = []
-    for reward, confidence in zip(rewards, predictions):
-        recommendations.append(RewardRecommendation(
-            reward_id=reward["id"],
-            reward_name=reward["name"],
-            points_required=reward["points"],
-            confidence_score=float(confidence),
-            description=reward["description"]
-        ))
+def score_feature_matrix(loaded: LoadedModel, features: np.ndarray, top_k: int) -> Iterator[tuple]:
+    """
+    Score an N x 7 feature matrix in chunks, one predict_proba call per chunk.
+    Yields (row index, catalog positions, confidence scores) for each row.
+    """
+    for start in range(0, len(features), BATCH_CHUNK_SIZE):
+        probabilities = predict_proba(loaded, features[start:start + BATCH_CHUNK_SIZE])
+        ranked, scores = reward_catalog.rank(probabilities, top_k)
+        for offset in range(len(ranked)):
+            yield start + offset, ranked[offset], scores[offset]
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: Optional[List[str]] = Field(None, max_length=MAX_BATCH_USERS)
+    features: Optional[List[List[float]]] = Field(None, max_length=MAX_BATCH_USERS)
+    top_k: int = Field(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K)
+
+    @model_validator(mode='after')
+    def check_input(self):
+        if (self.user_ids is None) == (self.features is None):
+            raise ValueError("Provide exactly one of user_ids or features")
+        if self.features is not None and any(len(row) != N_FEATURES for row in self.features):
+            raise ValueError(f"Each feature row must have {N_FEATURES} values")
+        return self
 
-    return sorted(recommendations, key=lambda x: x.confidence_score, reverse=True)
+def stream_batch_recommendations(
+    loaded: LoadedModel,
+    keys: List[Any],
+    key_name: str,
+    features: np.ndarray,
+    top_k: int
+) -> Iterator[str]:
+    """Yield one NDJSON line of ranked recommendations per input row."""
+    rewards = {}
+    for row, positions, scores in score_feature_matrix(loaded, features, top_k):
+        recommendations = []
+        for position, score in zip(positions.tolist(), scores.tolist()):
+            if position not in rewards:
+                rewards[position] = reward_catalog.reward(position)
+            recommendations.append({**rewards[position], "confidence_score": score})
+        yield json.dumps({key_name: keys[row], "recommendations": recommendations}) + "\n"
+
+@app.post("/recommendations/batch")
+def get_batch_recommendations(request: BatchRecommendationRequest):
+    # The whole stream is scored by one model generation, even across a reload
+    loaded = current_model()
+
+    top_k = request.top_k
+    if request.user_ids is not None:
+        histories = get_user_transaction_histories(request.user_ids)
+        features = np.array([history_to_features(history) for history in histories], dtype=np.float64)
+        keys, key_name = request.user_ids, "user_id"
+    else:
+        features = np.array(request.features, dtype=np.float64)
+        keys, key_name = list(range(len(features))), "index"
+
+    logger.info("batch_recommendations_requested", rows=len(features), top_k=top_k)
+    return StreamingResponse(
+        stream_batch_recommendations(loaded, keys, key_name, features.reshape(-1, N_FEATURES), top_k),
+        media_type="application/x-ndjson"
+    )
 
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
+@app.get("/ready")
+async def readiness_check():
+    loaded = model_store.current
+    if loaded is None:
+        status = "failed" if model_store.error else "loading"
+        return JSONResponse({"status": status, "error": model_store.error}, status_code=503)
+    return {"status": "ready", "model_version": loaded.version}
+
+@app.get("/metrics")
+async def metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def cache_version(loaded: LoadedModel) -> str:
+    """Cached responses are only valid for the model and catalog that produced them."""
+    return f"{loaded.version}:{reward_catalog.version}"
+
+# A plain def: FastAPI runs it in its threadpool, off the event loop, since
+# the feature store lookup is a blocking DynamoDB call
 @app.get("/recommendations/{user_id}", response_model=List[RewardRecommendation])
-async def get_recommendations(user_id: str):
+def get_recommendations(
+    user_id: str,
+    top_k: int = Query(DEFAULT_TOP_K, ge=1, le=MAX_TOP_K),
+    points_balance: Optional[int] = Query(None, ge=0)
+):
     try:
+        loaded = current_model()
+        cache = recommendation_cache
+        if cache is not None:
+            cache.ensure_version(cache_version(loaded))
+            variant = f"{top_k}:{points_balance}"
+            payload = cache.get(user_key(user_id, variant))
+            if payload is not None:
+                cache.record('user_hit')
+                return Response(payload, media_type="application/json")
+
         # Get user's transaction history
         transaction_history = get_user_transaction_history(user_id)
+
+        if cache is not None:
+            # Users with near-identical spending get the same recommendations
+            features_key = feature_key(history_to_features(transaction_history), CACHE_FEATURE_PRECISION, variant)
+            payload = cache.get(features_key)
+            if payload is not None:
+                cache.put(user_key(user_id, variant), payload)
+                cache.record('feature_hit')
+                return Response(payload, media_type="application/json")
         
         # Generate recommendations
-        recommendations = generate_recommendations(transaction_history)
+        recommendations = generate_recommendations(transaction_history, loaded, top_k, points_balance)
+
+        if cache is not None:
+            payload = json.dumps([r.model_dump() for r in recommendations]).encode()
+            cache.put(features_key, payload)
+            cache.put(user_key(user_id, variant), payload)
+            cache.record('miss')
         
         logger.info(
             "recommendations_generated",
@@ -120,6 +316,8 @@ async def get_recommendations(user_id: str):
         )
         
         return recommendations
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(
             "recommendation_failed",
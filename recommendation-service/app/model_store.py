@@ -0,0 +1,184 @@
+import asyncio
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from dataclasses import dataclass
+from typing import Any, Optional
+
+import joblib
+import structlog
+from prometheus_client import Counter, Gauge
+
+from app.forest import CompiledForest
+
+logger = structlog.get_logger()
+
+# Initialize Prometheus metrics
+model_ready = Gauge(
+    'recommendation_model_ready',
+    'Whether a model is loaded and serving requests'
+)
+
+model_load_seconds = Gauge(
+    'recommendation_model_load_seconds',
+    'Time taken by the most recent model load'
+)
+
+model_loads = Counter(
+    'recommendation_model_loads_total',
+    'Model loads and hot reloads by result',
+    ['result']  # loaded or failed
+)
+
+def model_fingerprint(path: str) -> str:
+    """Identify a model file by inode, modification time and size."""
+    stat = os.stat(path)
+    return f"{stat.st_ino}-{stat.st_mtime_ns}-{stat.st_size}"
+
+@dataclass(frozen=True)
+class LoadedModel:
+    """One immutable model generation. Requests hold on to it until they finish."""
+    model: Any
+    compiled: Optional[CompiledForest]
+    version: str
+    load_seconds: float
+
+def default_compiled_dir() -> str:
+    return os.path.join(tempfile.gettempdir(), 'reward-model-compiled')
+
+def model_cache_key(model_path: str) -> str:
+    """The file name plus a hash of the full path, so same-named models never share a cache."""
+    digest = hashlib.sha256(os.path.abspath(model_path).encode()).hexdigest()[:16]
+    return f"{os.path.basename(model_path)}-{digest}"
+
+def load_compiled(model: Any, model_path: str, version: str, mmap_mode: Optional[str],
+                  compiled_dir: Optional[str] = None) -> CompiledForest:
+    """
+    Load the compiled forest for a model version from
+    `<compiled_dir>/<model cache key>/<version>/`, building it first if no
+    worker has done so yet. Directories are published with an atomic rename, so
+    concurrent workers never see a partial copy and all of them map the same
+    files. If the directory cannot be written (e.g. a read-only filesystem) the
+    forest is kept in memory instead.
+    """
+    parent = os.path.join(compiled_dir or default_compiled_dir(), model_cache_key(model_path))
+    directory = os.path.join(parent, version)
+    try:
+        if not os.path.isdir(directory):
+            publish_compiled(model, parent, version)
+        return CompiledForest.load(directory, mmap_mode=mmap_mode)
+    except OSError as e:
+        logger.warning("compiled_model_in_memory", directory=directory, error=str(e))
+        return CompiledForest.from_sklearn(model)
+
+def publish_compiled(model: Any, parent: str, version: str) -> None:
+    directory = os.path.join(parent, version)
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix='.staging-')
+    try:
+        CompiledForest.from_sklearn(model).save(staging)
+        os.rename(staging, directory)
+    except OSError:
+        # Another worker published this version first
+        if not os.path.isdir(directory):
+            raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    # Older versions can go; workers still mapping them keep their pages until they reload
+    for name in os.listdir(parent):
+        if name != version and not name.startswith('.staging-'):
+            shutil.rmtree(os.path.join(parent, name), ignore_errors=True)
+
+def load_model(path: str, compiled: bool = False, mmap: bool = True, compiled_dir: Optional[str] = None) -> LoadedModel:
+    """
+    Load a joblib model file. With `mmap`, the NumPy arrays inside the pickle
+    (and the compiled forest, when enabled) are memory-mapped read-only, so
+    their pages are shared by every worker process instead of copied per worker.
+    """
+    started = time.perf_counter()
+    version = model_fingerprint(path)
+    mmap_mode = 'r' if mmap else None
+    model = joblib.load(path, mmap_mode=mmap_mode)
+    forest = load_compiled(model, path, version, mmap_mode, compiled_dir) if compiled else None
+    return LoadedModel(model=model, compiled=forest, version=version, load_seconds=time.perf_counter() - started)
+
+class ModelStore:
+    """
+    Holds the serving model and replaces it when the file on disk changes.
+
+    Loading happens off the event loop, so the service starts accepting
+    requests immediately and reports readiness separately. A reload builds the
+    new generation completely before swapping a single reference; in-flight
+    requests keep using the generation they started with. New models should be
+    published with an atomic rename (e.g. `mv model.tmp reward_model.joblib`).
+    """
+
+    def __init__(self, path: str, compiled: bool = False, mmap: bool = True, reload_interval: float = 30.0,
+                 compiled_dir: Optional[str] = None):
+        self.path = path
+        self.compiled = compiled
+        self.compiled_dir = compiled_dir
+        self.mmap = mmap
+        self.reload_interval = reload_interval
+        self.current: Optional[LoadedModel] = None
+        self.error: Optional[str] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.current is not None
+
+    def load(self) -> bool:
+        """Load the model file if it changed since the current generation. Returns True on swap."""
+        try:
+            version = model_fingerprint(self.path)
+            if self.current is not None and self.current.version == version:
+                return False
+            loaded = load_model(self.path, compiled=self.compiled, mmap=self.mmap, compiled_dir=self.compiled_dir)
+        except Exception as e:
+            # Keep serving the previous generation, if any
+            self.error = str(e)
+            model_loads.labels(result='failed').inc()
+            logger.error("model_load_failed", model_path=self.path, error=str(e))
+            return False
+
+        previous = self.current
+        self.current = loaded
+        self.error = None
+        model_ready.set(1)
+        model_load_seconds.set(loaded.load_seconds)
+        model_loads.labels(result='loaded').inc()
+        logger.info(
+            "model_loaded",
+            model_path=self.path,
+            version=loaded.version,
+            previous_version=previous.version if previous else None,
+            compiled=loaded.compiled is not None,
+            load_seconds=round(loaded.load_seconds, 4)
+        )
+        return True
+
+    def start(self) -> asyncio.Task:
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        if self._stopping is not None:
+            self._stopping.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self) -> None:
+        await asyncio.to_thread(self.load)
+        if self.reload_interval <= 0:
+            return
+        while not self._stopping.is_set():
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=self.reload_interval)
+            except asyncio.TimeoutError:
+                await asyncio.to_thread(self.load)
@@ -0,0 +1,130 @@
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from prometheus_client import Counter, Gauge
+
+# Initialize Prometheus metrics
+cache_requests = Counter(
+    'recommendation_cache_requests_total',
+    'Recommendation cache lookups by result',
+    ['result']  # user_hit, feature_hit or miss
+)
+
+cache_evictions = Counter(
+    'recommendation_cache_evictions_total',
+    'Recommendation cache entries removed',
+    ['reason']  # size, expired or invalidated
+)
+
+cache_hit_ratio = Gauge(
+    'recommendation_cache_hit_ratio',
+    'Share of recommendation requests served from the cache'
+)
+
+cache_bytes = Gauge(
+    'recommendation_cache_bytes',
+    'Approximate size of cached recommendation responses'
+)
+
+# Fixed per-entry overhead (key, tuple, OrderedDict node) added to the payload size
+ENTRY_OVERHEAD_BYTES = 200
+
+def quantize(values: Iterable[float], significant_digits: int) -> tuple:
+    """Round each value to a number of significant digits so near-identical vectors collide."""
+    quantized = []
+    for value in values:
+        value = float(value)
+        if value == 0 or not math.isfinite(value):
+            quantized.append(value)
+        else:
+            digits = significant_digits - 1 - math.floor(math.log10(abs(value)))
+            quantized.append(round(value, digits))
+    return tuple(quantized)
+
+def feature_key(values: Iterable[float], significant_digits: int, variant: str = '') -> str:
+    """`variant` distinguishes responses for the same input with different request options."""
+    digest = hashlib.blake2b(repr(quantize(values, significant_digits)).encode(), digest_size=16)
+    return f'features:{digest.hexdigest()}:{variant}'
+
+def user_key(user_id: str, variant: str = '') -> str:
+    return f'user:{user_id}:{variant}'
+
+class RecommendationCache:
+    """
+    Bounded LRU/TTL cache of serialized recommendation responses.
+
+    Entries are capped by total size in bytes. Every entry belongs to a
+    version (model + reward catalog); when the version changes the whole
+    cache is dropped so stale recommendations are never served.
+    """
+
+    def __init__(self, max_bytes: int, ttl_seconds: float):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.version: Optional[str] = None
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def ensure_version(self, version: str) -> None:
+        """Drop every entry if the model or catalog changed since they were cached."""
+        if version == self.version:
+            return
+        with self._lock:
+            if version != self.version:
+                if self._entries:
+                    cache_evictions.labels(reason='invalidated').inc(len(self._entries))
+                self._entries.clear()
+                self.size = 0
+                self.version = version
+                cache_bytes.set(0)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, payload = entry
+            if expires_at < time.monotonic():
+                self._remove(key)
+                cache_evictions.labels(reason='expired').inc()
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def put(self, key: str, payload: bytes) -> None:
+        entry_size = len(payload) + len(key) + ENTRY_OVERHEAD_BYTES
+        if entry_size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, payload)
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                cache_evictions.labels(reason='size').inc()
+
+    def record(self, result: str) -> None:
+        """Count a lookup result ('user_hit', 'feature_hit' or 'miss')."""
+        cache_requests.labels(result=result).inc()
+        if result == 'miss':
+            self.misses += 1
+        else:
+            self.hits += 1
+        cache_hit_ratio.set(self.hits / (self.hits + self.misses))
+
+    def _remove(self, key: str) -> None:
+        _, payload = self._entries.pop(key)
+        self.size -= len(payload) + len(key) + ENTRY_OVERHEAD_BYTES
+        cache_bytes.set(self.size)
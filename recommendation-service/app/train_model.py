@@ -1,23 +1,46 @@
 import numpy as np
 from sklearn.ensemble import RandomForestClassifier
+import argparse
+import hashlib
+import itertools
 import joblib
+import json
 import os
+import resource
+import shutil
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterator, List, Optional, Tuple
+
+try:
+    import orjson
+    parse_json = orjson.loads
+except ImportError:  # optional fast path
+    parse_json = json.loads
+
+# Kept in sync with FEATURE_CATEGORIES in app/main.py; this script runs standalone
+CATEGORIES = ["groceries", "dining", "shopping", "entertainment"]
+FEATURE_NAMES = ["total_spent", "transaction_count", "avg_transaction"] + CATEGORIES
+CHUNK_ROWS = 250_000  # rows parsed per chunk; bounds the aggregation stage's memory
+MODEL_NAME = 'reward_model'
 
 def generate_sample_data(n_samples=1000):
     """
     Generate sample training data for the recommendation model.
     """
     np.random.seed(42)
-    
+
     # Generate random transaction data
     total_spent = np.random.uniform(500, 5000, n_samples)
     transaction_count = np.random.randint(5, 50, n_samples)
     avg_transaction = total_spent / transaction_count
-    
+
     # Generate category distributions
     categories = ["groceries", "dining", "shopping", "entertainment"]
     category_distributions = np.random.dirichlet(np.ones(4), n_samples)
-    
+
     # Generate features
     X = np.column_stack([
         total_spent,
@@ -25,31 +48,286 @@ def generate_sample_data(n_samples=1000):
         avg_transaction,
         category_distributions
     ])
-    
+
     # Generate labels (which reward would be most suitable)
     # In a real scenario, this would be based on actual user behavior
     y = np.random.randint(0, 4, n_samples)
-    
+
     return X, y
 
-def train_model():
+class Stage:
     """
-    Train a simple recommendation model using Random Forest.
+    Times a pipeline stage and samples the process's resident memory in the
+    background, so the reported peak includes native (NumPy, sklearn) memory.
     """
-    # Generate sample data
-    X, y = generate_sample_data()
-    
+
+    def __init__(self, name: str, report: Dict[str, dict]):
+        self.name = name
+        self.report = report
+        self.rows = 0
+        self.peak_rss = 0
+        self._stopping = threading.Event()
+
+    def __enter__(self) -> "Stage":
+        self.started = time.perf_counter()
+        self.peak_rss = current_rss()
+        self._sampler = threading.Thread(target=self._sample, daemon=True)
+        self._sampler.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stopping.set()
+        self._sampler.join()
+        seconds = time.perf_counter() - self.started
+        self.report[self.name] = {
+            'seconds': round(seconds, 3),
+            'rows': self.rows,
+            'rows_per_second': round(self.rows / seconds) if seconds > 0 else None,
+            'peak_rss_mb': round(self.peak_rss / 2 ** 20, 1)
+        }
+        print(f"{self.name:>10}: {self.rows:>12,} rows in {seconds:8.2f}s "
+              f"({self.report[self.name]['rows_per_second'] or 0:>12,} rows/s), "
+              f"peak RSS {self.report[self.name]['peak_rss_mb']:,.1f} MB")
+
+    def _sample(self) -> None:
+        while not self._stopping.wait(0.05):
+            self.peak_rss = max(self.peak_rss, current_rss())
+
+def current_rss() -> int:
+    """Resident set size in bytes (Linux /proc; elsewhere the process high-water mark)."""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+def read_chunks(path: str, chunk_rows: int) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+    """
+    Stream (user_id, amount, category) column arrays from a JSONL or Parquet
+    transaction export, at most `chunk_rows` rows at a time.
+    """
+    if path.endswith('.parquet'):
+        try:
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise SystemExit("Reading Parquet exports requires pyarrow (pip install pyarrow)")
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(batch_size=chunk_rows, columns=['user_id', 'amount', 'category']):
+            yield (
+                np.asarray(batch.column('user_id').to_pylist(), dtype=object),
+                batch.column('amount').to_numpy(zero_copy_only=False).astype(np.float64),
+                np.asarray(batch.column('category').to_pylist(), dtype=object)
+            )
+        return
+
+    with open(path, 'rb') as f:
+        while True:
+            user_ids, amounts, categories = [], [], []
+            for line in itertools.islice(f, chunk_rows):
+                if line.strip():
+                    record = parse_json(line)
+                    user_ids.append(record['user_id'])
+                    amounts.append(record['amount'])
+                    categories.append(record.get('category'))
+            if not user_ids:
+                return
+            yield (
+                np.array(user_ids, dtype=object),
+                np.array(amounts, dtype=np.float64),
+                np.array(categories, dtype=object)
+            )
+
+class FeatureAggregator:
+    """
+    Per-user spending totals accumulated one chunk at a time.
+
+    Each chunk is reduced with vectorized group-by (np.unique + np.bincount)
+    before it touches the running totals, so memory grows with the number of
+    users, not the number of rows.
+    """
+
+    def __init__(self, capacity: int = 1024):
+        self.user_index: Dict[str, int] = {}
+        self.totals = np.zeros(capacity)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.category_totals = np.zeros((capacity, len(CATEGORIES)))
+
+    def _grow(self, needed: int) -> None:
+        capacity = len(self.totals)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in ('totals', 'counts', 'category_totals'):
+            old = getattr(self, name)
+            new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def add(self, user_ids: np.ndarray, amounts: np.ndarray, categories: np.ndarray) -> None:
+        users, user_codes = np.unique(user_ids.astype(str), return_inverse=True)
+        # Map the chunk's distinct users (not its rows) to global indexes
+        index = self.user_index
+        global_ids = np.fromiter((index.setdefault(user, len(index)) for user in users.tolist()), dtype=np.intp, count=len(users))
+        self._grow(len(index))
+
+        names, category_inverse = np.unique(np.where(categories == None, '', categories).astype(str), return_inverse=True)  # noqa: E711
+        lookup = np.array([
+            CATEGORIES.index(name.strip().lower()) if name.strip().lower() in CATEGORIES else len(CATEGORIES)
+            for name in names.tolist()
+        ], dtype=np.intp)
+        category_codes = lookup[category_inverse]
+
+        n_users = len(users)
+        self.totals[global_ids] += np.bincount(user_codes, weights=amounts, minlength=n_users)
+        self.counts[global_ids] += np.bincount(user_codes, minlength=n_users)
+        # Spend per (user, category); the extra column collects unknown categories
+        width = len(CATEGORIES) + 1
+        by_category = np.bincount(user_codes * width + category_codes, weights=amounts, minlength=n_users * width)
+        self.category_totals[global_ids] += by_category.reshape(n_users, width)[:, :len(CATEGORIES)]
+
+    def features(self, out: np.ndarray) -> None:
+        """Write the model's features (layout FEATURE_NAMES) for every user into `out`."""
+        n = len(self.user_index)
+        totals = self.totals[:n]
+        counts = self.counts[:n]
+        safe_totals = np.where(totals > 0, totals, 1)
+        out[:, 0] = totals
+        out[:, 1] = counts
+        out[:, 2] = totals / np.maximum(counts, 1)
+        out[:, 3:] = np.where(totals[:, None] > 0, self.category_totals[:n] / safe_totals[:, None], 0)
+
+    def labels(self) -> np.ndarray:
+        """
+        Training target: each user's dominant spending category. Exports carry
+        no redemption outcomes, so this is a proxy label.
+        """
+        return np.argmax(self.category_totals[:len(self.user_index)], axis=1)
+
+def cache_key(paths: List[str]) -> str:
+    """Identify a set of exports by path, size and modification time."""
+    digest = hashlib.sha1()
+    for path in sorted(paths):
+        stat = os.stat(path)
+        digest.update(f"{os.path.abspath(path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+def build_feature_matrix(
+    paths: List[str],
+    cache_dir: str,
+    chunk_rows: int,
+    report: Dict[str, dict]
+) -> Tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Return memory-mapped (features, labels) for the exports, computing and
+    caching them as .npy files on first use. The flag is True on a cache hit.
+    """
+    key = cache_key(paths)
+    features_path = os.path.join(cache_dir, f'features-{key}.npy')
+    labels_path = os.path.join(cache_dir, f'labels-{key}.npy')
+    if os.path.exists(features_path) and os.path.exists(labels_path):
+        print(f"Using cached feature matrix {features_path}")
+        return np.load(features_path, mmap_mode='r'), np.load(labels_path, mmap_mode='r'), True
+
+    aggregator = FeatureAggregator()
+    with Stage('aggregate', report) as stage:
+        for path in paths:
+            for user_ids, amounts, categories in read_chunks(path, chunk_rows):
+                aggregator.add(user_ids, amounts, categories)
+                stage.rows += len(user_ids)
+
+    os.makedirs(cache_dir, exist_ok=True)
+    with Stage('features', report) as stage:
+        n_users = len(aggregator.user_index)
+        staging = features_path + '.tmp'
+        features = np.lib.format.open_memmap(staging, mode='w+', dtype=np.float32, shape=(n_users, len(FEATURE_NAMES)))
+        aggregator.features(features)
+        features.flush()
+        del features
+        os.replace(staging, features_path)
+        with open(labels_path + '.tmp', 'wb') as f:
+            np.save(f, aggregator.labels().astype(np.int64))
+        os.replace(labels_path + '.tmp', labels_path)
+        stage.rows = n_users
+
+    return np.load(features_path, mmap_mode='r'), np.load(labels_path, mmap_mode='r'), False
+
+def save_model(model, output_dir: str, metadata: dict) -> str:
+    """
+    Write `<name>-<version>.joblib` and its `.json` metadata, then publish it as
+    `<name>.joblib` with an atomic rename so a running service hot-reloads it.
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    version = metadata['version']
+    versioned_path = os.path.join(output_dir, f'{MODEL_NAME}-{version}.joblib')
+    joblib.dump(model, versioned_path)
+    with open(os.path.join(output_dir, f'{MODEL_NAME}-{version}.json'), 'w') as f:
+        json.dump(metadata, f, indent=2)
+
+    model_path = os.path.join(output_dir, f'{MODEL_NAME}.joblib')
+    staging = model_path + '.tmp'
+    shutil.copyfile(versioned_path, staging)
+    os.replace(staging, model_path)
+    return model_path
+
+def train_model(
+    inputs: Optional[List[str]] = None,
+    output_dir: str = 'models',
+    cache_dir: Optional[str] = None,
+    chunk_rows: int = CHUNK_ROWS,
+    n_estimators: int = 100,
+    n_jobs: int = -1
+) -> dict:
+    """
+    Train the recommendation model, on the given transaction exports or on
+    sample data when none are given. Returns the model's metadata.
+    """
+    report: Dict[str, dict] = {}
+    if inputs:
+        cache_dir = cache_dir or os.path.join(output_dir, 'feature-cache')
+        X, y, cached = build_feature_matrix(inputs, cache_dir, chunk_rows, report)
+    else:
+        # Generate sample data
+        X, y = generate_sample_data()
+        cached = False
+
     # Train model
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
-    model.fit(X, y)
-    
-    # Create models directory if it doesn't exist
-    os.makedirs('models', exist_ok=True)
-    
+    with Stage('train', report) as stage:
+        model = RandomForestClassifier(n_estimators=n_estimators, random_state=42, n_jobs=n_jobs)
+        model.fit(X, y)
+        stage.rows = len(X)
+    # Serving scores one user at a time; a worker pool per request would only add latency
+    model.set_params(n_jobs=None)
+
+    created_at = datetime.now(timezone.utc)
+    metadata = {
+        'version': created_at.strftime('%Y%m%dT%H%M%S%fZ'),
+        'created_at': created_at.isoformat(),
+        'inputs': inputs or [],
+        'feature_cache_hit': cached,
+        'users': int(len(X)),
+        'feature_names': FEATURE_NAMES,
+        'classes': [CATEGORIES[int(c)] for c in model.classes_],
+        'params': {'n_estimators': n_estimators, 'chunk_rows': chunk_rows},
+        'stages': report
+    }
+
     # Save model
-    model_path = 'models/reward_model.joblib'
-    joblib.dump(model, model_path)
-    print(f"Model saved to {model_path}")
+    with Stage('save', report) as stage:
+        model_path = save_model(model, output_dir, metadata)
+        stage.rows = len(X)
+    print(f"Model saved to {model_path} (version {metadata['version']})")
+    return metadata
 
 if __name__ == "__main__":
-    train_model() 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Train the reward recommendation model")
+    parser.add_argument('inputs', nargs='*', help="JSONL or Parquet transaction exports (user_id, amount, category); sample data if omitted")
+    parser.add_argument('--output-dir', default='models')
+    parser.add_argument('--cache-dir', help="Where to cache feature matrices (default: <output-dir>/feature-cache)")
+    parser.add_argument('--chunk-rows', type=int, default=CHUNK_ROWS)
+    parser.add_argument('--n-estimators', type=int, default=100)
+    parser.add_argument('--n-jobs', type=int, default=-1)
+    args = parser.parse_args()
+
+    train_model(args.inputs, args.output_dir, args.cache_dir, args.chunk_rows, args.n_estimators, args.n_jobs)
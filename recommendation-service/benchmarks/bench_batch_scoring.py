@@ -0,0 +1,64 @@
+"""
+Compare users/sec for per-user scoring (what GET /recommendations/{user_id}
+does) against the vectorized batch path used by POST /recommendations/batch.
+
+Requires a trained model (python app/train_model.py). Run from the
+recommendation-service directory:
+
+    python benchmarks/bench_batch_scoring.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.main import (  # noqa: E402
+    FEATURE_CATEGORIES,
+    TransactionHistory,
+    generate_recommendations,
+    model_store,
+    stream_batch_recommendations,
+)
+
+def random_features(n: int) -> np.ndarray:
+    rng = np.random.default_rng(42)
+    total_spent = rng.uniform(500, 5000, n)
+    transaction_count = rng.integers(5, 50, n)
+    distribution = rng.dirichlet(np.ones(len(FEATURE_CATEGORIES)), n)
+    return np.column_stack([total_spent, transaction_count, total_spent / transaction_count, distribution])
+
+def per_user(features: np.ndarray) -> None:
+    for row in features:
+        history = TransactionHistory(
+            total_spent=row[0],
+            transaction_count=int(row[1]),
+            avg_transaction=row[2],
+            category_distribution=dict(zip(FEATURE_CATEGORIES, row[3:]))
+        )
+        generate_recommendations(history)
+
+def batch(features: np.ndarray) -> None:
+    keys = list(range(len(features)))
+    for _ in stream_batch_recommendations(model_store.current, keys, "index", features, top_k=4):
+        pass
+
+def users_per_second(func, features: np.ndarray) -> float:
+    started = time.perf_counter()
+    func(features)
+    return len(features) / (time.perf_counter() - started)
+
+def main() -> None:
+    model_store.load()
+    print(f"{'users':>8} {'per-user users/s':>18} {'batch users/s':>15} {'speedup':>8}")
+    for n in (100, 1000, 10000):
+        features = random_features(n)
+        # Per-user scoring is slow; time a sample and extrapolate the rate
+        single_rate = users_per_second(per_user, features[:min(n, 200)])
+        batch_rate = users_per_second(batch, features)
+        print(f"{n:>8} {single_rate:>18.0f} {batch_rate:>15.0f} {batch_rate / single_rate:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Ranking latency as the reward catalog grows from 4 to 100k entries, for the
+indexed top-k (RewardCatalog.rank) versus scoring and sorting every reward.
+
+Run from the recommendation-service directory:
+
+    python benchmarks/bench_catalog.py
+"""
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.catalog import RewardCatalog  # noqa: E402
+
+CATEGORIES = ["groceries", "dining", "shopping", "entertainment"]
+SIZES = [4, 100, 1000, 10000, 100000]
+TOP_K = 10
+NOW = int(time.time())
+
+def synthetic_catalog(n: int) -> RewardCatalog:
+    rng = np.random.default_rng(42)
+    day = 86400
+    rewards = [
+        {
+            "id": f"R{i}",
+            "name": f"Reward {i}",
+            "points": int(points),
+            "category": CATEGORIES[i % len(CATEGORIES)],
+            "weight": float(weight),
+            # A quarter of the catalog is outside its availability window
+            **({"active_until": time.strftime('%Y-%m-%d', time.gmtime(NOW - day))} if i % 4 == 3 else {})
+        }
+        for i, (points, weight) in enumerate(zip(rng.integers(100, 5000, n), rng.uniform(0.5, 1.5, n)))
+    ]
+    return RewardCatalog(rewards, CATEGORIES)
+
+def full_sort(catalog: RewardCatalog, probabilities: np.ndarray, points_balance) -> np.ndarray:
+    """Baseline: score every reward, mask, and sort them all."""
+    scores = np.append(probabilities, 0.0)[catalog.category_codes] * catalog.weight
+    eligible = (catalog.active_from <= NOW) & (NOW <= catalog.active_until)
+    if points_balance is not None:
+        eligible &= catalog.points <= points_balance
+    positions = np.flatnonzero(eligible)
+    return positions[np.lexsort((positions, -scores[positions]))][:TOP_K]
+
+def median_us(func, repeat: int = 200) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1e6
+
+def main() -> None:
+    probabilities = np.array([0.1, 0.4, 0.3, 0.2])
+    batch = np.random.default_rng(1).dirichlet(np.ones(len(CATEGORIES)), 1000)
+    print(f"top_k={TOP_K}; single-row latency in microseconds, 1000-row batch in milliseconds")
+    print(f"{'rewards':>8} {'indexed':>8} {'indexed+balance':>16} {'full sort':>10} "
+          f"{'full+balance':>13} {'batch 1000 ms':>14}")
+    for n in SIZES:
+        catalog = synthetic_catalog(n)
+        np.testing.assert_array_equal(catalog.rank(probabilities, TOP_K, 1500, NOW)[0][0],
+                                      full_sort(catalog, probabilities, 1500))
+        print(
+            f"{n:>8} "
+            f"{median_us(lambda: catalog.rank(probabilities, TOP_K, now=NOW)):>8.0f} "
+            f"{median_us(lambda: catalog.rank(probabilities, TOP_K, 1500, NOW)):>16.0f} "
+            f"{median_us(lambda: full_sort(catalog, probabilities, None)):>10.0f} "
+            f"{median_us(lambda: full_sort(catalog, probabilities, 1500)):>13.0f} "
+            f"{median_us(lambda: catalog.rank(batch, TOP_K, now=NOW), repeat=20) / 1000:>14.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""
+Compare feature lookups from the feature store against recomputing the same
+features from a user's raw transaction rows.
+
+Runs against an in-process DynamoDB stand-in (moto), so absolute numbers
+include moto's overhead; the interesting part is how each approach scales with
+history length. Run from the recommendation-service directory:
+
+    python benchmarks/bench_feature_store.py
+"""
+import os
+import sys
+import time
+from decimal import Decimal
+
+import boto3
+from boto3.dynamodb.conditions import Key
+from moto import mock_dynamodb
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.feature_store import FeatureStore, to_features, CATEGORY_PREFIX, normalize_category  # noqa: E402
+
+HISTORY_SIZES = [10, 100, 1000, 5000]
+CATEGORIES = ['groceries', 'dining', 'shopping', 'entertainment']
+REPEAT = 20
+
+def recompute_from_rows(table, user_id: str):
+    """What get_user_transaction_history would have to do without the store."""
+    item = {'total_spent': Decimal(0), 'transaction_count': 0}
+    kwargs = {'KeyConditionExpression': Key('user_id').eq(user_id)}
+    while True:
+        response = table.query(**kwargs)
+        for row in response['Items']:
+            category = CATEGORY_PREFIX + normalize_category(row.get('category'))
+            item['total_spent'] += row['amount']
+            item['transaction_count'] += 1
+            item[category] = item.get(category, Decimal(0)) + row['amount']
+        if 'LastEvaluatedKey' not in response:
+            return to_features(item)
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def timed(func, repeat: int = REPEAT) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+def main() -> None:
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        features = dynamodb.create_table(
+            TableName='user-features',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        raw = dynamodb.create_table(
+            TableName='transactions',
+            KeySchema=[
+                {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                {'AttributeName': 'transaction_id', 'KeyType': 'RANGE'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'transaction_id', 'AttributeType': 'S'}
+            ],
+            BillingMode='PAY_PER_REQUEST'
+        )
+
+        store = FeatureStore(features, cache_ttl=60)
+        print(f"{'history':>8} {'recompute ms':>14} {'store ms':>10} {'cached ms':>10}")
+        for size in HISTORY_SIZES:
+            user_id = f'user-{size}'
+            transactions = [
+                {
+                    'user_id': user_id,
+                    'transaction_id': f'{i:08d}',
+                    'amount': Decimal(str(10 + i % 90)),
+                    'category': CATEGORIES[i % len(CATEGORIES)]
+                }
+                for i in range(size)
+            ]
+            with raw.batch_writer() as writer:
+                for transaction in transactions:
+                    writer.put_item(Item=transaction)
+            store.rebuild(transactions)
+
+            assert recompute_from_rows(raw, user_id) == store.get(user_id)
+
+            def uncached():
+                store.cache.invalidate(user_id)
+                store.get(user_id)
+
+            print(
+                f"{size:>8} "
+                f"{timed(lambda: recompute_from_rows(raw, user_id)):>14.3f} "
+                f"{timed(uncached):>10.3f} "
+                f"{timed(lambda: store.get(user_id)):>10.4f}"
+            )
+
+if __name__ == "__main__":
+    main()
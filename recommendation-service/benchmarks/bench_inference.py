@@ -0,0 +1,68 @@
+"""
+Latency and memory of sklearn's predict_proba versus the compiled array-based
+forest for batch sizes from 1 to 10k rows.
+
+Requires a trained model (python app/train_model.py). Run from the
+recommendation-service directory:
+
+    python benchmarks/bench_inference.py
+"""
+import os
+import pickle
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.forest import CompiledForest  # noqa: E402
+from app.train_model import generate_sample_data  # noqa: E402
+
+MODEL_PATH = os.getenv('MODEL_PATH', 'models/reward_model.joblib')
+BATCH_SIZES = [1, 10, 100, 1000, 10000]
+
+def median_ms(func, repeat: int) -> float:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - started)
+    return float(np.median(samples)) * 1000
+
+def peak_mib(func) -> float:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2 ** 20
+
+def main() -> None:
+    model = joblib.load(MODEL_PATH)
+    started = time.perf_counter()
+    compiled = CompiledForest.from_sklearn(model)
+    compile_ms = (time.perf_counter() - started) * 1000
+
+    print(f"trees={compiled.n_trees} max_depth={compiled.max_depth} compile={compile_ms:.1f}ms")
+    print(f"model size: sklearn pickle {len(pickle.dumps(model)) / 2 ** 20:.2f} MiB, "
+          f"compiled arrays {compiled.nbytes / 2 ** 20:.2f} MiB")
+    print(f"{'batch':>6} {'sklearn ms':>11} {'compiled ms':>12} {'speedup':>8} "
+          f"{'sklearn peak MiB':>17} {'compiled peak MiB':>18}")
+
+    X_all, _ = generate_sample_data(n_samples=max(BATCH_SIZES))
+    for batch_size in BATCH_SIZES:
+        X = X_all[:batch_size]
+        np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-9)
+        repeat = 200 if batch_size <= 100 else 20
+        sklearn_ms = median_ms(lambda: model.predict_proba(X), repeat)
+        compiled_ms = median_ms(lambda: compiled.predict_proba(X), repeat)
+        print(
+            f"{batch_size:>6} {sklearn_ms:>11.3f} {compiled_ms:>12.3f} {sklearn_ms / compiled_ms:>7.1f}x "
+            f"{peak_mib(lambda: model.predict_proba(X)):>17.2f} "
+            f"{peak_mib(lambda: compiled.predict_proba(X)):>18.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
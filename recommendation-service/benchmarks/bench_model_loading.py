@@ -0,0 +1,78 @@
+"""
+Per-worker memory and cold-start time for several worker processes loading
+the model, comparing a private copy per worker (MODEL_MMAP=false, what every
+worker did before) against memory-mapped loading.
+
+RSS counts shared pages in full in every worker; PSS splits them between the
+workers that map them, so the PSS total is the real memory cost. "import"
+is how long `import app.main` takes (the model used to load at import time,
+blocking startup); "ready" is the time until the model can serve.
+
+Requires a trained model (python app/train_model.py). Run from the
+recommendation-service directory:
+
+    python benchmarks/bench_model_loading.py [workers]
+"""
+import multiprocessing
+import os
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def memory_kib() -> dict:
+    """RSS and PSS of this process, in KiB, from /proc (Linux only)."""
+    values = {}
+    with open('/proc/self/smaps_rollup') as f:
+        for line in f:
+            name, _, rest = line.partition(':')
+            if name in ('Rss', 'Pss', 'Anonymous'):
+                values[name] = int(rest.split()[0])
+    return values
+
+def worker(results, barrier) -> None:
+    started = time.perf_counter()
+    sys.path.insert(0, ROOT)
+    os.chdir(ROOT)
+    from app.main import model_store
+    imported = time.perf_counter()
+    model_store.load()
+    ready = time.perf_counter()
+    # Measure once every worker has the model mapped, so shared pages are split
+    barrier.wait()
+    results.put({
+        'import_ms': (imported - started) * 1000,
+        'ready_ms': (ready - started) * 1000,
+        **memory_kib()
+    })
+    barrier.wait()
+
+def run(workers: int, mmap: bool) -> list:
+    os.environ['MODEL_MMAP'] = 'true' if mmap else 'false'
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    barrier = context.Barrier(workers)
+    processes = [context.Process(target=worker, args=(results, barrier)) for _ in range(workers)]
+    for process in processes:
+        process.start()
+    samples = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+    return samples
+
+def main() -> None:
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    os.environ.setdefault('INFERENCE_ENGINE', 'compiled')
+    print(f"{workers} workers, INFERENCE_ENGINE={os.environ['INFERENCE_ENGINE']}")
+    print(f"{'mode':>8} {'import ms':>10} {'ready ms':>9} {'RSS MiB':>8} {'anon MiB':>9} {'PSS MiB':>8} {'PSS total':>10}")
+    for mmap in (False, True):
+        samples = run(workers, mmap)
+        mean = {key: sum(s[key] for s in samples) / len(samples) for key in samples[0]}
+        print(
+            f"{'mmap' if mmap else 'private':>8} {mean['import_ms']:>10.0f} {mean['ready_ms']:>9.0f} "
+            f"{mean['Rss'] / 1024:>8.1f} {mean['Anonymous'] / 1024:>9.1f} {mean['Pss'] / 1024:>8.1f} "
+            f"{sum(s['Pss'] for s in samples) / 1024:>10.1f}"
+        )
+
+if __name__ == "__main__":
+    main()
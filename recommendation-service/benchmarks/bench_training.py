@@ -0,0 +1,49 @@
+"""
+End-to-end throughput and peak memory of the training pipeline on a
+synthetic JSONL transaction export, run twice to show the feature cache.
+
+Run from the recommendation-service directory:
+
+    python benchmarks/bench_training.py [rows] [users]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.train_model import CATEGORIES, train_model  # noqa: E402
+
+def write_export(path: str, rows: int, users: int) -> None:
+    rng = np.random.default_rng(42)
+    categories = np.array(CATEGORIES + ['travel'])
+    with open(path, 'w') as f:
+        for start in range(0, rows, 100000):
+            n = min(100000, rows - start)
+            user_ids = rng.integers(0, users, n)
+            amounts = np.round(rng.uniform(1, 500, n), 2)
+            picked = categories[rng.integers(0, len(categories), n)]
+            f.writelines(
+                f'{{"user_id": "user{u}", "amount": {a}, "category": "{c}", "merchant": "Store"}}\n'
+                for u, a, c in zip(user_ids.tolist(), amounts.tolist(), picked.tolist())
+            )
+
+def main() -> None:
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    users = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'transactions.jsonl')
+        started = time.perf_counter()
+        write_export(path, rows, users)
+        print(f"Wrote {rows:,} rows for {users:,} users ({os.path.getsize(path) / 2 ** 20:.0f} MiB) "
+              f"in {time.perf_counter() - started:.1f}s")
+
+        for run in ('cold', 'cached'):
+            print(f"\n{run} run:")
+            train_model([path], output_dir=os.path.join(directory, 'models'), n_estimators=50)
+
+if __name__ == "__main__":
+    main()
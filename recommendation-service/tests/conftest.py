@@ -0,0 +1,10 @@
+import pytest
+
+from app.main import model_store
+
+@pytest.fixture(autouse=True, scope="session")
+def loaded_model():
+    """Clients created without a lifespan never start the background loader."""
+    if model_store.current is None:
+        model_store.load()
+    return model_store.current
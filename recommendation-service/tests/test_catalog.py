@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from app.catalog import RewardCatalog, to_epoch
+
+CATEGORIES = ["groceries", "dining", "shopping", "entertainment"]
+NOW = to_epoch("2024-06-15T00:00:00Z", 0)
+
+def random_rewards(n, seed=7):
+    rng = np.random.default_rng(seed)
+    rewards = []
+    for i in range(n):
+        reward = {
+            "id": f"R{i}",
+            "name": f"Reward {i}",
+            "points": int(rng.integers(100, 5000)),
+            "category": CATEGORIES[int(rng.integers(0, 5)) % 4] if i % 50 else "travel",
+            "weight": float(rng.choice([0.5, 1.0, 1.5])),
+        }
+        if i % 3 == 0:
+            reward["active_from"] = "2024-07-01"
+        if i % 7 == 0:
+            reward["active_until"] = "2024-06-01T00:00:00Z"
+        rewards.append(reward)
+    return rewards
+
+def brute_force(catalog, probabilities, top_k, points_balance):
+    """Score and sort the whole catalog."""
+    padded = np.append(probabilities, 0.0)
+    scores = padded[catalog.category_codes] * catalog.weight
+    eligible = (catalog.active_from <= NOW) & (NOW <= catalog.active_until)
+    if points_balance is not None:
+        eligible &= catalog.points <= points_balance
+    positions = np.flatnonzero(eligible)
+    order = np.lexsort((positions, -scores[positions]))
+    return positions[order][:top_k], scores[positions][order][:top_k]
+
+@pytest.mark.parametrize("top_k,points_balance", [(1, None), (10, None), (10, 800), (200, 2500), (5, 50)])
+def test_rank_matches_full_sort(top_k, points_balance):
+    catalog = RewardCatalog(random_rewards(5000), CATEGORIES)
+    probabilities = np.array([0.1, 0.4, 0.3, 0.2])
+
+    positions, scores = catalog.rank(probabilities, top_k, points_balance, now=NOW)
+    expected_positions, expected_scores = brute_force(catalog, probabilities, top_k, points_balance)
+
+    np.testing.assert_array_equal(positions[0], expected_positions)
+    np.testing.assert_allclose(scores[0], expected_scores)
+
+def test_rank_many_rows_matches_single_rows():
+    catalog = RewardCatalog(random_rewards(2000), CATEGORIES)
+    probabilities = np.random.default_rng(1).dirichlet(np.ones(4), 20)
+
+    positions, scores = catalog.rank(probabilities, 15, now=NOW)
+    for row in range(len(probabilities)):
+        single_positions, single_scores = catalog.rank(probabilities[row], 15, now=NOW)
+        np.testing.assert_array_equal(positions[row], single_positions[0])
+        np.testing.assert_allclose(scores[row], single_scores[0])
+
+def test_filters_by_balance_and_active_window():
+    catalog = RewardCatalog([
+        {"id": "cheap", "name": "Cheap", "points": 100, "category": "dining"},
+        {"id": "pricey", "name": "Pricey", "points": 9000, "category": "dining"},
+        {"id": "future", "name": "Future", "points": 100, "category": "dining", "active_from": "2024-07-01"},
+        {"id": "expired", "name": "Expired", "points": 100, "category": "dining", "active_until": "2024-06-01"},
+    ], CATEGORIES)
+
+    positions, _ = catalog.rank(np.array([0.25, 0.25, 0.25, 0.25]), 10, points_balance=500, now=NOW)
+    assert [catalog.ids[p] for p in positions[0]] == ["cheap"]
+
+    # Active indexes are rebuilt once the next window opens
+    later = to_epoch("2024-07-02T00:00:00Z", 0)
+    positions, _ = catalog.rank(np.array([0.25, 0.25, 0.25, 0.25]), 10, points_balance=500, now=later)
+    assert [catalog.ids[p] for p in positions[0]] == ["cheap", "future"]
+
+def test_ties_keep_catalog_order():
+    rewards = [{"id": f"R{i}", "name": "", "points": 1, "category": CATEGORIES[i % 4]} for i in range(12)]
+    catalog = RewardCatalog(rewards, CATEGORIES)
+    positions, _ = catalog.rank(np.full(4, 0.25), 5, now=NOW)
+    assert positions[0].tolist() == [0, 1, 2, 3, 4]
+
+def test_from_file_reads_jsonl(tmp_path):
+    path = tmp_path / "catalog.jsonl"
+    path.write_text('{"id": "A", "name": "A", "points": 10, "category": "shopping"}\n'
+                    '{"id": "B", "name": "B", "points": 20, "category": "dining"}\n')
+    catalog = RewardCatalog.from_file(str(path), CATEGORIES)
+    assert len(catalog) == 2
+    assert catalog.reward(1) == {"reward_id": "B", "reward_name": "B", "points_required": 20, "description": ""}
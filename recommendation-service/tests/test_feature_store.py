@@ -0,0 +1,184 @@
+import pytest
+from fastapi.testclient import TestClient
+from moto import mock_dynamodb
+import boto3
+import json
+from decimal import Decimal
+import os
+from app.main import app
+from app import events
+from app.feature_store import FeatureStore
+
+@pytest.fixture
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+@pytest.fixture
+def features_table(aws_credentials):
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        table = dynamodb.create_table(
+            TableName='user-features',
+            KeySchema=[{'AttributeName': 'user_id', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'user_id', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        yield table
+
+TRANSACTIONS = [
+    {'user_id': 'user123', 'amount': 60.0, 'category': 'Groceries'},
+    {'user_id': 'user123', 'amount': 30.0, 'category': 'dining'},
+    {'user_id': 'user123', 'amount': 10.0, 'category': 'groceries'},
+    {'user_id': 'user456', 'amount': 5.0, 'category': 'shopping'},
+]
+
+def test_apply_transaction_updates_counters(features_table):
+    store = FeatureStore(features_table)
+    for transaction in TRANSACTIONS:
+        store.apply_transaction(transaction)
+
+    features = store.get('user123')
+    assert features['total_spent'] == 100.0
+    assert features['transaction_count'] == 3
+    assert features['avg_transaction'] == pytest.approx(100.0 / 3)
+    assert features['category_distribution'] == {'groceries': 0.7, 'dining': 0.3}
+
+def test_rebuild_matches_incremental_updates(features_table):
+    incremental = FeatureStore(features_table)
+    for transaction in TRANSACTIONS:
+        incremental.apply_transaction(transaction)
+    expected = {user: incremental.get(user) for user in ('user123', 'user456')}
+
+    # Corrupt one record, then replay history into a fresh store
+    features_table.put_item(Item={'user_id': 'user123', 'total_spent': 1, 'transaction_count': 1})
+    rebuilt = FeatureStore(features_table)
+    assert rebuilt.rebuild(TRANSACTIONS) == 2
+
+    assert {user: rebuilt.get(user) for user in expected} == expected
+
+def test_get_is_served_from_cache(features_table):
+    store = FeatureStore(features_table, cache_ttl=60)
+    store.apply_transaction(TRANSACTIONS[0])
+    store.get('user123')
+
+    # A write that bypasses this store is not seen until the entry expires
+    features_table.put_item(Item={'user_id': 'user123', 'total_spent': 1, 'transaction_count': 1})
+    assert store.get('user123')['total_spent'] == 60.0
+
+    # Applying a transaction through the store invalidates the entry
+    store.apply_transaction(TRANSACTIONS[1])
+    assert store.get('user123')['total_spent'] == 31.0
+
+def test_recommendations_use_feature_store(features_table, monkeypatch):
+    monkeypatch.setenv('FEATURE_STORE_TABLE', 'user-features')
+    from app import feature_store
+    event = {'Records': [
+        {'messageId': f'm{i}', 'body': json.dumps({'Message': json.dumps(transaction)})}
+        for i, transaction in enumerate(TRANSACTIONS)
+    ]}
+    feature_store.lambda_handler(event, None)
+
+    history = feature_store.get_feature_store().get('user456')
+    assert history['total_spent'] == 5.0
+
+    response = TestClient(app).get("/recommendations/user123")
+    assert response.status_code == 200
+    assert len(response.json()) > 0
+
+def test_get_many_matches_get(features_table):
+    store = FeatureStore(features_table)
+    for transaction in TRANSACTIONS:
+        store.apply_transaction(transaction)
+    user_ids = ['user456', 'missing', 'user123', 'user456']
+
+    batched = FeatureStore(features_table).get_many(user_ids)
+
+    assert batched == [store.get(user_id) for user_id in user_ids]
+    assert batched[1]['transaction_count'] == 0
+
+def test_apply_transaction_skips_redelivered_events(features_table):
+    store = FeatureStore(features_table)
+    transaction = {'transaction_id': 'tx1', 'user_id': 'user123', 'amount': 60.0, 'category': 'groceries'}
+
+    assert store.apply_transaction(transaction) is True
+    assert store.apply_transaction(transaction) is False
+
+    features = store.get('user123')
+    assert features['total_spent'] == 60.0
+    assert features['transaction_count'] == 1
+    marker = features_table.get_item(Key={'user_id': 'applied#tx1'})['Item']
+    assert marker['expires_at'] > 0
+
+def test_lambda_handler_reports_failed_messages(features_table, monkeypatch):
+    monkeypatch.setenv('FEATURE_STORE_TABLE', 'user-features')
+    from app import feature_store
+    transaction = {'transaction_id': 'tx1', 'user_id': 'user123', 'amount': 60.0, 'category': 'groceries'}
+    event = {'Records': [
+        {'messageId': 'm0', 'body': json.dumps({'Message': json.dumps(transaction)})},
+        {'messageId': 'm1', 'body': 'not json'},
+        # SQS redelivers m0 after it was applied
+        {'messageId': 'm2', 'body': json.dumps({'Message': json.dumps(transaction)})}
+    ]}
+
+    response = feature_store.lambda_handler(event, None)
+
+    assert response == {'batchItemFailures': [{'itemIdentifier': 'm1'}]}
+    assert feature_store.get_feature_store().get('user123')['transaction_count'] == 1
+
+def test_lambda_handler_decodes_every_event_version(features_table, monkeypatch):
+    monkeypatch.setenv('FEATURE_STORE_TABLE', 'user-features')
+    from app import feature_store
+    transactions = [
+        {'transaction_id': f'tx{i}', 'user_id': 'user123', 'amount': Decimal('12.5'), 'category': 'dining'}
+        for i in range(3)
+    ]
+    v1 = events.encode(transactions[0], version=1)
+    v2 = events.encode(transactions[1], version=2, encoding='json')
+    raw = events.encode(transactions[2], version=2, encoding='json')
+    event = {'Records': [
+        {'messageId': 'm0', 'body': json.dumps({'Message': v1})},
+        {'messageId': 'm1', 'body': json.dumps({'Message': v2, 'MessageAttributes': {
+            name: {'Type': 'String', 'Value': value['StringValue']}
+            for name, value in events.message_attributes(v2).items()
+        }})},
+        # Raw message delivery: the body is the message itself
+        {'messageId': 'm2', 'body': raw, 'messageAttributes': {
+            name: {'stringValue': value['StringValue'], 'dataType': 'String'}
+            for name, value in events.message_attributes(raw).items()
+        }}
+    ]}
+
+    assert feature_store.lambda_handler(event, None) == {'batchItemFailures': []}
+
+    features = feature_store.get_feature_store().get('user123')
+    assert features['total_spent'] == 37.5
+    assert features['transaction_count'] == 3
+
+def test_get_many_gives_up_on_sustained_throttling(features_table, monkeypatch):
+    from app import feature_store
+    store = FeatureStore(features_table)
+    calls = []
+
+    def throttled(RequestItems):
+        calls.append(RequestItems)
+        return {'Responses': {}, 'UnprocessedKeys': RequestItems}
+
+    monkeypatch.setattr(feature_store, 'BATCH_GET_MAX_RETRIES', 2)
+    monkeypatch.setattr(feature_store.time, 'sleep', lambda seconds: None)
+    monkeypatch.setattr(features_table.meta.client, 'batch_get_item', throttled)
+
+    with pytest.raises(RuntimeError, match='unprocessed after 2 retries'):
+        store.get_many(['user123', 'user456'])
+    assert len(calls) == 3
+
+def test_lambda_handler_requires_a_feature_store(monkeypatch):
+    monkeypatch.delenv('FEATURE_STORE_TABLE', raising=False)
+    from app import feature_store
+    with pytest.raises(RuntimeError, match='FEATURE_STORE_TABLE'):
+        feature_store.lambda_handler({'Records': [{'messageId': 'm0', 'body': '{}'}]}, None)
+
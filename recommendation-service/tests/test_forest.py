@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from dataclasses import replace
+from sklearn.ensemble import RandomForestClassifier
+from app.forest import CompiledForest
+from app.train_model import generate_sample_data
+
+@pytest.fixture(scope="module")
+def model():
+    X, y = generate_sample_data(n_samples=500)
+    return RandomForestClassifier(n_estimators=20, random_state=0).fit(X, y)
+
+def test_predict_proba_matches_sklearn(model):
+    compiled = CompiledForest.from_sklearn(model)
+    X, _ = generate_sample_data(n_samples=3000)
+    X = X + np.random.default_rng(1).normal(0, 10, X.shape)
+
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-12)
+    np.testing.assert_array_equal(compiled.classes_, model.classes_)
+
+def test_rows_on_split_thresholds_match_sklearn(model):
+    compiled = CompiledForest.from_sklearn(model)
+    tree = model.estimators_[0].tree_
+    # Put every feature exactly on one of its split thresholds
+    X = np.zeros((50, tree.n_features))
+    for feature in range(tree.n_features):
+        thresholds = tree.threshold[tree.feature == feature]
+        if len(thresholds):
+            X[:, feature] = np.resize(thresholds, 50)
+
+    np.testing.assert_allclose(compiled.predict_proba(X), model.predict_proba(X), atol=1e-12)
+
+def test_single_row(model):
+    compiled = CompiledForest.from_sklearn(model)
+    row = np.array([1500.0, 15, 100.0, 0.4, 0.3, 0.2, 0.1])
+
+    proba = compiled.predict_proba(row)
+    assert proba.shape == (1, len(model.classes_))
+    np.testing.assert_allclose(proba, model.predict_proba(row.reshape(1, -1)), atol=1e-12)
+
+def test_save_and_memory_mapped_load(model, tmp_path):
+    compiled = CompiledForest.from_sklearn(model)
+    compiled.save(str(tmp_path))
+    loaded = CompiledForest.load(str(tmp_path))
+
+    assert isinstance(loaded.value, np.memmap)
+    X, _ = generate_sample_data(n_samples=50)
+    np.testing.assert_array_equal(loaded.predict_proba(X), compiled.predict_proba(X))
+
+def test_compiled_engine_serves_same_recommendations(monkeypatch):
+    from fastapi.testclient import TestClient
+    from app import main
+
+    monkeypatch.setattr(main, 'recommendation_cache', None)
+    client = TestClient(main.app)
+    expected = client.get("/recommendations/user123").json()
+
+    loaded = main.model_store.current
+    monkeypatch.setattr(main.model_store, 'current', replace(loaded, compiled=CompiledForest.from_sklearn(loaded.model)))
+    monkeypatch.setattr(loaded.model, 'predict_proba', lambda X: pytest.fail("sklearn called on the hot path"))
+    actual = client.get("/recommendations/user123").json()
+
+    assert [r["reward_id"] for r in actual] == [r["reward_id"] for r in expected]
+    for a, e in zip(actual, expected):
+        assert a["confidence_score"] == pytest.approx(e["confidence_score"], abs=1e-12)
@@ -1,6 +1,8 @@
+import json
+
 import pytest
 from fastapi.testclient import TestClient
-from app.main import app
+from app.main import app, generate_recommendations, TransactionHistory
 
 client = TestClient(app)
 
@@ -32,4 +34,45 @@ def test_get_recommendations():
 
 def test_get_recommendations_invalid_user():
     response = client.get("/recommendations/invalid")
-    assert response.status_code == 200  # Should still return recommendations with mock data 
\ No newline at end of file
+    assert response.status_code == 200  # Should still return recommendations with mock data
+
+
+def test_batch_recommendations_by_user_id():
+    user_ids = [f"user{i}" for i in range(5)]
+    response = client.post("/recommendations/batch", json={"user_ids": user_ids})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["user_id"] for row in rows] == user_ids
+
+    # Batch ranking must agree with the single-user endpoint
+    single = client.get("/recommendations/user0").json()
+    assert rows[0]["recommendations"] == single
+
+
+def test_batch_recommendations_by_feature_rows():
+    features = [
+        [1500.0, 15, 100.0, 0.4, 0.3, 0.2, 0.1],
+        [800.0, 40, 20.0, 0.1, 0.1, 0.1, 0.7],
+    ]
+    response = client.post("/recommendations/batch", json={"features": features, "top_k": 2})
+    assert response.status_code == 200
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["index"] for row in rows] == [0, 1]
+    for row, feature_row in zip(rows, features):
+        history = TransactionHistory(
+            total_spent=feature_row[0],
+            transaction_count=int(feature_row[1]),
+            avg_transaction=feature_row[2],
+            category_distribution=dict(zip(["groceries", "dining", "shopping", "entertainment"], feature_row[3:]))
+        )
+        expected = [r.model_dump() for r in generate_recommendations(history)[:2]]
+        assert row["recommendations"] == expected
+
+
+def test_batch_recommendations_rejects_bad_input():
+    assert client.post("/recommendations/batch", json={}).status_code == 422
+    assert client.post("/recommendations/batch", json={"user_ids": ["a"], "features": [[0] * 7]}).status_code == 422
+    assert client.post("/recommendations/batch", json={"features": [[1, 2, 3]]}).status_code == 422
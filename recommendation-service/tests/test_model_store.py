@@ -0,0 +1,118 @@
+import asyncio
+import os
+
+import joblib
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from sklearn.ensemble import RandomForestClassifier
+
+import app.main as main
+from app.model_store import ModelStore, load_model, model_cache_key
+from app.train_model import generate_sample_data
+
+def write_model(path, seed):
+    """Train a small forest and publish it with an atomic rename, as a deploy would."""
+    X, y = generate_sample_data(n_samples=200)
+    model = RandomForestClassifier(n_estimators=5, random_state=seed).fit(X, y)
+    staging = str(path) + '.tmp'
+    joblib.dump(model, staging)
+    os.replace(staging, path)
+    return model
+
+@pytest.fixture
+def model_path(tmp_path):
+    path = tmp_path / 'reward_model.joblib'
+    write_model(path, seed=1)
+    return str(path)
+
+@pytest.fixture
+def compiled_dir(tmp_path):
+    return str(tmp_path / 'compiled')
+
+def test_load_model_memory_maps_arrays(model_path, compiled_dir):
+    loaded = load_model(model_path, compiled=True, mmap=True, compiled_dir=compiled_dir)
+    assert isinstance(loaded.compiled.value, np.memmap)
+    assert loaded.compiled.value.filename.startswith(compiled_dir)
+
+    X, _ = generate_sample_data(n_samples=20)
+    np.testing.assert_allclose(loaded.compiled.predict_proba(X), loaded.model.predict_proba(X), atol=1e-12)
+
+def test_second_worker_reuses_compiled_arrays(model_path, compiled_dir):
+    first = load_model(model_path, compiled=True, compiled_dir=compiled_dir)
+    second = load_model(model_path, compiled=True, compiled_dir=compiled_dir)
+    assert first.compiled.value.filename == second.compiled.value.filename
+
+def test_models_with_the_same_file_name_keep_separate_caches(tmp_path, compiled_dir):
+    paths = []
+    for seed, name in enumerate(['a', 'b'], start=1):
+        (tmp_path / name).mkdir()
+        paths.append(str(tmp_path / name / 'reward_model.joblib'))
+        write_model(paths[-1], seed=seed)
+
+    first = load_model(paths[0], compiled=True, compiled_dir=compiled_dir)
+    second = load_model(paths[1], compiled=True, compiled_dir=compiled_dir)
+
+    # Loading the second model must not delete the first one's arrays
+    assert os.path.exists(first.compiled.value.filename)
+    assert first.compiled.value.filename != second.compiled.value.filename
+    assert len(os.listdir(compiled_dir)) == 2
+
+def test_unwritable_compiled_dir_falls_back_to_memory(model_path, tmp_path):
+    # A directory under a regular file cannot be created, even as root
+    blocker = tmp_path / 'read-only'
+    blocker.write_text('')
+    loaded = load_model(model_path, compiled=True, compiled_dir=str(blocker / 'compiled'))
+
+    assert not isinstance(loaded.compiled.value, np.memmap)
+    X, _ = generate_sample_data(n_samples=20)
+    np.testing.assert_allclose(loaded.compiled.predict_proba(X), loaded.model.predict_proba(X), atol=1e-12)
+
+def test_reload_swaps_only_when_file_changes(model_path, compiled_dir):
+    store = ModelStore(model_path, compiled=True, compiled_dir=compiled_dir)
+    assert store.load()
+    first = store.current
+    assert not store.load()
+
+    write_model(model_path, seed=2)
+    assert store.load()
+    assert store.current.version != first.version
+
+    # The previous generation stays usable for requests that already hold it
+    X, _ = generate_sample_data(n_samples=5)
+    assert first.compiled.predict_proba(X).shape == (5, 4)
+    assert len(os.listdir(os.path.join(compiled_dir, model_cache_key(model_path)))) == 1
+
+def test_failed_reload_keeps_serving_previous_model(model_path):
+    store = ModelStore(model_path)
+    store.load()
+    first = store.current
+
+    with open(model_path + '.tmp', 'wb') as f:
+        f.write(b'not a model')
+    os.replace(model_path + '.tmp', model_path)
+
+    assert not store.load()
+    assert store.current is first
+    assert store.error
+
+def test_background_start_loads_without_blocking(model_path):
+    async def run():
+        store = ModelStore(model_path, reload_interval=0)
+        task = store.start()
+        assert not store.ready
+        await task
+        assert store.ready
+        await store.stop()
+    asyncio.run(run())
+
+def test_ready_endpoint_reports_loading_state(monkeypatch):
+    client = TestClient(main.app)
+    assert client.get("/ready").json()["status"] == "ready"
+
+    monkeypatch.setattr(main.model_store, 'current', None)
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["status"] == "loading"
+    assert client.get("/health").status_code == 200
+    assert client.get("/recommendations/user123").status_code == 503
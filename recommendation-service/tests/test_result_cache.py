@@ -0,0 +1,94 @@
+import pytest
+from dataclasses import replace
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.result_cache import RecommendationCache, feature_key, quantize, user_key
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = RecommendationCache(max_bytes=1024 * 1024, ttl_seconds=60)
+    monkeypatch.setattr(main, 'recommendation_cache', cache)
+    return cache
+
+def test_quantize_collapses_near_identical_vectors():
+    assert quantize([1234.5678, 0.012345, 0.0], 3) == (1230.0, 0.0123, 0.0)
+    assert feature_key([100.01, 0.5], 3) == feature_key([100.04, 0.5], 3)
+    assert feature_key([100.0, 0.5], 3) != feature_key([150.0, 0.5], 3)
+
+def test_cache_evicts_least_recently_used_over_byte_cap():
+    cache = RecommendationCache(max_bytes=3 * 300, ttl_seconds=60)
+    cache.ensure_version('v1')
+    for key in ('a', 'b', 'c'):
+        cache.put(key, b'x' * 80)
+    cache.get('a')
+    cache.put('d', b'x' * 80)
+
+    assert cache.get('b') is None
+    assert cache.get('a') is not None
+    assert cache.size <= cache.max_bytes
+
+def test_cache_skips_entries_larger_than_cap():
+    cache = RecommendationCache(max_bytes=100, ttl_seconds=60)
+    cache.put('big', b'x' * 1000)
+    assert len(cache) == 0
+
+def test_cache_entries_expire(monkeypatch):
+    cache = RecommendationCache(max_bytes=1024, ttl_seconds=10)
+    now = [1000.0]
+    monkeypatch.setattr('app.result_cache.time.monotonic', lambda: now[0])
+    cache.put('a', b'payload')
+    now[0] += 11
+    assert cache.get('a') is None
+    assert cache.size == 0
+
+def test_cache_cleared_on_version_change():
+    cache = RecommendationCache(max_bytes=1024, ttl_seconds=60)
+    cache.ensure_version('model-1')
+    cache.put('a', b'payload')
+    cache.ensure_version('model-1')
+    assert cache.get('a') == b'payload'
+    cache.ensure_version('model-2')
+    assert cache.get('a') is None
+
+def test_endpoint_serves_repeat_requests_from_cache(cache, monkeypatch):
+    client = TestClient(main.app)
+    first = client.get("/recommendations/cache-user")
+    assert first.status_code == 200
+    assert cache.misses == 1
+
+    # Same user: served without recomputing
+    def fail(*args, **kwargs):
+        raise AssertionError("recommendations should come from the cache")
+    monkeypatch.setattr(main, 'generate_recommendations', fail)
+    second = client.get("/recommendations/cache-user")
+    assert second.status_code == 200
+    assert second.json() == first.json()
+
+    # Different user with the same features: served by the feature key
+    third = client.get("/recommendations/lookalike-user")
+    assert third.json() == first.json()
+    assert cache.hits == 2
+    assert cache.get(user_key("lookalike-user", f"{main.DEFAULT_TOP_K}:None")) is not None
+
+def test_endpoint_caches_each_request_variant(cache):
+    client = TestClient(main.app)
+    everything = client.get("/recommendations/cache-user").json()
+    affordable = client.get("/recommendations/cache-user", params={"points_balance": 1000}).json()
+    assert len(affordable) < len(everything)
+    assert all(r["points_required"] <= 1000 for r in affordable)
+    assert cache.misses == 2
+
+def test_endpoint_recomputes_after_model_change(cache, monkeypatch):
+    client = TestClient(main.app)
+    client.get("/recommendations/cache-user")
+    monkeypatch.setattr(main.model_store, 'current', replace(main.model_store.current, version='retrained'))
+    client.get("/recommendations/cache-user")
+    assert cache.misses == 2
+
+def test_metrics_exposes_cache_counters(cache):
+    client = TestClient(main.app)
+    client.get("/recommendations/cache-user")
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'recommendation_cache_requests_total' in response.text
@@ -0,0 +1,93 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pytest
+
+from app.train_model import CATEGORIES, FeatureAggregator, build_feature_matrix, read_chunks, train_model
+
+def write_export(path, n_rows=500, n_users=40, seed=3):
+    rng = np.random.default_rng(seed)
+    rows = []
+    with open(path, 'w') as f:
+        for _ in range(n_rows):
+            row = {
+                'user_id': f'user{int(rng.integers(n_users))}',
+                'amount': round(float(rng.uniform(1, 200)), 2),
+                'category': str(rng.choice(CATEGORIES + ['Dining ', 'travel']))
+            }
+            if rng.random() < 0.05:
+                del row['category']
+            rows.append(row)
+            f.write(json.dumps(row) + '\n')
+    return rows
+
+def naive_features(rows):
+    users = {}
+    for row in rows:
+        user = users.setdefault(row['user_id'], {'total': 0.0, 'count': 0, **{c: 0.0 for c in CATEGORIES}})
+        user['total'] += row['amount']
+        user['count'] += 1
+        category = (row.get('category') or '').strip().lower()
+        if category in CATEGORIES:
+            user[category] += row['amount']
+    return users
+
+def test_chunked_aggregation_matches_naive(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    rows = write_export(path)
+
+    aggregator = FeatureAggregator(capacity=4)
+    for user_ids, amounts, categories in read_chunks(path, chunk_rows=37):
+        aggregator.add(user_ids, amounts, categories)
+
+    features = np.zeros((len(aggregator.user_index), 7), dtype=np.float32)
+    aggregator.features(features)
+    for user_id, expected in naive_features(rows).items():
+        row = features[aggregator.user_index[user_id]]
+        assert row[0] == pytest.approx(expected['total'], rel=1e-5)
+        assert row[1] == expected['count']
+        assert row[2] == pytest.approx(expected['total'] / expected['count'], rel=1e-5)
+        for i, category in enumerate(CATEGORIES):
+            assert row[3 + i] == pytest.approx(expected[category] / expected['total'], abs=1e-6)
+
+def test_feature_matrix_is_cached_as_memmap(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    write_export(path)
+    cache_dir = str(tmp_path / 'cache')
+
+    X, y, cached = build_feature_matrix([path], cache_dir, chunk_rows=100, report={})
+    assert not cached
+    X_again, y_again, cached = build_feature_matrix([path], cache_dir, chunk_rows=100, report={})
+    assert cached
+    assert isinstance(X_again, np.memmap)
+    np.testing.assert_array_equal(X, X_again)
+    np.testing.assert_array_equal(y, y_again)
+
+def test_train_writes_versioned_model_and_metadata(tmp_path):
+    path = str(tmp_path / 'export.jsonl')
+    write_export(path)
+    output_dir = str(tmp_path / 'models')
+
+    metadata = train_model([path], output_dir=output_dir, chunk_rows=100, n_estimators=5, n_jobs=2)
+
+    version = metadata['version']
+    assert os.path.exists(os.path.join(output_dir, f'reward_model-{version}.joblib'))
+    with open(os.path.join(output_dir, f'reward_model-{version}.json')) as f:
+        assert json.load(f)['users'] == metadata['users'] == 40
+    assert set(metadata['stages']) == {'aggregate', 'features', 'train', 'save'}
+    assert metadata['stages']['aggregate']['rows'] == 500
+
+    model = joblib.load(os.path.join(output_dir, 'reward_model.joblib'))
+    assert model.n_jobs is None
+    assert model.predict_proba(np.zeros((1, 7))).shape[0] == 1
+
+def test_reads_parquet_exports(tmp_path):
+    pa = pytest.importorskip('pyarrow')
+    import pyarrow.parquet as pq
+    path = str(tmp_path / 'export.parquet')
+    pq.write_table(pa.table({'user_id': ['a', 'b', 'a'], 'amount': [1.0, 2.0, 3.0], 'category': ['dining', None, 'dining']}), path)
+
+    chunks = list(read_chunks(path, chunk_rows=2))
+    assert sum(len(chunk[0]) for chunk in chunks) == 3
@@ -0,0 +1,65 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+import boto3
+from botocore.config import Config
+
+# Connection pool and executor sizing. boto3 clients are thread-safe (resources
+# are not), so one pooled client per service is shared by every executor
+# thread; keeping the executor no larger than the pool avoids threads queueing
+# for a connection.
+AWS_MAX_POOL_CONNECTIONS = int(os.getenv('AWS_MAX_POOL_CONNECTIONS', '50'))
+AWS_EXECUTOR_WORKERS = int(os.getenv('AWS_EXECUTOR_WORKERS', str(AWS_MAX_POOL_CONNECTIONS)))
+AWS_TCP_KEEPALIVE = os.getenv('AWS_TCP_KEEPALIVE', 'true').lower() == 'true'
+
+boto_config = Config(
+    max_pool_connections=AWS_MAX_POOL_CONNECTIONS,
+    tcp_keepalive=AWS_TCP_KEEPALIVE,
+    retries={'max_attempts': 3, 'mode': 'standard'}
+)
+
+# Initialize AWS clients with environment-aware configuration. DynamoDB is the
+# low-level client of a resource: it is safe to share between threads, and the
+# resource's handlers still (de)serialize plain Python values for it.
+dynamodb = boto3.resource('dynamodb',
+    endpoint_url=os.getenv('DYNAMODB_ENDPOINT', None),  # None will use default AWS endpoint
+    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
+    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'local'),
+    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'local'),
+    config=boto_config
+).meta.client
+
+sns = boto3.client('sns',
+    endpoint_url=os.getenv('SNS_ENDPOINT', None),  # None will use default AWS endpoint
+    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
+    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'local'),
+    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'local'),
+    config=boto_config
+)
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+def get_executor() -> ThreadPoolExecutor:
+    """Return the bounded executor used for blocking AWS calls."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=AWS_EXECUTOR_WORKERS,
+            thread_name_prefix='aws-io'
+        )
+    return _executor
+
+def shutdown_executor() -> None:
+    """Wait for in-flight AWS calls and release the executor threads."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Run a blocking boto3 call on the AWS executor without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), partial(func, *args, **kwargs))
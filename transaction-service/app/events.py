@@ -0,0 +1,112 @@
+# Transaction event envelope, shared by the producer (transaction-service) and
+# the consumers (analytics-service, the recommendation feature store). Keep the
+# copies identical:
+#   transaction-service/app/events.py
+#   analytics-service/lambda/events.py
+#   recommendation-service/app/events.py
+#
+# Schema versions:
+#   1  the record as `json.dumps(record, default=str)`; Decimal amounts become strings
+#   2  the record with a leading "v": 2 key, amounts as numbers, encoded with
+#      orjson ("json") or as base64 msgpack ("msgpack")
+# Messages describe themselves, so they decode without their SNS attributes,
+# e.g. after an outbox replay or with raw message delivery. Consumers accept every
+# version in SUPPORTED_VERSIONS, so they are upgraded first; producers then move
+# to the new EVENT_SCHEMA_VERSION.
+import base64
+import json
+import os
+from decimal import Decimal
+from typing import Any, Dict, Mapping, Optional
+
+try:
+    import orjson
+except ImportError:  # the standard library is slower but produces the same JSON
+    orjson = None
+
+EVENT_SCHEMA_VERSION = int(os.getenv('EVENT_SCHEMA_VERSION', '1'))
+EVENT_ENCODING = os.getenv('EVENT_ENCODING', 'json')  # json or msgpack; version 2 only
+SUPPORTED_VERSIONS = (1, 2)
+
+class UnsupportedEvent(ValueError):
+    """Raised for a schema version or encoding this side does not understand."""
+
+def _default(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Cannot encode {type(value).__name__} in an event")
+
+def _msgpack() -> Any:
+    try:
+        import msgpack
+    except ImportError:
+        raise UnsupportedEvent("msgpack events need the msgpack package") from None
+    return msgpack
+
+def dumps(value: Any) -> str:
+    if orjson is not None:
+        return orjson.dumps(value, default=_default).decode()
+    return json.dumps(value, default=_default, separators=(',', ':'))
+
+def loads(text: str) -> Any:
+    return orjson.loads(text) if orjson is not None else json.loads(text)
+
+def encode(record: Mapping[str, Any], version: Optional[int] = None, encoding: Optional[str] = None) -> str:
+    """Encode a record as an SNS message body."""
+    version = version or EVENT_SCHEMA_VERSION
+    encoding = encoding or EVENT_ENCODING
+    if version == 1:
+        return json.dumps(record, default=str)
+    if version != 2:
+        raise UnsupportedEvent(f"Unknown event schema version {version}")
+    # "v" first, so message_attributes can read it from the header
+    envelope = {'v': 2, **record}
+    if encoding == 'json':
+        return dumps(envelope)
+    if encoding == 'msgpack':
+        return base64.b64encode(_msgpack().packb(envelope, default=_default)).decode()
+    raise UnsupportedEvent(f"Unknown event encoding {encoding}")
+
+def _header(message: str) -> Dict[str, Any]:
+    """Version and encoding of a message, from its first bytes only."""
+    if message.startswith('{'):
+        if message.startswith('{"v":'):
+            return {'version': int(message[5:message.index(',', 5)]), 'encoding': 'json'}
+        return {'version': 1, 'encoding': 'json'}
+    # fixmap (one byte) or map16 (three bytes), then the fixstr "v" and a positive fixint
+    head = base64.b64decode(message[:8])
+    offset = 1 if head[0] & 0xf0 == 0x80 else 3
+    if head[offset:offset + 2] != b'\xa1v':
+        raise UnsupportedEvent("Message is neither JSON nor a versioned msgpack event")
+    return {'version': head[offset + 2], 'encoding': 'msgpack'}
+
+def message_attributes(message: str) -> Dict[str, Dict[str, str]]:
+    """
+    SNS MessageAttributes for an encoded message. Subscriptions can filter on
+    them, e.g. to send only version 2 events to an upgraded consumer.
+    """
+    header = _header(message)
+    return {
+        'schema_version': {'DataType': 'Number', 'StringValue': str(header['version'])},
+        'content_encoding': {'DataType': 'String', 'StringValue': header['encoding']}
+    }
+
+def _attribute(attributes: Mapping[str, Any], name: str) -> Optional[str]:
+    # {"Type", "Value"} in SNS notifications; with raw delivery, "stringValue" in
+    # Lambda's SQS events and "StringValue" in boto3's receive_message
+    attribute = attributes.get(name) or {}
+    return attribute.get('Value') or attribute.get('stringValue') or attribute.get('StringValue')
+
+def decode(message: str, attributes: Optional[Mapping[str, Any]] = None) -> Dict[str, Any]:
+    """Decode an SNS message body into the record, whichever supported version it is."""
+    version = _attribute(attributes or {}, 'schema_version')
+    if version is not None and int(version) not in SUPPORTED_VERSIONS:
+        raise UnsupportedEvent(f"Unsupported event schema version {version}")
+    if message.startswith('{'):
+        record = loads(message)
+    else:
+        record = _msgpack().unpackb(base64.b64decode(message))
+    version = record.pop('v', 1)
+    if version not in SUPPORTED_VERSIONS:
+        raise UnsupportedEvent(f"Unsupported event schema version {version}")
+    return record
@@ -0,0 +1,111 @@
+import base64
+import binascii
+import json
+from decimal import Decimal
+from typing import Any, Dict, Optional, Tuple
+
+# A LastEvaluatedKey of the user_id-timestamp GSI holds the table key and the index key
+CURSOR_KEYS = {'transaction_id', 'user_id', 'timestamp'}
+
+# Attributes returned for each transaction row; summaries only need two of them
+ROW_ATTRIBUTES = ['transaction_id', 'amount', 'merchant', 'category', 'description', 'timestamp']
+SUMMARY_ATTRIBUTES = ['amount', 'category']
+
+class InvalidCursor(ValueError):
+    pass
+
+def encode_cursor(last_evaluated_key: Optional[Dict[str, Any]]) -> Optional[str]:
+    """Turn a DynamoDB LastEvaluatedKey into an opaque, URL-safe cursor."""
+    if not last_evaluated_key:
+        return None
+    raw = json.dumps(last_evaluated_key, separators=(',', ':'), sort_keys=True).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+def decode_cursor(cursor: str, user_id: str) -> Dict[str, Any]:
+    """Decode a cursor, rejecting anything that is not a key for this user's index."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        key = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidCursor("Malformed cursor")
+    if not isinstance(key, dict) or set(key) != CURSOR_KEYS or not all(isinstance(v, str) for v in key.values()):
+        raise InvalidCursor("Malformed cursor")
+    if key['user_id'] != user_id:
+        raise InvalidCursor("Cursor does not belong to this query")
+    return key
+
+def to_json_row(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a DynamoDB item to JSON-serializable types."""
+    return {k: float(v) if isinstance(v, Decimal) else v for k, v in item.items()}
+
+def build_query(
+    index_name: str,
+    user_id: str,
+    start: Optional[str],
+    end: Optional[str],
+    attributes: list,
+    newest_first: bool = True
+) -> Dict[str, Any]:
+    """Build Query parameters for a user's transactions in an optional time range."""
+    names = {f'#a{i}': attribute for i, attribute in enumerate(attributes)}
+    names['#uid'] = 'user_id'
+    names['#ts'] = 'timestamp'
+    values = {':uid': user_id}
+    condition = '#uid = :uid'
+    if start and end:
+        condition += ' AND #ts BETWEEN :start AND :end'
+        values.update({':start': start, ':end': end})
+    elif start:
+        condition += ' AND #ts >= :start'
+        values[':start'] = start
+    elif end:
+        condition += ' AND #ts <= :end'
+        values[':end'] = end
+
+    return {
+        'IndexName': index_name,
+        'KeyConditionExpression': condition,
+        'ProjectionExpression': ', '.join(f'#a{i}' for i in range(len(attributes))),
+        'ExpressionAttributeNames': names,
+        'ExpressionAttributeValues': values,
+        'ScanIndexForward': not newest_first
+    }
+
+def query_page(
+    client: Any,
+    table_name: str,
+    query: Dict[str, Any],
+    limit: Optional[int] = None,
+    exclusive_start_key: Optional[Dict[str, Any]] = None
+) -> Tuple[list, Optional[Dict[str, Any]]]:
+    """Fetch one page of results. Returns the items and the LastEvaluatedKey, if any."""
+    params = dict(query, TableName=table_name)
+    if limit:
+        params['Limit'] = limit
+    if exclusive_start_key:
+        params['ExclusiveStartKey'] = exclusive_start_key
+    response = client.query(**params)
+    return response.get('Items', []), response.get('LastEvaluatedKey')
+
+class Summary:
+    """Running totals for a user's transactions, updated one page at a time."""
+
+    def __init__(self):
+        self.total = Decimal(0)
+        self.count = 0
+        self.by_category: Dict[str, Decimal] = {}
+
+    def add(self, items: list) -> None:
+        for item in items:
+            amount = item.get('amount', Decimal(0))
+            category = item.get('category') or 'uncategorized'
+            self.total += amount
+            self.count += 1
+            self.by_category[category] = self.by_category.get(category, Decimal(0)) + amount
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'total': float(self.total),
+            'count': self.count,
+            'category_totals': {category: float(total) for category, total in sorted(self.by_category.items())}
+        }
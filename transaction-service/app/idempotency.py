@@ -0,0 +1,60 @@
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from prometheus_client import Counter
+
+# Namespace for deriving transaction IDs from idempotency keys
+IDEMPOTENCY_NAMESPACE = uuid.UUID('7b0e3c1a-5d2f-4f6e-9a8b-3c4d5e6f7a8b')
+
+# Initialize Prometheus metrics
+idempotency_counter = Counter(
+    'transaction_idempotency_total',
+    'Idempotency key lookups by result',
+    ['result']  # cache_hit, store_hit or miss
+)
+
+def transaction_id_for(user_id: str, idempotency_key: str) -> str:
+    """
+    Derive a stable transaction ID from a client's idempotency key, so every
+    retry of a request maps to the same DynamoDB item.
+    """
+    return str(uuid.uuid5(IDEMPOTENCY_NAMESPACE, f"{user_id}:{idempotency_key}"))
+
+class IdempotencyCache:
+    """
+    Bounded LRU cache of responses by transaction ID with a TTL.
+
+    This only short-circuits repeat requests handled by the same process; the
+    conditional write in DynamoDB remains the source of truth across instances.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 3600.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, response = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return response
+
+    def put(self, key: str, response: Dict[str, Any]) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, response)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
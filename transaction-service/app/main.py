@@ -1,15 +1,25 @@
-from fastapi import FastAPI, HTTPException
-from prometheus_client import Counter, Histogram, generate_latest
+from fastapi import FastAPI, Header, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram
 from prometheus_fastapi_instrumentator import Instrumentator
+import asyncio
 import logging
 import json
-import boto3
 import os
+import time
 import uuid
+from contextlib import asynccontextmanager
+from functools import partial
 from datetime import datetime, UTC
 from decimal import Decimal
+from typing import Any, Dict, List, Literal, Optional
 from pydantic import BaseModel, Field, ConfigDict
 import structlog
+from botocore.exceptions import ClientError
+from app.aws import dynamodb, sns, run_blocking, shutdown_executor
+from app import events, history, metrics as prometheus_metrics
+from app.idempotency import IdempotencyCache, idempotency_counter, transaction_id_for
+from app.outbox import Outbox, OutboxFlusher, recover_pending
 
 # Configure structured logging
 structlog.configure(
@@ -20,23 +30,61 @@ structlog.configure(
 )
 logger = structlog.get_logger()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global outbox
+    resolve_resources()
+    logger.info("resources_resolved", table=transactions_table_name, topic_arn=sns_topic_arn)
+
+    flusher = None
+    if outbox is not None:
+        await run_blocking(recover_pending, outbox, record_exists)
+        flusher = OutboxFlusher(
+            outbox,
+            partial(publish_message_batch, sns_topic_arn),
+            batch_size=SNS_BATCH_SIZE,
+            poll_interval=OUTBOX_POLL_INTERVAL,
+            max_delay=OUTBOX_MAX_RETRY_DELAY
+        )
+        flusher.start()
+        logger.info("outbox_flusher_started", path=outbox.path)
+
+    yield
+
+    if flusher is not None:
+        await flusher.stop()
+    if outbox is not None:
+        outbox.close()
+        outbox = None
+    shutdown_executor()
+    # Under gunicorn child_exit does this too, even after a crash
+    prometheus_metrics.mark_process_dead(os.getpid())
+
 # Initialize FastAPI app
-app = FastAPI(title="Transaction Service")
-
-# Initialize AWS clients with environment-aware configuration
-dynamodb = boto3.resource('dynamodb',
-    endpoint_url=os.getenv('DYNAMODB_ENDPOINT', None),  # None will use default AWS endpoint
-    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'local'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'local')
-)
+app = FastAPI(title="Transaction Service", lifespan=lifespan)
 
-sns = boto3.client('sns',
-    endpoint_url=os.getenv('SNS_ENDPOINT', None),  # None will use default AWS endpoint
-    region_name=os.getenv('AWS_DEFAULT_REGION', 'us-east-1'),
-    aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID', 'local'),
-    aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY', 'local')
-)
+# Batch ingest limits (DynamoDB accepts 25 writes per batch, SNS 10 entries per publish_batch)
+MAX_BATCH_SIZE = int(os.getenv('MAX_BATCH_SIZE', '500'))
+DYNAMODB_BATCH_SIZE = 25
+SNS_BATCH_SIZE = 10
+BATCH_WRITE_MAX_RETRIES = int(os.getenv('BATCH_WRITE_MAX_RETRIES', '5'))
+BATCH_WRITE_BASE_DELAY = float(os.getenv('BATCH_WRITE_BASE_DELAY', '0.05'))
+
+# Event delivery: 'direct' publishes to SNS on the request path, 'outbox'
+# persists events locally and publishes them from a background task
+EVENT_DELIVERY_MODE = os.getenv('EVENT_DELIVERY_MODE', 'direct')
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.db')
+OUTBOX_SYNCHRONOUS = os.getenv('OUTBOX_SYNCHRONOUS', 'FULL')
+OUTBOX_POLL_INTERVAL = float(os.getenv('OUTBOX_POLL_INTERVAL', '0.2'))
+OUTBOX_MAX_RETRY_DELAY = float(os.getenv('OUTBOX_MAX_RETRY_DELAY', '60'))
+
+# Per-user history queries run against a user_id + timestamp GSI
+USER_TRANSACTIONS_INDEX = os.getenv('USER_TRANSACTIONS_INDEX', 'user_id-timestamp-index')
+MAX_PAGE_SIZE = int(os.getenv('MAX_PAGE_SIZE', '1000'))
+
+# Idempotency-Key replay cache, in front of the conditional write in DynamoDB
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv('IDEMPOTENCY_CACHE_SIZE', '10000'))
+IDEMPOTENCY_CACHE_TTL = float(os.getenv('IDEMPOTENCY_CACHE_TTL', '3600'))
 
 # Initialize Prometheus metrics
 transaction_counter = Counter(
@@ -51,8 +99,31 @@ transaction_amount = Histogram(
     buckets=[10, 50, 100, 500, 1000, 5000]
 )
 
-# Initialize Prometheus instrumentation
-Instrumentator().instrument(app).expose(app)
+# Initialize Prometheus instrumentation; served by the /metrics route below,
+# which also aggregates every worker in multiprocess mode
+Instrumentator(excluded_handlers=['/metrics']).instrument(app)
+
+idempotency_cache = IdempotencyCache(IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_CACHE_TTL)
+
+# AWS resources, resolved once at startup instead of on every request. All
+# DynamoDB calls go through the shared, thread-safe client with TableName.
+transactions_table_name = None
+sns_topic_arn = None
+outbox = None
+
+def resolve_resources() -> None:
+    """Resolve the DynamoDB table name, SNS topic ARN and outbox from the environment."""
+    global transactions_table_name, sns_topic_arn, outbox
+    transactions_table_name = os.getenv('DYNAMODB_TABLE', 'transactions')
+    sns_topic_arn = os.getenv('SNS_TOPIC_ARN')
+    if EVENT_DELIVERY_MODE == 'outbox' and outbox is None:
+        outbox = Outbox(OUTBOX_PATH, synchronous=OUTBOX_SYNCHRONOUS)
+
+def ensure_resources() -> None:
+    # Covers callers that bypass the startup event, e.g. a TestClient used without a context manager
+    if transactions_table_name is None:
+        resolve_resources()
+
 
 class Transaction(BaseModel):
     user_id: str
@@ -67,33 +138,224 @@ class Transaction(BaseModel):
         }
     )
 
+class TransactionBatch(BaseModel):
+    transactions: List[Transaction] = Field(..., min_length=1, max_length=MAX_BATCH_SIZE)
+
+def build_transaction_record(transaction: Transaction, transaction_id: Optional[str] = None) -> Dict[str, Any]:
+    """Create a DynamoDB transaction record, minting a fresh ID unless one is given."""
+    return {
+        'transaction_id': transaction_id or str(uuid.uuid4()),
+        'user_id': transaction.user_id,
+        'amount': Decimal(str(transaction.amount)),  # Convert to Decimal
+        'merchant': transaction.merchant,
+        'description': transaction.description,
+        'category': transaction.category,
+        'timestamp': datetime.now(UTC).isoformat()
+    }
+
+def chunked(items: List[Any], size: int) -> List[List[Any]]:
+    """Split a list into consecutive chunks of at most `size` items."""
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def batch_write_records(table_name: str, records: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Write records with DynamoDB batch writes, retrying unprocessed items with
+    exponential backoff. Returns a mapping of transaction_id to error message
+    for records that could not be written.
+    """
+    failed = {}
+    for chunk in chunked(records, DYNAMODB_BATCH_SIZE):
+        request_items = {
+            table_name: [{'PutRequest': {'Item': record}} for record in chunk]
+        }
+        attempt = 0
+        while request_items:
+            try:
+                response = dynamodb.batch_write_item(RequestItems=request_items)
+            except Exception as e:
+                for request in request_items.get(table_name, []):
+                    failed[request['PutRequest']['Item']['transaction_id']] = str(e)
+                break
+
+            request_items = response.get('UnprocessedItems') or {}
+            if not request_items:
+                break
+
+            attempt += 1
+            if attempt > BATCH_WRITE_MAX_RETRIES:
+                for request in request_items.get(table_name, []):
+                    failed[request['PutRequest']['Item']['transaction_id']] = 'unprocessed after retries'
+                break
+            time.sleep(BATCH_WRITE_BASE_DELAY * (2 ** (attempt - 1)))
+    return failed
+
+def publish_message_batch(topic_arn: str, messages: Dict[str, str]) -> Dict[str, str]:
+    """
+    Publish up to 10 messages with a single publish_batch call. Returns a
+    mapping of entry ID to error message for entries SNS did not accept.
+    """
+    response = sns.publish_batch(
+        TopicArn=topic_arn,
+        PublishBatchRequestEntries=[
+            {'Id': entry_id, 'Message': message, 'MessageAttributes': events.message_attributes(message)}
+            for entry_id, message in messages.items()
+        ]
+    )
+    return {
+        failure['Id']: failure.get('Message') or failure.get('Code', 'publish failed')
+        for failure in response.get('Failed', [])
+    }
+
+def publish_batch_records(topic_arn: str, records: List[Dict[str, Any]]) -> Dict[str, str]:
+    """
+    Publish records to SNS in publish_batch groups. Returns a mapping of
+    transaction_id to error message for entries SNS did not accept.
+    """
+    failed = {}
+    for chunk in chunked(records, SNS_BATCH_SIZE):
+        # Batch entry IDs only need to be unique within a single request
+        entries = {str(i): record for i, record in enumerate(chunk)}
+        try:
+            failures = publish_message_batch(
+                topic_arn,
+                {entry_id: events.encode(record) for entry_id, record in entries.items()}
+            )
+        except Exception as e:
+            failures = {entry_id: str(e) for entry_id in entries}
+
+        for entry_id, error in failures.items():
+            failed[entries[entry_id]['transaction_id']] = error
+    return failed
+
+def publish_record(record: Dict[str, Any]) -> None:
+    """Publish one record to SNS in the configured event schema version and encoding."""
+    message = events.encode(record)
+    sns.publish(TopicArn=sns_topic_arn, Message=message, MessageAttributes=events.message_attributes(message))
+
+def record_exists(transaction_id: str) -> bool:
+    response = dynamodb.get_item(
+        TableName=transactions_table_name,
+        Key={'transaction_id': transaction_id},
+        ProjectionExpression='transaction_id'
+    )
+    return 'Item' in response
+
+def mark_published(transaction_id: str) -> None:
+    """Clear the flag a conditional direct-mode write sets until SNS accepts the event."""
+    dynamodb.update_item(
+        TableName=transactions_table_name,
+        Key={'transaction_id': transaction_id},
+        UpdateExpression='REMOVE publish_pending'
+    )
+
+def republish_if_pending(item: Dict[str, Any]) -> None:
+    """
+    Publish the event of a stored record whose first publish never succeeded,
+    e.g. when an idempotent retry finds the record already written.
+    """
+    if not item.pop('publish_pending', False):
+        return
+    publish_record(item)
+    mark_published(item['transaction_id'])
+
+def put_record(record: Dict[str, Any], conditional: bool = False) -> None:
+    """Write a transaction record; a conditional write never overwrites an existing transaction."""
+    if conditional:
+        dynamodb.put_item(
+            TableName=transactions_table_name,
+            Item=record,
+            ConditionExpression='attribute_not_exists(transaction_id)'
+        )
+    else:
+        dynamodb.put_item(TableName=transactions_table_name, Item=record)
+
+async def store_with_outbox(record: Dict[str, Any], conditional: bool = False) -> None:
+    """
+    Store a record and hand its event to the outbox. The event is added as
+    pending first so a crash between the two writes can be recovered at startup.
+    """
+    transaction_id = record['transaction_id']
+    inserted = await run_blocking(outbox.add, [(transaction_id, events.encode(record))])
+    try:
+        await run_blocking(put_record, record, conditional)
+    except Exception:
+        # An event already queued under this key belongs to an earlier attempt; leave it alone
+        if inserted:
+            await run_blocking(outbox.discard, [transaction_id])
+        raise
+    await run_blocking(outbox.mark_ready, [transaction_id])
+
+async def store_transaction(record: Dict[str, Any], conditional: bool = False) -> bool:
+    """
+    Store a record and publish (or enqueue) its event. Returns False without
+    publishing when a conditional write finds the transaction already exists.
+    """
+    try:
+        if outbox is not None:
+            # Store in DynamoDB; the event is published in the background
+            await store_with_outbox(record, conditional)
+        elif conditional:
+            # The conditional write has to succeed before the event may go out.
+            # The record is flagged until SNS accepts the event, so a retry that
+            # finds it already stored can publish it if this request failed to.
+            await run_blocking(put_record, {**record, 'publish_pending': True}, True)
+            await run_blocking(publish_record, record)
+            await run_blocking(mark_published, record['transaction_id'])
+        else:
+            # Store in DynamoDB and publish to SNS concurrently
+            await asyncio.gather(
+                run_blocking(put_record, record),
+                run_blocking(publish_record, record)
+            )
+    except ClientError as e:
+        if conditional and e.response['Error']['Code'] == 'ConditionalCheckFailedException':
+            return False
+        raise
+    return True
+
 @app.post("/transactions")
-async def create_transaction(transaction: Transaction):
+async def create_transaction(
+    transaction: Transaction,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=255)
+):
+    transaction_id = None
+    if idempotency_key is not None:
+        # Retries of the same request map to the same transaction ID
+        transaction_id = transaction_id_for(transaction.user_id, idempotency_key)
+        cached = idempotency_cache.get(transaction_id)
+        if cached is not None:
+            idempotency_counter.labels(result='cache_hit').inc()
+            response.headers['Idempotent-Replayed'] = 'true'
+            return cached
+
     try:
-        # Generate transaction ID
-        transaction_id = str(uuid.uuid4())
-        timestamp = datetime.now(UTC).isoformat()
-        
         # Create transaction record with Decimal amount
-        transaction_record = {
-            'transaction_id': transaction_id,
-            'user_id': transaction.user_id,
-            'amount': Decimal(str(transaction.amount)),  # Convert to Decimal
-            'merchant': transaction.merchant,
-            'description': transaction.description,
-            'category': transaction.category,
-            'timestamp': timestamp
-        }
-        
-        # Store in DynamoDB
-        table = dynamodb.Table(os.getenv('DYNAMODB_TABLE', 'transactions'))
-        table.put_item(Item=transaction_record)
+        transaction_record = build_transaction_record(transaction, transaction_id)
+        transaction_id = transaction_record['transaction_id']
+        timestamp = transaction_record['timestamp']
         
-        # Publish to SNS
-        sns.publish(
-            TopicArn=os.getenv('SNS_TOPIC_ARN'),
-            Message=json.dumps(transaction_record, default=str)  # Handle Decimal serialization
-        )
+        ensure_resources()
+        if not await store_transaction(transaction_record, conditional=idempotency_key is not None):
+            # Another instance (or an evicted cache entry) already handled this key
+            existing = await run_blocking(
+                dynamodb.get_item,
+                TableName=transactions_table_name,
+                Key={'transaction_id': transaction_id},
+                ConsistentRead=True
+            )
+            if outbox is None:
+                # The earlier attempt may have stored the record but failed to publish it
+                await run_blocking(republish_if_pending, existing['Item'])
+            result = {
+                "transaction_id": transaction_id,
+                "status": "success",
+                "timestamp": existing['Item']['timestamp']
+            }
+            idempotency_counter.labels(result='store_hit').inc()
+            idempotency_cache.put(transaction_id, result)
+            response.headers['Idempotent-Replayed'] = 'true'
+            return result
         
         # Record metrics
         transaction_counter.labels(status='success').inc()
@@ -108,11 +370,15 @@ async def create_transaction(transaction: Transaction):
             merchant=transaction.merchant
         )
         
-        return {
+        result = {
             "transaction_id": transaction_id,
             "status": "success",
             "timestamp": timestamp
         }
+        if idempotency_key is not None:
+            idempotency_counter.labels(result='miss').inc()
+            idempotency_cache.put(transaction_id, result)
+        return result
         
     except Exception as e:
         # Record failure
@@ -128,10 +394,147 @@ async def create_transaction(transaction: Transaction):
         
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/transactions/batch")
+async def create_transactions_batch(batch: TransactionBatch):
+    ensure_resources()
+    records = [build_transaction_record(transaction) for transaction in batch.transactions]
+    if outbox is not None:
+        await run_blocking(outbox.add, [
+            (record['transaction_id'], events.encode(record)) for record in records
+        ])
+
+    # Store in DynamoDB, one executor task per batch write; only records that were written get published
+    write_failures = {}
+    for failures in await asyncio.gather(*(
+        run_blocking(batch_write_records, transactions_table_name, chunk)
+        for chunk in chunked(records, DYNAMODB_BATCH_SIZE)
+    )):
+        write_failures.update(failures)
+    stored = [record for record in records if record['transaction_id'] not in write_failures]
+
+    publish_failures = {}
+    if outbox is not None:
+        # Hand stored events to the background flusher and drop the rest
+        await run_blocking(outbox.mark_ready, [record['transaction_id'] for record in stored])
+        await run_blocking(outbox.discard, list(write_failures))
+    else:
+        # Fan out to SNS, one executor task per publish_batch group
+        for failures in await asyncio.gather(*(
+            run_blocking(publish_batch_records, sns_topic_arn, chunk)
+            for chunk in chunked(stored, SNS_BATCH_SIZE)
+        )):
+            publish_failures.update(failures)
+
+    # A row whose publish failed is still stored; it must not be reported as
+    # an error, or the client would retry it and create a duplicate transaction
+    results = []
+    succeeded = []
+    for index, record in enumerate(records):
+        transaction_id = record['transaction_id']
+        result = {
+            "index": index,
+            "transaction_id": transaction_id,
+            "status": "success",
+            "timestamp": record['timestamp']
+        }
+        if transaction_id in write_failures:
+            result["status"] = "error"
+            result["error"] = write_failures[transaction_id]
+        elif transaction_id in publish_failures:
+            result["status"] = "publish_failed"
+            result["error"] = publish_failures[transaction_id]
+        else:
+            succeeded.append(record)
+        results.append(result)
+
+    # Record metrics in bulk
+    if succeeded:
+        transaction_counter.labels(status='success').inc(len(succeeded))
+    if publish_failures:
+        transaction_counter.labels(status='publish_failed').inc(len(publish_failures))
+    if write_failures:
+        transaction_counter.labels(status='error').inc(len(write_failures))
+    for record in stored:
+        transaction_amount.observe(float(record['amount']))
+
+    logger.info(
+        "transaction_batch_processed",
+        batch_size=len(records),
+        succeeded=len(succeeded),
+        failed=len(write_failures),
+        publish_failed=len(publish_failures)
+    )
+
+    return {
+        "succeeded": len(succeeded),
+        "failed": len(write_failures),
+        "publish_failed": len(publish_failures),
+        "results": results
+    }
+
+def to_utc_iso(value: Optional[datetime]) -> Optional[str]:
+    """Format a query bound like stored timestamps; naive datetimes are taken as UTC."""
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=UTC)
+    return value.astimezone(UTC).isoformat()
+
+@app.get("/users/{user_id}/transactions")
+async def list_user_transactions(
+    user_id: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    format: Literal['json', 'ndjson'] = 'json',
+    view: Literal['rows', 'summary'] = 'rows'
+):
+    ensure_resources()
+    try:
+        start_key = history.decode_cursor(cursor, user_id) if cursor else None
+    except history.InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    attributes = history.SUMMARY_ATTRIBUTES if view == 'summary' else history.ROW_ATTRIBUTES
+    query = history.build_query(
+        USER_TRANSACTIONS_INDEX, user_id, to_utc_iso(start), to_utc_iso(end), attributes
+    )
+
+    if view == 'summary':
+        # Aggregate page by page so memory stays flat regardless of history size
+        summary = history.Summary()
+        while True:
+            items, start_key = await run_blocking(
+                history.query_page, dynamodb, transactions_table_name, query, MAX_PAGE_SIZE, start_key
+            )
+            summary.add(items)
+            if not start_key:
+                break
+        return {"user_id": user_id, **summary.to_dict()}
+
+    if format == 'ndjson':
+        async def stream_rows():
+            key = start_key
+            while True:
+                items, key = await run_blocking(history.query_page, dynamodb, transactions_table_name, query, limit, key)
+                if items:
+                    yield ''.join(json.dumps(history.to_json_row(item)) + '\n' for item in items)
+                if not key:
+                    break
+
+        return StreamingResponse(stream_rows(), media_type='application/x-ndjson')
+
+    items, last_key = await run_blocking(history.query_page, dynamodb, transactions_table_name, query, limit, start_key)
+    return {
+        "items": [history.to_json_row(item) for item in items],
+        "next_cursor": history.encode_cursor(last_key)
+    }
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
 
 @app.get("/metrics")
 async def metrics():
-    return generate_latest() 
\ No newline at end of file
+    return Response(content=prometheus_metrics.render(), media_type=CONTENT_TYPE_LATEST) 
\ No newline at end of file
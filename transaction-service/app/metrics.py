@@ -0,0 +1,24 @@
+import os
+from typing import Optional
+
+from prometheus_client import REGISTRY, CollectorRegistry, generate_latest, multiprocess
+
+# With several worker processes, each worker writes its metrics to memory-mapped
+# files in this directory and a scrape of any worker aggregates all of them.
+# prometheus_client picks the file-backed values when it is first imported, so
+# the variable has to be set before the workers start (gunicorn.conf.py does).
+PROMETHEUS_MULTIPROC_DIR = os.getenv('PROMETHEUS_MULTIPROC_DIR')
+
+def render() -> bytes:
+    """Metrics in the Prometheus text format, for every worker in multiprocess mode."""
+    if not PROMETHEUS_MULTIPROC_DIR:
+        return generate_latest(REGISTRY)
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry, path=PROMETHEUS_MULTIPROC_DIR)
+    return generate_latest(registry)
+
+def mark_process_dead(pid: int, path: Optional[str] = None) -> None:
+    """Drop a stopped worker's live gauges; its counters and histograms still count."""
+    path = path or PROMETHEUS_MULTIPROC_DIR
+    if path:
+        multiprocess.mark_process_dead(pid, path)
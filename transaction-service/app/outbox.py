@@ -0,0 +1,264 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import structlog
+from prometheus_client import Gauge
+
+from app.aws import run_blocking
+
+logger = structlog.get_logger()
+
+# Initialize Prometheus metrics
+outbox_depth = Gauge(
+    'transaction_outbox_depth',
+    'Number of events waiting in the outbox',
+    # Workers share the outbox file, so they all report the same value
+    multiprocess_mode='livemax'
+)
+
+outbox_lag = Gauge(
+    'transaction_outbox_lag_seconds',
+    'Age of the oldest undelivered event in the outbox',
+    multiprocess_mode='livemax'
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    event_key TEXT NOT NULL UNIQUE,
+    message TEXT NOT NULL,
+    ready INTEGER NOT NULL DEFAULT 0,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS outbox_due ON outbox (ready, next_attempt_at);
+"""
+
+@dataclass
+class OutboxEntry:
+    id: int
+    event_key: str
+    message: str
+    attempts: int
+    created_at: float
+
+class Outbox:
+    """
+    Durable SQLite (WAL) queue of events waiting to be published.
+
+    Events are added in a pending state before the source record is written,
+    marked ready once the write succeeds, and deleted only after SNS accepts
+    them, which gives at-least-once delivery across restarts.
+    """
+
+    def __init__(self, path: str, synchronous: str = 'FULL', lease_seconds: float = 30.0):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(f'PRAGMA synchronous={synchronous}')
+        self._conn.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def add(self, events: Iterable[Tuple[str, str]], ready: bool = False) -> int:
+        """
+        Insert (event_key, message) pairs; pending events are not delivered
+        until marked ready. Keys already in the outbox are left untouched.
+        Returns the number of events inserted.
+        """
+        now = time.time()
+        with self._lock:
+            return self._conn.executemany(
+                'INSERT OR IGNORE INTO outbox (event_key, message, ready, created_at, next_attempt_at) '
+                'VALUES (?, ?, ?, ?, ?)',
+                [(key, message, int(ready), now, now) for key, message in events]
+            ).rowcount
+
+    def mark_ready(self, keys: List[str]) -> None:
+        self._update_keys('UPDATE outbox SET ready = 1 WHERE event_key IN ({})', keys)
+
+    def discard(self, keys: List[str]) -> None:
+        self._update_keys('DELETE FROM outbox WHERE event_key IN ({})', keys)
+
+    def _update_keys(self, statement: str, keys: List[str]) -> None:
+        if not keys:
+            return
+        with self._lock:
+            self._conn.execute(statement.format(','.join('?' * len(keys))), keys)
+
+    def claim_due(self, limit: int) -> List[OutboxEntry]:
+        """
+        Claim up to `limit` ready events whose retry time has passed. Claimed
+        events are leased so that other flushers sharing the file skip them.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                rows = self._conn.execute(
+                    'SELECT id, event_key, message, attempts, created_at FROM outbox '
+                    'WHERE ready = 1 AND next_attempt_at <= ? ORDER BY id LIMIT ?',
+                    (now, limit)
+                ).fetchall()
+                if rows:
+                    self._conn.execute(
+                        'UPDATE outbox SET next_attempt_at = ? WHERE id IN ({})'.format(','.join('?' * len(rows))),
+                        [now + self.lease_seconds] + [row[0] for row in rows]
+                    )
+                self._conn.execute('COMMIT')
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+        return [OutboxEntry(*row) for row in rows]
+
+    def delete(self, ids: List[int]) -> None:
+        if not ids:
+            return
+        with self._lock:
+            self._conn.execute(
+                'DELETE FROM outbox WHERE id IN ({})'.format(','.join('?' * len(ids))),
+                ids
+            )
+
+    def retry_later(self, retries: Dict[int, float]) -> None:
+        """Record a failed attempt and schedule the next one; `retries` maps id to delay in seconds."""
+        if not retries:
+            return
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                'UPDATE outbox SET attempts = attempts + 1, next_attempt_at = ? WHERE id = ?',
+                [(now + delay, entry_id) for entry_id, delay in retries.items()]
+            )
+
+    def pending_keys(self, older_than: float) -> List[str]:
+        """Keys of events that were never marked ready, e.g. because the process died mid-request."""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT event_key FROM outbox WHERE ready = 0 AND created_at <= ?',
+                (time.time() - older_than,)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def stats(self) -> Tuple[int, Optional[float]]:
+        """Return the number of undelivered events and the creation time of the oldest one."""
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*), MIN(created_at) FROM outbox').fetchone()
+
+def recover_pending(outbox: Outbox, exists: Callable[[str], bool], older_than: float = 60.0) -> int:
+    """
+    Resolve events left pending by a crash: publish those whose record was
+    stored and drop the rest. Returns the number of events recovered.
+    """
+    ready, missing = [], []
+    for key in outbox.pending_keys(older_than):
+        (ready if exists(key) else missing).append(key)
+    outbox.mark_ready(ready)
+    outbox.discard(missing)
+    if ready or missing:
+        logger.info("outbox_pending_recovered", recovered=len(ready), discarded=len(missing))
+    return len(ready)
+
+class OutboxFlusher:
+    """
+    Background task that drains the outbox in publish_batch groups.
+
+    `publish` takes a mapping of entry id to message (at most `batch_size`
+    entries) and returns a mapping of entry id to error for the entries that
+    were not accepted.
+    """
+
+    def __init__(
+        self,
+        outbox: Outbox,
+        publish: Callable[[Dict[str, str]], Dict[str, str]],
+        batch_size: int = 10,
+        fetch_size: int = 100,
+        poll_interval: float = 0.2,
+        base_delay: float = 0.5,
+        max_delay: float = 60.0
+    ):
+        self.outbox = outbox
+        self.publish = publish
+        self.batch_size = batch_size
+        self.fetch_size = fetch_size
+        self.poll_interval = poll_interval
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._stopping = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> asyncio.Task:
+        self._task = asyncio.create_task(self.run())
+        return self._task
+
+    async def stop(self) -> None:
+        self._stopping.set()
+        if self._task is not None:
+            await self._task
+
+    def backoff(self, attempts: int) -> float:
+        return min(self.max_delay, self.base_delay * (2 ** attempts))
+
+    async def run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                delivered = await self.flush_once()
+            except Exception as e:
+                logger.error("outbox_flush_failed", error=str(e))
+                delivered = 0
+            if delivered == 0:
+                # Idle or failing: wait for the next poll (or shutdown) instead of spinning
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+        # Drain whatever is already due before exiting
+        try:
+            await self.flush_once()
+        except Exception as e:
+            logger.error("outbox_flush_failed", error=str(e))
+
+    async def flush_once(self) -> int:
+        """Publish one round of due events. Returns the number delivered."""
+        entries = await run_blocking(self.outbox.claim_due, self.fetch_size)
+        if entries:
+            groups = [entries[i:i + self.batch_size] for i in range(0, len(entries), self.batch_size)]
+            results = await asyncio.gather(
+                *(run_blocking(self._publish_group, group) for group in groups)
+            )
+            delivered = [entry_id for ok, _ in results for entry_id in ok]
+            retries = {entry_id: delay for _, failed in results for entry_id, delay in failed.items()}
+            await run_blocking(self.outbox.delete, delivered)
+            await run_blocking(self.outbox.retry_later, retries)
+            if retries:
+                logger.warning("outbox_publish_retry", failed=len(retries), delivered=len(delivered))
+        else:
+            delivered = []
+        await self.update_gauges()
+        return len(delivered)
+
+    def _publish_group(self, group: List[OutboxEntry]) -> Tuple[List[int], Dict[int, float]]:
+        by_entry_id = {str(entry.id): entry for entry in group}
+        try:
+            failures = self.publish({entry_id: entry.message for entry_id, entry in by_entry_id.items()})
+        except Exception as e:
+            logger.error("outbox_publish_failed", error=str(e), batch_size=len(group))
+            failures = {entry_id: str(e) for entry_id in by_entry_id}
+        delivered = [entry.id for entry_id, entry in by_entry_id.items() if entry_id not in failures]
+        retries = {by_entry_id[entry_id].id: self.backoff(by_entry_id[entry_id].attempts) for entry_id in failures}
+        return delivered, retries
+
+    async def update_gauges(self) -> None:
+        depth, oldest = await run_blocking(self.outbox.stats)
+        outbox_depth.set(depth)
+        outbox_lag.set(time.time() - oldest if oldest is not None else 0)
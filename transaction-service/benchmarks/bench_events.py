@@ -0,0 +1,79 @@
+"""
+Microbenchmark for the transaction event envelope: encode cost on the
+producer, decode cost on the consumer (the SQS body holding the SNS
+notification, then the message) and payload size, per schema version and
+encoding. Version 1 is the format published before the envelope existed.
+
+Run from the transaction-service directory:
+
+    python benchmarks/bench_events.py
+"""
+import importlib.util
+import json
+import os
+import sys
+import timeit
+import uuid
+from datetime import datetime, UTC
+from decimal import Decimal
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app import events  # noqa: E402
+
+ITERATIONS = 50_000
+
+RECORD = {
+    'transaction_id': str(uuid.uuid4()),
+    'user_id': 'user123',
+    'amount': Decimal(str(100.5)),
+    'merchant': 'Corner Shop',
+    'description': 'Weekly groceries',
+    'category': 'groceries',
+    'timestamp': datetime.now(UTC).isoformat()
+}
+
+def sqs_body(message: str) -> str:
+    """The SQS body SNS delivers, without raw message delivery."""
+    return json.dumps({
+        'Type': 'Notification',
+        'MessageId': str(uuid.uuid4()),
+        'TopicArn': 'arn:aws:sns:us-east-1:123456789012:reward-events',
+        'Message': message,
+        'Timestamp': '2024-03-01T12:00:00.000Z',
+        'MessageAttributes': {
+            name: {'Type': attribute['DataType'], 'Value': attribute['StringValue']}
+            for name, attribute in events.message_attributes(message).items()
+        }
+    })
+
+def consume_before(body: str) -> dict:
+    """The consumer before the envelope: two json.loads."""
+    return json.loads(json.loads(body)['Message'])
+
+def consume(body: str) -> dict:
+    notification = events.loads(body)
+    return events.decode(notification['Message'], notification['MessageAttributes'])
+
+def per_event(stmt) -> float:
+    return min(timeit.repeat(stmt, number=ITERATIONS, repeat=5)) / ITERATIONS * 1e6
+
+def main() -> None:
+    formats = [('v1 json.dumps (before)', 1, 'json'), ('v2 orjson', 2, 'json')]
+    if importlib.util.find_spec('msgpack') is not None:
+        formats.append(('v2 msgpack+base64', 2, 'msgpack'))
+    else:
+        print("msgpack is not installed; skipping the msgpack encoding")
+
+    print(f"{'format':<24} {'encode us':>10} {'decode us':>10} {'total us':>9} {'message B':>10} {'sqs body B':>11}")
+    for label, version, encoding in formats:
+        message = events.encode(RECORD, version, encoding)
+        body = sqs_body(message)
+        consumer = consume_before if version == 1 else consume
+        encode_us = per_event(lambda: events.encode(RECORD, version, encoding))
+        decode_us = per_event(lambda: consumer(body))
+        print(f"{label:<24} {encode_us:>10.2f} {decode_us:>10.2f} {encode_us + decode_us:>9.2f} "
+              f"{len(message):>10} {len(body):>11}")
+
+if __name__ == "__main__":
+    main()
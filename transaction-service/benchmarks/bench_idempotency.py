@@ -0,0 +1,41 @@
+"""
+Microbenchmark for the Idempotency-Key lookup on the request hot path.
+
+Run from the transaction-service directory:
+
+    python benchmarks/bench_idempotency.py
+"""
+import os
+import sys
+import timeit
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.idempotency import IdempotencyCache, transaction_id_for  # noqa: E402
+
+ITERATIONS = 200_000
+
+def bench(label: str, stmt, number: int = ITERATIONS) -> None:
+    seconds = min(timeit.repeat(stmt, number=number, repeat=5))
+    print(f"{label:<45} {seconds / number * 1e9:>8.0f} ns/op")
+
+def main() -> None:
+    for size in (1_000, 10_000, 100_000):
+        cache = IdempotencyCache(max_entries=size, ttl_seconds=3600)
+        keys = [transaction_id_for('user123', str(uuid.uuid4())) for _ in range(size)]
+        for key in keys:
+            cache.put(key, {'transaction_id': key, 'status': 'success', 'timestamp': 'now'})
+
+        hit_key = keys[size // 2]
+        miss_key = transaction_id_for('user123', 'never-seen')
+        print(f"cache size {size}")
+        bench("  get (hit)", lambda: cache.get(hit_key))
+        bench("  get (miss)", lambda: cache.get(miss_key))
+        bench("  put (existing key)", lambda: cache.put(miss_key, {}))
+
+    bench("derive transaction id (uuid5)", lambda: transaction_id_for('user123', 'key'))
+    bench("baseline uuid4", uuid.uuid4)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,24 @@
+# Multi-worker deployment: gunicorn supervises uvicorn workers and metrics are
+# shared through PROMETHEUS_MULTIPROC_DIR (see "Multiple Workers" in the README).
+#
+#   gunicorn app.main:app -c gunicorn.conf.py
+import os
+import shutil
+
+bind = os.getenv('BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', '2'))
+worker_class = 'uvicorn.workers.UvicornWorker'
+
+# Inherited by every worker, before it imports prometheus_client
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/transaction-service-metrics')
+
+def on_starting(server):
+    # Files left by a previous run would be added to this run's counters
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path)
+
+def child_exit(server, worker):
+    from app.metrics import mark_process_dead
+
+    mark_process_dead(worker.pid, os.environ['PROMETHEUS_MULTIPROC_DIR'])
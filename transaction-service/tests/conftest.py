@@ -0,0 +1,60 @@
+import pytest
+from moto import mock_dynamodb, mock_sns
+import boto3
+import os
+from app import main
+
+@pytest.fixture
+def aws_credentials():
+    """Mocked AWS Credentials for moto."""
+    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
+    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
+    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
+    os.environ['AWS_SESSION_TOKEN'] = 'testing'
+    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
+
+@pytest.fixture
+def dynamodb(aws_credentials):
+    with mock_dynamodb():
+        dynamodb = boto3.resource('dynamodb')
+        # Create the DynamoDB table
+        table = dynamodb.create_table(
+            TableName='transactions',
+            KeySchema=[
+                {'AttributeName': 'transaction_id', 'KeyType': 'HASH'}
+            ],
+            AttributeDefinitions=[
+                {'AttributeName': 'transaction_id', 'AttributeType': 'S'},
+                {'AttributeName': 'user_id', 'AttributeType': 'S'},
+                {'AttributeName': 'timestamp', 'AttributeType': 'S'}
+            ],
+            GlobalSecondaryIndexes=[
+                {
+                    'IndexName': 'user_id-timestamp-index',
+                    'KeySchema': [
+                        {'AttributeName': 'user_id', 'KeyType': 'HASH'},
+                        {'AttributeName': 'timestamp', 'KeyType': 'RANGE'}
+                    ],
+                    'Projection': {'ProjectionType': 'ALL'},
+                    'ProvisionedThroughput': {
+                        'ReadCapacityUnits': 5,
+                        'WriteCapacityUnits': 5
+                    }
+                }
+            ],
+            ProvisionedThroughput={
+                'ReadCapacityUnits': 5,
+                'WriteCapacityUnits': 5
+            }
+        )
+        yield dynamodb
+
+@pytest.fixture
+def sns(aws_credentials):
+    with mock_sns():
+        sns = boto3.client('sns')
+        # Create the SNS topic
+        topic = sns.create_topic(Name='reward-events')
+        os.environ['SNS_TOPIC_ARN'] = topic['TopicArn']
+        main.resolve_resources()
+        yield sns
@@ -0,0 +1,74 @@
+import json
+import os
+from decimal import Decimal
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import events, main
+from app.main import app
+
+RECORD = {
+    'transaction_id': 'tx-1',
+    'user_id': 'user123',
+    'amount': Decimal('100.5'),
+    'merchant': 'Test Store',
+    'description': None,
+    'category': 'Retail',
+    'timestamp': '2024-03-01T12:00:00+00:00'
+}
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+def test_version_1_is_todays_format():
+    message = events.encode(RECORD, version=1)
+    assert message == json.dumps(RECORD, default=str)
+    assert events.decode(message) == {**RECORD, 'amount': '100.5'}
+    assert events.message_attributes(message)['schema_version']['StringValue'] == '1'
+
+def test_version_2_json_round_trip():
+    message = events.encode(RECORD, version=2, encoding='json')
+    assert len(message) < len(events.encode(RECORD, version=1))
+    assert events.decode(message) == {**RECORD, 'amount': 100.5}
+    assert events.message_attributes(message) == {
+        'schema_version': {'DataType': 'Number', 'StringValue': '2'},
+        'content_encoding': {'DataType': 'String', 'StringValue': 'json'}
+    }
+
+def test_version_2_msgpack_round_trip():
+    pytest.importorskip('msgpack')
+    message = events.encode(RECORD, version=2, encoding='msgpack')
+    assert events.decode(message) == {**RECORD, 'amount': 100.5}
+    assert events.message_attributes(message)['content_encoding']['StringValue'] == 'msgpack'
+
+def test_unsupported_versions_are_rejected():
+    message = events.encode(RECORD, version=2)
+    with pytest.raises(events.UnsupportedEvent):
+        events.decode(message, {'schema_version': {'Type': 'Number', 'Value': '3'}})
+    with pytest.raises(events.UnsupportedEvent):
+        events.decode(message.replace('{"v":2', '{"v":3', 1))
+    with pytest.raises(events.UnsupportedEvent):
+        events.encode(RECORD, version=3)
+
+def test_copies_are_identical():
+    here = os.path.dirname(__file__)
+    with open(os.path.join(here, '..', 'app', 'events.py')) as producer:
+        source = producer.read()
+    for consumer in (('analytics-service', 'lambda'), ('recommendation-service', 'app')):
+        with open(os.path.join(here, '..', '..', *consumer, 'events.py')) as copy:
+            assert copy.read() == source, consumer
+
+def test_transactions_are_published_in_the_configured_version(client, dynamodb, sns, monkeypatch):
+    monkeypatch.setattr(events, 'EVENT_SCHEMA_VERSION', 2)
+    published = []
+    monkeypatch.setattr(main.sns, 'publish', lambda **kwargs: published.append(kwargs))
+
+    response = client.post('/transactions', json={'user_id': 'user123', 'amount': 100.5, 'merchant': 'Test Store'})
+    assert response.status_code == 200
+    [publish] = published
+    assert publish['MessageAttributes']['schema_version'] == {'DataType': 'Number', 'StringValue': '2'}
+    event = events.decode(publish['Message'])
+    assert event['transaction_id'] == response.json()['transaction_id']
+    assert event['amount'] == 100.5
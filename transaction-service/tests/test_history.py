@@ -0,0 +1,106 @@
+import base64
+import pytest
+from fastapi.testclient import TestClient
+import json
+from decimal import Decimal
+from app.main import app
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def transactions(dynamodb, sns):
+    table = dynamodb.Table('transactions')
+    categories = ['groceries', 'dining', 'shopping']
+    with table.batch_writer() as writer:
+        for day in range(1, 31):
+            writer.put_item(Item={
+                'transaction_id': f'tx-{day}',
+                'user_id': 'user123',
+                'amount': Decimal(str(day)),
+                'merchant': 'Test Store',
+                'category': categories[day % 3],
+                'timestamp': f'2024-01-{day:02d}T12:00:00+00:00'
+            })
+        writer.put_item(Item={
+            'transaction_id': 'tx-other',
+            'user_id': 'someone-else',
+            'amount': Decimal('999'),
+            'merchant': 'Test Store',
+            'timestamp': '2024-01-15T12:00:00+00:00'
+        })
+    return table
+
+def test_list_user_transactions_paginates_newest_first(client, transactions):
+    seen = []
+    cursor = None
+    while True:
+        params = {"limit": 7}
+        if cursor:
+            params["cursor"] = cursor
+        response = client.get("/users/user123/transactions", params=params)
+        assert response.status_code == 200
+        data = response.json()
+        seen.extend(item["transaction_id"] for item in data["items"])
+        cursor = data["next_cursor"]
+        if not cursor:
+            break
+
+    assert seen == [f'tx-{day}' for day in range(30, 0, -1)]
+
+def test_list_user_transactions_time_range(client, transactions):
+    response = client.get("/users/user123/transactions", params={
+        "start": "2024-01-10T00:00:00Z",
+        "end": "2024-01-12T23:59:59Z"
+    })
+    assert response.status_code == 200
+    items = response.json()["items"]
+    assert [item["transaction_id"] for item in items] == ['tx-12', 'tx-11', 'tx-10']
+    assert set(items[0]) == {'transaction_id', 'amount', 'merchant', 'category', 'timestamp'}
+
+def test_list_user_transactions_ndjson_streams_all_pages(client, transactions):
+    response = client.get("/users/user123/transactions", params={"format": "ndjson", "limit": 4})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 30
+    assert rows[0]["amount"] == 30.0
+
+def test_list_user_transactions_summary(client, transactions):
+    response = client.get("/users/user123/transactions", params={"view": "summary"})
+    assert response.status_code == 200
+    assert response.json() == {
+        "user_id": "user123",
+        "total": float(sum(range(1, 31))),
+        "count": 30,
+        "category_totals": {
+            "dining": float(sum(d for d in range(1, 31) if d % 3 == 1)),
+            "groceries": float(sum(d for d in range(1, 31) if d % 3 == 0)),
+            "shopping": float(sum(d for d in range(1, 31) if d % 3 == 2))
+        }
+    }
+
+def test_list_user_transactions_rejects_foreign_cursor(client, transactions):
+    response = client.get("/users/user123/transactions", params={"limit": 1})
+    cursor = response.json()["next_cursor"]
+
+    response = client.get("/users/someone-else/transactions", params={"cursor": cursor})
+    assert response.status_code == 400
+
+    response = client.get("/users/user123/transactions", params={"cursor": "not-a-cursor"})
+    assert response.status_code == 400
+
+def test_list_user_transactions_rejects_forged_cursor(client, transactions):
+    forged = [
+        {"user_id": "user123"},
+        {"user_id": "user123", "timestamp": "2024-01-10T12:00:00+00:00"},
+        {"user_id": "user123", "timestamp": "2024-01-10T12:00:00+00:00", "transaction_id": 10},
+        {"user_id": "user123", "timestamp": "2024-01-10T12:00:00+00:00", "transaction_id": "tx-10", "extra": "x"},
+        ["user123"]
+    ]
+    for key in forged:
+        cursor = base64.urlsafe_b64encode(json.dumps(key).encode()).decode().rstrip('=')
+        response = client.get("/users/user123/transactions", params={"cursor": cursor})
+        assert response.status_code == 400, key
@@ -0,0 +1,117 @@
+import os
+import runpy
+import socket
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+
+import httpx
+from prometheus_client import CollectorRegistry, generate_latest, multiprocess
+from prometheus_client.parser import text_string_to_metric_families
+
+SERVICE_DIR = os.path.join(os.path.dirname(__file__), '..')
+
+# A worker process: issues transactions against moto and exits
+WORKER = """
+import os, sys
+import boto3
+from moto import mock_dynamodb, mock_sns
+with mock_dynamodb(), mock_sns():
+    boto3.resource('dynamodb').create_table(
+        TableName='transactions',
+        KeySchema=[{'AttributeName': 'transaction_id', 'KeyType': 'HASH'}],
+        AttributeDefinitions=[{'AttributeName': 'transaction_id', 'AttributeType': 'S'}],
+        BillingMode='PAY_PER_REQUEST'
+    )
+    os.environ['SNS_TOPIC_ARN'] = boto3.client('sns').create_topic(Name='reward-events')['TopicArn']
+    from fastapi.testclient import TestClient
+    from app.main import app
+    with TestClient(app) as client:
+        for i in range(int(sys.argv[1])):
+            response = client.post('/transactions', json={'user_id': f'user{i}', 'amount': 10 + i, 'merchant': 'Store'})
+            assert response.status_code == 200
+"""
+
+SCRAPER = """
+from fastapi.testclient import TestClient
+from app.main import app
+print(TestClient(app).get('/metrics').text)
+"""
+
+def worker_env(metrics_dir):
+    return {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(metrics_dir), 'AWS_DEFAULT_REGION': 'us-east-1',
+            'AWS_ACCESS_KEY_ID': 'testing', 'AWS_SECRET_ACCESS_KEY': 'testing'}
+
+def run_python(code, metrics_dir):
+    return subprocess.run([sys.executable, '-c', code], cwd=SERVICE_DIR, env=worker_env(metrics_dir),
+                          capture_output=True, text=True, check=True, timeout=120)
+
+def sample_value(text, name, **labels):
+    for family in text_string_to_metric_families(text):
+        for sample in family.samples:
+            if sample.name == name and all(sample.labels.get(k) == v for k, v in labels.items()):
+                return sample.value
+    return None
+
+def test_counts_of_all_workers_are_aggregated(tmp_path):
+    workers = [subprocess.Popen(
+        [sys.executable, '-c', WORKER, str(n)], cwd=SERVICE_DIR, env=worker_env(tmp_path)
+    ) for n in (5, 7, 9)]
+    assert [worker.wait(timeout=120) for worker in workers] == [0, 0, 0]
+
+    # A fourth process serves /metrics for all of them
+    text = run_python(SCRAPER, tmp_path).stdout
+    assert sample_value(text, 'transaction_total', status='success') == 21
+    assert sample_value(text, 'transaction_amount_count') == 21
+    assert sample_value(text, 'transaction_amount_sum') == sum(10 + i for n in (5, 7, 9) for i in range(n))
+    assert sample_value(text, 'http_requests_total', handler='/transactions', method='POST', status='2xx') == 21
+
+def test_every_uvicorn_worker_reports_the_same_counts(tmp_path):
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+    url = f'http://127.0.0.1:{port}'
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--workers', '3', '--port', str(port), '--log-level', 'warning'],
+        cwd=SERVICE_DIR, env=worker_env(tmp_path)
+    )
+    try:
+        served = 0
+        deadline = time.monotonic() + 60
+        # Wait until all three workers have imported the app
+        while len(list(tmp_path.glob('histogram_*.db'))) < 3 or served == 0:
+            assert time.monotonic() < deadline, 'workers did not start'
+            try:
+                served += httpx.get(f'{url}/health').status_code == 200
+            except httpx.TransportError:
+                time.sleep(0.2)
+        for _ in range(30):
+            # A new connection per request, so requests spread over the workers
+            assert httpx.get(f'{url}/health').status_code == 200
+        served += 30
+
+        scraped = {sample_value(httpx.get(f'{url}/metrics').text, 'http_requests_total', handler='/health', status='2xx')
+                   for _ in range(6)}
+        assert scraped == {served}
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+def test_child_exit_drops_live_gauges_of_dead_workers(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    config = runpy.run_path(os.path.join(SERVICE_DIR, 'gunicorn.conf.py'))
+    config['on_starting'](None)
+    # The worker dies without shutting down, e.g. killed by the OOM killer
+    pid = int(run_python(
+        "import os; from app.outbox import outbox_depth; outbox_depth.set(7); print(os.getpid()); os._exit(0)", tmp_path
+    ).stdout)
+
+    def scrape():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry, path=str(tmp_path))
+        return generate_latest(registry).decode()
+
+    assert sample_value(scrape(), 'transaction_outbox_depth') == 7
+    config['child_exit'](None, SimpleNamespace(pid=pid))
+    assert sample_value(scrape(), 'transaction_outbox_depth') is None
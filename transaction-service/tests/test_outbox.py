@@ -0,0 +1,116 @@
+import pytest
+from fastapi.testclient import TestClient
+import asyncio
+import json
+from functools import partial
+from app import main
+from app.main import app
+from app.outbox import Outbox, OutboxFlusher, recover_pending
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def outbox(tmp_path):
+    outbox = Outbox(str(tmp_path / 'outbox.db'))
+    yield outbox
+    outbox.close()
+
+@pytest.fixture
+def outbox_mode(outbox, monkeypatch):
+    monkeypatch.setattr(main, 'outbox', outbox)
+    return outbox
+
+def test_pending_events_are_not_claimed(outbox):
+    outbox.add([('tx1', '{}'), ('tx2', '{}')])
+    assert outbox.claim_due(10) == []
+
+    outbox.mark_ready(['tx2'])
+    assert [entry.event_key for entry in outbox.claim_due(10)] == ['tx2']
+
+def test_claimed_events_are_leased(outbox):
+    outbox.add([('tx1', '{}')], ready=True)
+    assert len(outbox.claim_due(10)) == 1
+    # A second flusher sharing the file must not pick up the same event
+    assert outbox.claim_due(10) == []
+
+def test_outbox_survives_restart(tmp_path):
+    path = str(tmp_path / 'outbox.db')
+    outbox = Outbox(path)
+    outbox.add([('tx1', '{"a": 1}')], ready=True)
+    outbox.close()
+
+    reopened = Outbox(path)
+    entries = reopened.claim_due(10)
+    reopened.close()
+    assert [(entry.event_key, entry.message) for entry in entries] == [('tx1', '{"a": 1}')]
+
+def test_recover_pending_publishes_stored_records_only(outbox):
+    outbox.add([('stored', '{}'), ('lost', '{}')])
+    recovered = recover_pending(outbox, lambda key: key == 'stored', older_than=0)
+
+    assert recovered == 1
+    assert [entry.event_key for entry in outbox.claim_due(10)] == ['stored']
+    assert outbox.stats()[0] == 1
+
+def test_flusher_retries_failed_entries(outbox):
+    outbox.add([(f'tx{i}', json.dumps({'i': i})) for i in range(12)], ready=True)
+    published = []
+
+    def publish(messages):
+        assert len(messages) <= 10
+        published.extend(messages.values())
+        # Reject the first message of every call on the first round only
+        if len(published) <= 12:
+            return {next(iter(messages)): 'throttled'}
+        return {}
+
+    flusher = OutboxFlusher(outbox, publish, base_delay=0)
+
+    assert asyncio.run(flusher.flush_once()) == 10
+    assert outbox.stats()[0] == 2
+    assert asyncio.run(flusher.flush_once()) == 2
+    assert outbox.stats()[0] == 0
+
+def test_create_transaction_in_outbox_mode(client, dynamodb, sns, outbox_mode, monkeypatch):
+    def fail_publish(**kwargs):
+        raise AssertionError("SNS must not be called on the request path")
+
+    monkeypatch.setattr(main.sns, 'publish', fail_publish)
+
+    response = client.post("/transactions", json={
+        "user_id": "user123",
+        "amount": 25.0,
+        "merchant": "Test Store"
+    })
+    assert response.status_code == 200
+    assert outbox_mode.stats()[0] == 1
+
+    # The background flusher delivers the event once SNS is reachable
+    monkeypatch.undo()
+    flusher = OutboxFlusher(outbox_mode, partial(main.publish_message_batch, main.sns_topic_arn))
+    assert asyncio.run(flusher.flush_once()) == 1
+    assert outbox_mode.stats()[0] == 0
+
+def test_create_transactions_batch_in_outbox_mode(client, dynamodb, sns, outbox_mode):
+    response = client.post("/transactions/batch", json={
+        "transactions": [
+            {"user_id": "user123", "amount": 5.0, "merchant": "Test Store"}
+            for _ in range(15)
+        ]
+    })
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == 15
+    assert len(outbox_mode.claim_due(100)) == 15
+
+def test_idempotent_retry_in_outbox_mode_enqueues_once(client, dynamodb, sns, outbox_mode, monkeypatch):
+    monkeypatch.setattr(main, 'idempotency_cache', main.IdempotencyCache(ttl_seconds=-1))
+    transaction_data = {"user_id": "user123", "amount": 42.0, "merchant": "Test Store"}
+    headers = {"Idempotency-Key": "outbox-retry"}
+
+    first = client.post("/transactions", json=transaction_data, headers=headers)
+    second = client.post("/transactions", json=transaction_data, headers=headers)
+
+    assert second.json() == first.json()
+    assert len(outbox_mode.claim_due(10)) == 1
@@ -1,53 +1,15 @@
 import pytest
+from fastapi import Response
 from fastapi.testclient import TestClient
-from moto import mock_dynamodb, mock_sns
-import boto3
-import os
-import json
+import asyncio
+import time
+from app import main
 from app.main import app
 
 @pytest.fixture
 def client():
     return TestClient(app)
 
-@pytest.fixture
-def aws_credentials():
-    """Mocked AWS Credentials for moto."""
-    os.environ['AWS_ACCESS_KEY_ID'] = 'testing'
-    os.environ['AWS_SECRET_ACCESS_KEY'] = 'testing'
-    os.environ['AWS_SECURITY_TOKEN'] = 'testing'
-    os.environ['AWS_SESSION_TOKEN'] = 'testing'
-    os.environ['AWS_DEFAULT_REGION'] = 'us-east-1'
-
-@pytest.fixture
-def dynamodb(aws_credentials):
-    with mock_dynamodb():
-        dynamodb = boto3.resource('dynamodb')
-        # Create the DynamoDB table
-        table = dynamodb.create_table(
-            TableName='transactions',
-            KeySchema=[
-                {'AttributeName': 'transaction_id', 'KeyType': 'HASH'}
-            ],
-            AttributeDefinitions=[
-                {'AttributeName': 'transaction_id', 'AttributeType': 'S'}
-            ],
-            ProvisionedThroughput={
-                'ReadCapacityUnits': 5,
-                'WriteCapacityUnits': 5
-            }
-        )
-        yield dynamodb
-
-@pytest.fixture
-def sns(aws_credentials):
-    with mock_sns():
-        sns = boto3.client('sns')
-        # Create the SNS topic
-        topic = sns.create_topic(Name='reward-events')
-        os.environ['SNS_TOPIC_ARN'] = topic['TopicArn']
-        yield sns
-
 def test_create_transaction(client, dynamodb, sns):
     transaction_data = {
         "user_id": "user123",
@@ -88,4 +50,200 @@ def test_create_transaction_missing_required_fields(client):
 def test_health_check(client):
     response = client.get("/health")
     assert response.status_code == 200
-    assert response.json() == {"status": "healthy"} 
\ No newline at end of file
+    assert response.json() == {"status": "healthy"}
+
+
+def test_create_transactions_batch(client, dynamodb, sns):
+    batch = {
+        "transactions": [
+            {"user_id": f"user{i}", "amount": 10.0 + i, "merchant": "Test Store", "category": "Retail"}
+            for i in range(30)
+        ]
+    }
+
+    response = client.post("/transactions/batch", json=batch)
+    assert response.status_code == 200
+
+    data = response.json()
+    assert data["succeeded"] == 30
+    assert data["failed"] == 0
+    assert [r["index"] for r in data["results"]] == list(range(30))
+    assert all(r["status"] == "success" for r in data["results"])
+
+    # Every record should have been written, across more than one DynamoDB batch
+    table = dynamodb.Table('transactions')
+    assert table.scan()['Count'] == 30
+
+def test_create_transactions_batch_partial_publish_failure(client, dynamodb, sns, monkeypatch):
+    def publish_batch(TopicArn, PublishBatchRequestEntries):
+        return {
+            'Successful': [{'Id': e['Id']} for e in PublishBatchRequestEntries if e['Id'] != '1'],
+            'Failed': [{'Id': '1', 'Code': 'InternalError', 'Message': 'boom', 'SenderFault': False}]
+        }
+
+    monkeypatch.setattr(main.sns, 'publish_batch', publish_batch)
+
+    batch = {
+        "transactions": [
+            {"user_id": "user123", "amount": 5.0, "merchant": "Test Store"}
+            for _ in range(3)
+        ]
+    }
+
+    response = client.post("/transactions/batch", json=batch)
+    assert response.status_code == 200
+
+    data = response.json()
+    # The row was stored, so it is not a failure the client should retry
+    assert data["succeeded"] == 2
+    assert data["failed"] == 0
+    assert data["publish_failed"] == 1
+    assert data["results"][1]["status"] == "publish_failed"
+    assert data["results"][1]["error"] == "boom"
+    assert dynamodb.Table('transactions').scan()['Count'] == 3
+
+def test_batch_write_retries_unprocessed_items(dynamodb, monkeypatch):
+    calls = []
+    real_batch_write_item = main.dynamodb.batch_write_item
+
+    def batch_write_item(RequestItems):
+        calls.append(RequestItems)
+        if len(calls) == 1:
+            # Pretend DynamoDB throttled the last request of the first call
+            requests = RequestItems['transactions']
+            real_batch_write_item(RequestItems={'transactions': requests[:-1]})
+            return {'UnprocessedItems': {'transactions': requests[-1:]}}
+        return real_batch_write_item(RequestItems=RequestItems)
+
+    monkeypatch.setattr(main.dynamodb, 'batch_write_item', batch_write_item)
+    monkeypatch.setattr(main, 'BATCH_WRITE_BASE_DELAY', 0)
+
+    records = [
+        {'transaction_id': f'tx{i}', 'user_id': 'user123', 'amount': 1}
+        for i in range(3)
+    ]
+    failed = main.batch_write_records('transactions', records)
+
+    assert failed == {}
+    assert len(calls) == 2
+    assert dynamodb.Table('transactions').scan()['Count'] == 3
+
+def test_create_transactions_batch_empty(client):
+    response = client.post("/transactions/batch", json={"transactions": []})
+    assert response.status_code == 422
+
+def test_create_transaction_does_not_block_event_loop(dynamodb, sns, monkeypatch):
+    # Simulate 100ms of network latency on both AWS calls
+    def slow_put_item(**kwargs):
+        time.sleep(0.1)
+
+    def slow_publish(**kwargs):
+        time.sleep(0.1)
+
+    monkeypatch.setattr(main.dynamodb, 'put_item', slow_put_item)
+    monkeypatch.setattr(main.sns, 'publish', slow_publish)
+
+    async def run_concurrently():
+        transaction = main.Transaction(user_id="user123", amount=10.0, merchant="Test Store")
+        return await asyncio.gather(*(
+            main.create_transaction(transaction, Response(), None) for _ in range(10)
+        ))
+
+    started = time.perf_counter()
+    results = asyncio.run(run_concurrently())
+    elapsed = time.perf_counter() - started
+
+    assert len(results) == 10
+    # Serialized, this would take 10 x (0.1 + 0.1) = 2s; the write and publish
+    # also overlap, so all ten requests complete in roughly one latency
+    assert elapsed < 0.5
+
+def test_create_transaction_idempotency_key_replays_response(client, dynamodb, sns, monkeypatch):
+    published = []
+    real_publish = main.sns.publish
+
+    def publish(**kwargs):
+        published.append(kwargs)
+        return real_publish(**kwargs)
+
+    monkeypatch.setattr(main.sns, 'publish', publish)
+
+    transaction_data = {"user_id": "user123", "amount": 42.0, "merchant": "Test Store"}
+    headers = {"Idempotency-Key": "retry-me"}
+
+    first = client.post("/transactions", json=transaction_data, headers=headers)
+    second = client.post("/transactions", json=transaction_data, headers=headers)
+
+    assert first.status_code == second.status_code == 200
+    assert second.json() == first.json()
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(published) == 1
+    assert dynamodb.Table('transactions').scan()['Count'] == 1
+
+def test_create_transaction_idempotency_key_across_instances(client, dynamodb, sns, monkeypatch):
+    transaction_data = {"user_id": "user123", "amount": 42.0, "merchant": "Test Store"}
+    headers = {"Idempotency-Key": "retry-elsewhere"}
+
+    first = client.post("/transactions", json=transaction_data, headers=headers)
+
+    # A different instance has an empty cache and must fall back to the conditional write
+    monkeypatch.setattr(main, 'idempotency_cache', main.IdempotencyCache())
+    monkeypatch.setattr(main.sns, 'publish', lambda **kwargs: pytest.fail("duplicate publish"))
+    second = client.post("/transactions", json=transaction_data, headers=headers)
+
+    assert second.status_code == 200
+    assert second.json() == first.json()
+    assert dynamodb.Table('transactions').scan()['Count'] == 1
+
+def test_create_transaction_idempotency_key_retry_after_publish_failure(client, dynamodb, sns, monkeypatch):
+    published = []
+    real_publish = main.sns.publish
+
+    def failing_publish(**kwargs):
+        raise RuntimeError("SNS unavailable")
+
+    def publish(**kwargs):
+        published.append(kwargs)
+        return real_publish(**kwargs)
+
+    transaction_data = {"user_id": "user123", "amount": 42.0, "merchant": "Test Store"}
+    headers = {"Idempotency-Key": "publish-failed"}
+
+    # The record is stored, but its event is not accepted
+    monkeypatch.setattr(main.sns, 'publish', failing_publish)
+    first = client.post("/transactions", json=transaction_data, headers=headers)
+    assert first.status_code == 500
+
+    # The retry finds the stored record and publishes its event
+    monkeypatch.setattr(main.sns, 'publish', publish)
+    second = client.post("/transactions", json=transaction_data, headers=headers)
+    assert second.status_code == 200
+    assert second.headers["Idempotent-Replayed"] == "true"
+    assert len(published) == 1
+    event = main.events.decode(published[0]['Message'], published[0]['MessageAttributes'])
+    assert event['transaction_id'] == second.json()['transaction_id']
+    assert 'publish_pending' not in event
+
+    # Once published, further retries do not publish again
+    monkeypatch.setattr(main, 'idempotency_cache', main.IdempotencyCache())
+    third = client.post("/transactions", json=transaction_data, headers=headers)
+    assert third.status_code == 200
+    assert len(published) == 1
+    item = dynamodb.Table('transactions').scan()['Items'][0]
+    assert 'publish_pending' not in item
+
+def test_idempotency_cache_evicts_least_recently_used():
+    cache = main.IdempotencyCache(max_entries=2, ttl_seconds=60)
+    cache.put('a', {'n': 1})
+    cache.put('b', {'n': 2})
+    cache.get('a')
+    cache.put('c', {'n': 3})
+
+    assert cache.get('b') is None
+    assert cache.get('a') == {'n': 1}
+    assert len(cache) == 2
+
+def test_idempotency_cache_expires_entries():
+    cache = main.IdempotencyCache(ttl_seconds=-1)
+    cache.put('a', {'n': 1})
+    assert cache.get('a') is None